@@ -0,0 +1,145 @@
+"""
+batch_assigner.py
+-----------------
+
+Draw many layouts of the unseen cards at once with NumPy. A batch of N
+layouts is an (N, players, 52) boolean array where layouts[n, i, card] is
+set when the i-th hidden player holds the card in the n-th layout, the
+players being in the order of the keys of unseen_counts.
+
+The layouts honor the number of cards of every player, the suits the
+players have shown out of, and the number of cards and honor cards of a
+suit the CSP assigned to a player. Every layout that meets these
+constraints is equally likely.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from agent.card_stats import CardSuit, PlayerPosition
+from agent.card_utils import CardSet, card_to_index
+
+# Cards of rank J or higher are honors, as in CSPAssignerV2
+HONOR_RANK = 3
+
+class BatchAssigner:
+    @staticmethod
+    def assign(unseen_cards: CardSet, unseen_counts: Dict[PlayerPosition, int], num_layouts: int,
+               shown_out_suits: Dict[PlayerPosition, List[CardSuit]] = None,
+               suit_targets: Dict[PlayerPosition, Dict[CardSuit, Tuple[int, int]]] = None,
+               rng: np.random.Generator = None) -> np.ndarray:
+        """
+        Draw num_layouts layouts of the unseen cards.
+
+        @param unseen_cards: The cards in the hidden hands.
+        @param unseen_counts: The number of cards of every hidden player.
+        @param shown_out_suits: The suits every player has no card of.
+        @param suit_targets: suit_targets[player][suit] is the number of cards
+                             and of honor cards of the suit the player holds.
+        @param rng: The generator to draw from, or a seed.
+        @return: An (num_layouts, players, 52) boolean array.
+
+        A card every player but one is ruled out of goes to that player, the
+        cards no player is ruled out of are shared out randomly. Cards open to
+        some but not all of the players are not supported, they can only
+        happen with three hidden hands or more, and raise a ValueError, as do
+        constraints that no layout meets.
+        """
+        rng = np.random.default_rng(rng)
+        players = list(unseen_counts.keys())
+        num_players = len(players)
+        shown_out_suits = shown_out_suits or {}
+        suit_targets = suit_targets or {}
+        layouts = np.zeros((num_layouts, num_players, 52), dtype=bool)
+        rows = np.arange(num_layouts)[:, None]
+        capacity = [unseen_counts[player] for player in players]
+
+        # The players each unseen card can still go to
+        cards = np.array(sorted(unseen_cards), dtype=int)
+        allowed = np.ones((len(cards), num_players), dtype=bool)
+        suits = cards // 13
+        for i, player in enumerate(players):
+            for suit in shown_out_suits.get(player, ()):
+                allowed[suits == CardSuit(suit).value, i] = False
+
+        def give(player_i: int, chosen: np.ndarray) -> None:
+            """
+            Give the player the cards chosen[n] in the n-th layout.
+            """
+            layouts[rows, player_i, chosen] = True
+            capacity[player_i] -= chosen.shape[1]
+
+        def only_player(mask: np.ndarray) -> int:
+            if not mask.any():
+                raise ValueError("No player can hold some of the unseen cards")
+            if mask.sum() > 1:
+                raise ValueError("Cards open to some but not all of the players are not supported")
+            return int(np.flatnonzero(mask)[0])
+
+        placed = np.zeros(len(cards), dtype=bool)
+        for i, player in enumerate(players):
+            for suit, (num_cards, num_honors) in suit_targets.get(player, {}).items():
+                in_suit = suits == CardSuit(suit).value
+                if placed[in_suit].any():
+                    raise ValueError(f"Two players have a target in {CardSuit(suit)}")
+                if not in_suit.any():
+                    continue
+                # The players allowed to hold the suit, all its cards alike
+                suit_allowed = allowed[in_suit][0]
+                if num_cards > 0 and not suit_allowed[i]:
+                    raise ValueError(f"{player} has shown out of {CardSuit(suit)}")
+                others = suit_allowed.copy()
+                others[i] = False
+                honors = in_suit & (cards % 13 <= HONOR_RANK)
+                for group, num_chosen in ((honors, num_honors), (in_suit & ~honors, num_cards - num_honors)):
+                    group_cards = cards[group]
+                    if not 0 <= num_chosen <= len(group_cards):
+                        raise ValueError(f"{player} cannot hold {num_chosen} of {len(group_cards)} cards")
+                    shuffled = group_cards[random_permutations(rng, num_layouts, len(group_cards))]
+                    give(i, shuffled[:, :num_chosen])
+                    # The rest of the suit goes to the other players
+                    if num_chosen < len(group_cards):
+                        give(only_player(others), shuffled[:, num_chosen:])
+                placed |= in_suit
+
+        # The cards left go to the only player they can go to, or are
+        # shared out randomly when open to every player
+        shared = ~placed & allowed.all(axis=1)
+        for k in np.flatnonzero(~placed & ~shared):
+            give(only_player(allowed[k]), np.full((num_layouts, 1), cards[k]))
+        shared_cards = cards[shared]
+        if min(capacity) < 0 or sum(capacity) != len(shared_cards):
+            raise ValueError("The card counts of the players do not add up")
+        shuffled = shared_cards[random_permutations(rng, num_layouts, len(shared_cards))]
+        start = 0
+        for i in range(num_players):
+            end = start + capacity[i]
+            give(i, shuffled[:, start:end])
+            start = end
+        return layouts
+
+    @staticmethod
+    def to_hands(layout: np.ndarray, players: List[PlayerPosition]) -> Dict[PlayerPosition, CardSet]:
+        """
+        Convert one layout of a batch to the hands of the players.
+        """
+        return {player: set(np.flatnonzero(layout[i]).tolist()) for i, player in enumerate(players)}
+
+def random_permutations(rng: np.random.Generator, num_layouts: int, size: int) -> np.ndarray:
+    """
+    An independent random permutation of range(size) for every layout.
+    """
+    return np.argsort(rng.random((num_layouts, size)), axis=1)
+
+if __name__ == "__main__":
+    # South is the declarer
+    deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+    deals = deal_str.split()
+    cardsets = [card_to_index(deal) for deal in deals]
+    unseen_cards = set(list(cardsets[1]) + list(cardsets[3]))
+    unseen_counts = {PlayerPosition.WEST: 13, PlayerPosition.EAST: 13}
+    layouts = BatchAssigner.assign(unseen_cards, unseen_counts, 1000, rng=3,
+                                   suit_targets={PlayerPosition.EAST: {CardSuit.HEARTS: (7, 1)}})
+    print(layouts.shape, layouts.sum(axis=2)[0])
+    print(BatchAssigner.to_hands(layouts[0], list(unseen_counts.keys())))
@@ -103,8 +103,8 @@ if __name__ == "__main__":
                       CardSuit.DIAMONDS: {0: 0.1, 2: 0.5}}
     assigner = CSPAssigner(unseen_cards, players, high_card_prob, suit_count_prob)
     solver = BacktrackingSearch()
-    # This problem does not seem to be solvable, there are 78 variables to assign
-    solver.solve(assigner._csp, mcv=True, ac3=True)
+    # There are 78 variables to assign, only look for the best assignment
+    solver.solve(assigner._csp, mcv=True, ac3=True, top_k=1, branch_and_bound=True)
 
     for var in solver.optimalAssignment:
         if CARD_INDEX_MAP.get(var, -1) in unseen_cards:
@@ -11,30 +11,160 @@ This is done to reduce the number of variables in the CSP problem and
 make the problem solvable.
 """
 
-import copy
+import functools
 import random
-from typing import Dict, List, Set, DefaultDict, Tuple
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Set, Tuple, Union
 import math
 
-from agent.assigners.random_assigner import RandomAssigner
+import numpy as np
+
+from agent.assigners.batch_assigner import BatchAssigner, HONOR_RANK
+from agent.assigners.exact_assigner import ExactAssigner
 from agent.card_stats import CardRank, CardSuit, PlayerPosition, Card
-from agent.card_utils import CardSet, card_to_index, CARD_INDEX_MAP
-from agent.csp.backtrack import BacktrackingSearch, BeamSearch, create_sum_variable
+from agent.card_utils import CardSet, card_to_index
+from agent.csp.backtrack import BeamSearch
+from agent.csp.elimination import VariableElimination
 from agent.csp.util import CSP
 
+# These magic numbers are compiled results from dataset in agent/boards/bids
+# The script used to parse the data in bids: assigners/parse_bid.py
+# Each (H, C) tuple maps to the count of occurrences from the data.
+SMOOTH_FACTOR = 1
+BIDDING_TABLE = {
+    (0, 1): 5,
+    (0, 2): 3,
+    (0, 3): 11,
+    (0, 4): 9,
+    (0, 5): 5,
+    (0, 6): 3,
+    (1, 1): 4,
+    (1, 2): 12,
+    (1, 3): 21,
+    (1, 4): 22,
+    (1, 5): 41,
+    (1, 6): 12,
+    (1, 7): 2,
+    (2, 2): 6,
+    (2, 4): 19,
+    (2, 5): 30,
+    (2, 6): 18,
+    (2, 7): 7,
+    (3, 4): 5,
+    (3, 5): 14,
+    (3, 6): 23,
+    (3, 7): 2,
+    (4, 5): 2,
+    (4, 6): 1
+}
+
+def bidding_likelihood_table() -> np.ndarray:
+    """
+    table[num_honor][num_cards] is the smoothed weight of a bid given the
+    numbers of honor cards and cards, as in prob_H_given_C_table().
+    """
+    table = np.full((5, 14), SMOOTH_FACTOR, dtype=float)
+    for (num_honor, num_cards), count in BIDDING_TABLE.items():
+        table[num_honor, num_cards] += count
+    return table
+
+BIDDING_LIKELIHOOD = bidding_likelihood_table()
+
+@functools.lru_cache(maxsize=1024)
+def prob_C_table(total_num_cards: int, max_num_cards: int, num_cards_to_assign: int) -> Tuple[float, ...]:
+    """
+    The probability that a player dealt num_cards_to_assign out of the
+    total_num_cards unseen cards gets 0..max_num_cards of the max_num_cards
+    unseen cards of a suit.
+    """
+    denominator = math.comb(total_num_cards, num_cards_to_assign)
+    return tuple(math.comb(max_num_cards, num_cards)
+                 * math.comb(total_num_cards - max_num_cards, num_cards_to_assign - num_cards) / denominator
+                 for num_cards in range(max_num_cards + 1))
+
+@functools.lru_cache(maxsize=1024)
+def prob_H_given_C_table(num_cards_in_suit: int, max_honor_cards: int) -> Tuple[Tuple[float, ...], ...]:
+    """
+    The weight of a player holding 0..max_honor_cards of the unseen honor
+    cards of a suit given that the player holds 0..num_cards_in_suit of its
+    unseen cards: the probability of the honors times the likelihood of the
+    bid. table[num_honor][num_cards].
+    """
+    def prob_H_given_C(num_honor: int, num_cards: int) -> float:
+        if num_honor > num_cards:
+            return 0
+        try:
+            numerator = math.comb(max_honor_cards, num_honor) \
+                * math.comb(num_cards_in_suit - max_honor_cards, num_cards - num_honor)
+            denominator = math.comb(num_cards_in_suit, num_cards)
+        except ValueError:
+            return 0
+        return numerator / denominator * (BIDDING_TABLE.get((num_honor, num_cards), 0) + SMOOTH_FACTOR)
+
+    return tuple(tuple(prob_H_given_C(num_honor, num_cards) for num_cards in range(num_cards_in_suit + 1))
+                 for num_honor in range(max_honor_cards + 1))
+
+class SolverCache:
+    """
+    The solved CSPs of the assigners of a deal, keyed on CSPAssignerV2.csp_key().
+    The least recently used solver is dropped first.
+    """
+    def __init__(self, size: int = 256) -> None:
+        if size <= 0:
+            raise ValueError(f"Invalid cache size {size}")
+        self.size = size
+        self._solvers: "OrderedDict[Tuple, Union[VariableElimination, BeamSearch]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._solvers)
+
+    def get(self, key: Tuple) -> Optional[Union[VariableElimination, BeamSearch]]:
+        solver = self._solvers.get(key)
+        if solver is not None:
+            self._solvers.move_to_end(key)
+        return solver
+
+    def put(self, key: Tuple, solver: Union[VariableElimination, BeamSearch]) -> None:
+        self._solvers[key] = solver
+        self._solvers.move_to_end(key)
+        if len(self._solvers) > self.size:
+            self._solvers.popitem(last=False)
+
 class CSPAssignerV2:
+    # Time budget in milliseconds for solving the CSP of a card. When the
+    # exact solve is expected to take longer, the CSP is solved with a beam
+    # search of BEAM_WIDTH stopped at the budget. None to always solve exactly.
+    SOLVE_MS = None
+    BEAM_WIDTH = 16
+    # Time of the exact solve per factor entry, see exact_solve_cost(). The
+    # 99th percentile over 300 random full deals, whose CSPs have up to 200
+    # entries and take up to 0.25 ms.
+    EXACT_MS_PER_ENTRY = 0.002
+
     def __init__(self, unseen_cards: CardSet, player_stats: Dict[PlayerPosition, Tuple[int, CardSuit]],
-                 show_out_suits: Dict[PlayerPosition, Set[CardSuit]]) -> None:
+                 show_out_suits: Dict[PlayerPosition, Set[CardSuit]], 
+                 unseen_tallies: Tuple[Dict[CardSuit, int], Dict[CardSuit, int]] = None,
+                 solvers: SolverCache = None) -> None:
         """
         @param unseen_cards: The set of unseen cards in hidden hands
         @param player_stats: Key: the player with a hidden hand, value is a tuple of the number of cards
                                   and the suit that the player bided for in the auction.
+        @param unseen_tallies: The number of unseen cards and honor cards in each suit if the caller
+                               keeps track of them, see GenericAgent.get_unseen_tallies().
+        @param solvers: The solved CSPs of the caller's previous assigners, keyed on csp_key(). Between
+                        two cards of a deal the CSP often does not change. None to always solve.
         """
         self._csp = CSP()
         self._unseen_cards: Set[Card] = {Card.from_code(idx) for idx in unseen_cards}
         self._player_stats = player_stats
-        self._num_cards_in_suit, self._honor_cards_in_suit = self.compute_num_cards_in_suit()
+        if unseen_tallies is not None:
+            self._num_cards_in_suit, self._honor_cards_in_suit = unseen_tallies
+        else:
+            self._num_cards_in_suit, self._honor_cards_in_suit = self.compute_num_cards_in_suit()
         self._shown_out = show_out_suits
+        self._solvers = solvers
+        self._solver = None
 
     def compute_num_cards_in_suit(self) -> None:
         num_cards_in_suit: Dict[CardSuit, int] = {}
@@ -84,53 +214,15 @@ class CSPAssignerV2:
                 continue
             max_num_cards = self._num_cards_in_suit[suit]
             self._csp.add_variable(f"{player}_{suit}", [i for i in range(max_num_cards + 1)])
-
-            def prob_C(num_cards: int) -> float:
-                total_num_cards = len(self._unseen_cards)
-                denominator = math.comb(total_num_cards, num_cards_to_assign)
-                numerator = math.comb(max_num_cards, num_cards) \
-                    * math.comb(total_num_cards - max_num_cards, num_cards_to_assign - num_cards)
-                return numerator / denominator
-
-            self._csp.add_unary_factor(f"{player}_{suit}", prob_C)
+            table = prob_C_table(len(self._unseen_cards), max_num_cards, num_cards_to_assign)
+            self._csp.add_unary_factor(f"{player}_{suit}", table.__getitem__)
 
     def add_prob_H_given_C_and_evidence(self) -> None:
         """
         Add factors that computes probability of num honor cards given num_cards in the suit.
         These are binary factors. Then, we multiply the cond. prob. by weights of 
-        likelihood of the player makes a bid in a suit based on H and C.
-        
-        These magic numbers are compiled results from dataset in agent/boards/bids
-        The script used to parse the data in bids: assigners/parse_bid.py
-        Each (H, C) tuple maps to the count of occurrences from the data.
+        likelihood of the player makes a bid in a suit based on H and C, see BIDDING_TABLE.
         """
-        SMOOTH_FACTOR = 1
-        BIDDING_TABLE = {
-            (0, 1): 5,
-            (0, 2): 3,
-            (0, 3): 11,
-            (0, 4): 9,
-            (0, 5): 5,
-            (0, 6): 3,
-            (1, 1): 4,
-            (1, 2): 12,
-            (1, 3): 21,
-            (1, 4): 22,
-            (1, 5): 41,
-            (1, 6): 12,
-            (1, 7): 2,
-            (2, 2): 6,
-            (2, 4): 19,
-            (2, 5): 30,
-            (2, 6): 18,
-            (2, 7): 7,
-            (3, 4): 5,
-            (3, 5): 14,
-            (3, 6): 23,
-            (3, 7): 2,
-            (4, 5): 2,
-            (4, 6): 1
-        }
         
         for player, (num_cards_to_assign, suit) in self._player_stats.items():
             if suit is None:
@@ -138,21 +230,10 @@ class CSPAssignerV2:
             max_honor_cards = self._honor_cards_in_suit[suit]
             num_cards_in_suit = self._num_cards_in_suit[suit]
             self._csp.add_variable(f"{player}_{suit}_Hon", [i for i in range(max_honor_cards + 1)])
-
-            def prob_H_given_C(num_honor: int, num_cards: int) -> float:
-                if num_honor > num_cards:
-                    return 0
-                try:
-                    numerator = math.comb(max_honor_cards, num_honor) \
-                        * math.comb(num_cards_in_suit - max_honor_cards, num_cards - num_honor)
-                    denominator = math.comb(num_cards_in_suit, num_cards)
-                except ValueError:
-                    return 0
-                return numerator / denominator * (BIDDING_TABLE.get((num_cards, num_honor), 0) + SMOOTH_FACTOR)
-            
+            table = prob_H_given_C_table(num_cards_in_suit, max_honor_cards)
             self._csp.add_binary_factor(f"{player}_{suit}_Hon", 
                                         f"{player}_{suit}", 
-                                        prob_H_given_C)
+                                        lambda num_honor, num_cards: table[num_honor][num_cards])
 
     def add_shown_out(self) -> None:
         for player, suits in self._shown_out.items():
@@ -163,23 +244,78 @@ class CSPAssignerV2:
                 self._csp.add_variable(f"{var_name}_SHOWN", [0])
                 self._csp.add_binary_factor(f"{var_name}_SHOWN", var_name, lambda x, y: y == 0)
 
-    def assign_cards(self, verbose: bool = False) -> Dict[PlayerPosition, int]:
+    def csp_key(self) -> Tuple:
+        """
+        Everything add_constraints() builds the CSP from, in the order the
+        variables are added.
+        """
+        bided_suits = tuple((player, num_cards, suit, self._num_cards_in_suit[suit], self._honor_cards_in_suit[suit])
+                            for player, (num_cards, suit) in self._player_stats.items() if suit is not None)
+        shown_out = tuple((player, tuple(sorted(suits, key=lambda suit: suit.value)))
+                          for player, suits in self._shown_out.items())
+        return len(self._unseen_cards), bided_suits, shown_out
+
+    def exact_solve_cost(self) -> int:
+        """
+        The number of factor entries the exact solve goes through, which grows
+        with the domains of the variables, largest early in the hand.
+        """
+        compiled = self._csp.compile()
+        return sum(len(values) for values in compiled.values) + \
+            sum(factor.size for factors in compiled.binaryFactors for _, factor in factors)
+
+    def solve(self) -> Union[VariableElimination, BeamSearch]:
+        """
+        Build and solve the CSP, or reuse the solver of a previous assigner
+        with the same CSP. The CSP is solved exactly unless that is expected
+        to take longer than SOLVE_MS, see exact_solve_cost().
+        """
+        if self._solver is not None:
+            return self._solver
+        solvers = self._solvers
+        key = self.csp_key()
+        solver = solvers.get(key) if solvers is not None else None
+        if solver is not None:
+            self._csp = solver.csp
+            self._solver = solver
+            return solver
+
+        start = time.perf_counter()
+        self.add_constraints()
+        if self.SOLVE_MS is None or self.exact_solve_cost() * self.EXACT_MS_PER_ENTRY <= self.SOLVE_MS:
+            solver = VariableElimination()
+            solver.solve(self._csp)
+        else:
+            solver = BeamSearch(self.BEAM_WIDTH)
+            solver.solve(self._csp, mcv=True, ac3=True, deadline=start + self.SOLVE_MS / 1000)
+        self._solver = solver
+        # A later assigner may have the time to do better than a timed out search
+        if solvers is not None and not (isinstance(solver, BeamSearch) and solver.timedOut):
+            solvers.put(key, solver)
+        return solver
+
+    def assign_cards(self, verbose: bool = False, sample: bool = False) -> Dict[PlayerPosition, int]:
         """
         Solve the CSP problem to get the max weights assignment of bided suits.
         Then, assign the unseen cards to the players based on the max weights
-        of the bided suits. For the rest of the cards, assign them randomly.
+        of the bided suits. The rest of the cards are assigned uniformly among
+        the layouts where no player holds a suit they have shown out of.
+
+        @param sample: Draw the numbers of cards and honors in the bided suits
+                       with a probability proportional to their weights
+                       instead of taking the max weights assignment.
         """
-        solver = BacktrackingSearch()
-        self.add_constraints()
-        solver.solve(self._csp, mcv=True, ac3=True)
+        solver = self.solve()
+        if verbose:
+            solver.print_stats()
+        csp_assignment = solver.sample() if sample else solver.optimalAssignment
 
         unseen_cards = set([card.code() for card in self._unseen_cards])
         # Fallback to random assignment if no solution found
-        if len(solver.optimalAssignment) == 0:
+        if len(csp_assignment) == 0:
             player_stats = {player: num_cards for player, (num_cards, _) in self._player_stats.items()}
-            return RandomAssigner.assign(unseen_cards, player_stats)
+            return ExactAssigner.assign(unseen_cards, player_stats, self._shown_out)
         
-        previous_player_stats = copy.deepcopy(self._player_stats)
 
         plain_cards_suited = {}
         honor_cards_suited = {}
@@ -194,16 +330,16 @@ class CSPAssignerV2:
                 plain_cards_suited[suit].append(card)
         
         if verbose:
-            for var in solver.optimalAssignment:
-                print(f"{var}: {solver.optimalAssignment[var]}")
+            for var in csp_assignment:
+                print(f"{var}: {csp_assignment[var]}")
         assignment = {player: [] for player in self._player_stats.keys()}
         players = list(self._player_stats.keys())
         for player, (num_cards_to_assign, suit) in self._player_stats.items():
             if suit is None:
                 continue
             another_player = players[players.index(player) - 1]
-            num_cards_assigned = solver.optimalAssignment[f"{player}_{suit}"]
-            num_honor_assigned = solver.optimalAssignment[f"{player}_{suit}_Hon"]
+            num_cards_assigned = csp_assignment[f"{player}_{suit}"]
+            num_honor_assigned = csp_assignment[f"{player}_{suit}_Hon"]
             random.shuffle(plain_cards_suited[suit])
             random.shuffle(honor_cards_suited[suit])
             assignment[player] += honor_cards_suited[suit][:num_honor_assigned]
@@ -215,19 +351,77 @@ class CSPAssignerV2:
             for player, cards in assignment.items():
                 print(f"{player}: {cards}")
         
-        player_stat = {}
-        for player in players:
-            cardset = set([card.code() for card in assignment[player]])
-            unseen_cards -= cardset
-            assignment[player] = cardset
-            len_assigned = len(cardset)
-            player_stat[player] = previous_player_stats[player][0] - len_assigned
-        
-        random_assignments = RandomAssigner.assign(unseen_cards, player_stat)
-        for player, cards in random_assignments.items():
-            assignment[player] |= cards
+        placed = {player: set([card.code() for card in cards]) for player, cards in assignment.items()}
+        player_stats = {player: num_cards for player, (num_cards, _) in self._player_stats.items()}
+        return ExactAssigner.assign(unseen_cards, player_stats, self._shown_out, placed)
+
+    def assign_layouts(self, num_layouts: int, sample: bool = True, rng: np.random.Generator = None) -> np.ndarray:
+        """
+        Draw num_layouts layouts of the unseen cards at once, see BatchAssigner.
+        Every layout follows an assignment of the CSP, drawn by weight or the
+        max weights one, and the suits the players have shown out of.
 
-        return assignment
+        @return: An (num_layouts, players, 52) boolean array, the players in
+                 the order of player_stats.
+        """
+        rng = np.random.default_rng(rng)
+        solver = self.solve()
+        unseen_cards = {card.code() for card in self._unseen_cards}
+        unseen_counts = {player: num_cards for player, (num_cards, _) in self._player_stats.items()}
+        if len(solver.optimalAssignment) == 0:
+            return BatchAssigner.assign(unseen_cards, unseen_counts, num_layouts, self._shown_out, rng=rng)
+
+        # Layouts with the same numbers of cards and honors in the bided suits
+        # are drawn in one batch
+        targets = Counter()
+        csp_rng = random.Random(int(rng.integers(1 << 32)))
+        for _ in range(num_layouts):
+            csp_assignment = solver.sample(csp_rng) if sample else solver.optimalAssignment
+            targets[tuple((player, suit, csp_assignment[f"{player}_{suit}"], csp_assignment[f"{player}_{suit}_Hon"])
+                          for player, (_, suit) in self._player_stats.items() if suit is not None)] += 1
+
+        batches = []
+        for target, count in targets.items():
+            suit_targets = {player: {suit: (num_cards, num_honors)} for player, suit, num_cards, num_honors in target}
+            batches.append(BatchAssigner.assign(unseen_cards, unseen_counts, count, self._shown_out,
+                                                suit_targets, rng))
+        layouts = np.concatenate(batches)
+        return layouts[rng.permutation(num_layouts)]
+
+    def assign_weighted_layouts(self, num_layouts: int,
+                                rng: np.random.Generator = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw num_layouts layouts uniformly among the ones that meet the suits
+        the players have shown out of, and weight them by how well they
+        explain the bids (importance sampling).
+
+        The CSP weighs an assignment by prob_C x prob_H_given_C x
+        BIDDING_TABLE. The first two are the probabilities of the numbers of
+        cards and honors in a uniform deal, which the uniform draw already
+        follows, so the weight of a layout is the bidding likelihood alone.
+
+        @return: The (num_layouts, players, 52) layouts and their weights,
+                 which sum to 1.
+        """
+        unseen_cards = {card.code() for card in self._unseen_cards}
+        unseen_counts = {player: num_cards for player, (num_cards, _) in self._player_stats.items()}
+        layouts = BatchAssigner.assign(unseen_cards, unseen_counts, num_layouts, self._shown_out, rng=rng)
+        return layouts, self.layout_weights(layouts)
+
+    def layout_weights(self, layouts: np.ndarray) -> np.ndarray:
+        """
+        The bidding likelihood of every layout of a batch, normalized to sum
+        to 1. The players are in the order of player_stats.
+        """
+        weights = np.ones(len(layouts))
+        for i, (_, suit) in enumerate(self._player_stats.values()):
+            if suit is None:
+                continue
+            in_suit = layouts[:, i, suit.value * 13:(suit.value + 1) * 13]
+            num_cards = in_suit.sum(axis=1)
+            num_honors = in_suit[:, :HONOR_RANK + 1].sum(axis=1)
+            weights *= BIDDING_LIKELIHOOD[num_honors, num_cards]
+        return weights / weights.sum()
 
 if __name__ == "__main__":
     NORTH = 0
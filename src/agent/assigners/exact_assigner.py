@@ -0,0 +1,146 @@
+"""
+exact_assigner.py
+-----------------
+
+Assign the unseen cards to the players with hidden hands uniformly among the
+layouts that meet the hard constraints: the number of cards of every player,
+the suits the players have shown out of and the cards already placed.
+
+The layouts are counted suit by suit: ways(suit, capacities) is the number
+of layouts of the free cards of this suit and the next ones when the players
+still hold the given numbers of cards. A layout is drawn by picking the
+number of cards of every player in each suit with a probability
+proportional to the number of layouts it leaves, then the cards themselves
+uniformly, so no draw is ever rejected.
+"""
+
+from typing import Dict, Iterator, List, Set, Tuple
+import functools
+import math
+import random
+
+from agent.card_stats import CardSuit, PlayerPosition
+from agent.card_utils import CardSet, card_to_index
+
+class ExactAssigner:
+    @staticmethod
+    def count_layouts(unseen_cards: CardSet, unseen_counts: Dict[PlayerPosition, int],
+                      shown_out_suits: Dict[PlayerPosition, Set[CardSuit]] = None,
+                      placed: Dict[PlayerPosition, CardSet] = None) -> int:
+        """
+        The number of layouts that meet the constraints, see assign().
+        """
+        problem = LayoutProblem(unseen_cards, unseen_counts, shown_out_suits, placed)
+        return problem.ways(0, problem.capacity)
+
+    @staticmethod
+    def assign(unseen_cards: CardSet, unseen_counts: Dict[PlayerPosition, int],
+               shown_out_suits: Dict[PlayerPosition, Set[CardSuit]] = None,
+               placed: Dict[PlayerPosition, CardSet] = None,
+               rand_seed: int = None) -> Dict[PlayerPosition, CardSet]:
+        """
+        Assign the unseen cards to the players with hidden hands, every layout
+        that meets the constraints being equally likely.
+
+        @param unseen_cards: The cards in the hidden hands, placed ones included.
+        @param unseen_counts: The number of cards of every hidden player,
+                              placed ones included.
+        @param shown_out_suits: The suits every player has no card of.
+        @param placed: The cards already given to the players.
+        @return: The hands of the players, placed cards included.
+        """
+        if rand_seed is not None:
+            random.seed(rand_seed)
+        problem = LayoutProblem(unseen_cards, unseen_counts, shown_out_suits, placed)
+        capacity = problem.capacity
+        if problem.ways(0, capacity) == 0:
+            raise ValueError("No layout of the unseen cards meets the constraints")
+
+        player_hands = {player: set(cards) for player, cards in problem.placed.items()}
+        for suit in range(4):
+            # Pick the numbers of cards of the suit by the number of layouts they leave
+            pick = random.randrange(problem.ways(suit, capacity))
+            for split in problem.splits(suit, capacity):
+                rest = tuple(cap - k for cap, k in zip(capacity, split))
+                weight = multinomial(split) * problem.ways(suit + 1, rest)
+                if pick < weight:
+                    break
+                pick -= weight
+            capacity = rest
+
+            suit_cards = list(problem.free_cards[suit])
+            random.shuffle(suit_cards)
+            for player, k in zip(problem.players, split):
+                player_hands[player].update(suit_cards[:k])
+                suit_cards = suit_cards[k:]
+        return player_hands
+
+class LayoutProblem:
+    def __init__(self, unseen_cards: CardSet, unseen_counts: Dict[PlayerPosition, int],
+                 shown_out_suits: Dict[PlayerPosition, Set[CardSuit]] = None,
+                 placed: Dict[PlayerPosition, CardSet] = None) -> None:
+        shown_out_suits = shown_out_suits or {}
+        self.players = list(unseen_counts.keys())
+        self.placed = {player: set((placed or {}).get(player, ())) for player in self.players}
+        placed_cards = set().union(*self.placed.values())
+        self.capacity = tuple(unseen_counts[player] - len(self.placed[player]) for player in self.players)
+        if min(self.capacity) < 0:
+            raise ValueError("A player has more placed cards than cards")
+
+        self.free_cards: List[List[int]] = [[] for _ in range(4)]
+        for card in sorted(set(unseen_cards) - placed_cards):
+            self.free_cards[card // 13].append(card)
+        # allowed[suit][i] is True when the i-th player can hold the suit
+        self.allowed = [tuple(CardSuit(suit) not in shown_out_suits.get(player, ()) for player in self.players)
+                        for suit in range(4)]
+        self.ways = functools.lru_cache(maxsize=None)(self._ways)
+
+    def splits(self, suit: int, capacity: Tuple[int, ...]) -> Iterator[Tuple[int, ...]]:
+        """
+        Every way to split the number of free cards of the suit among the
+        players who can hold it, within their capacities.
+        """
+        def split(n: int, i: int) -> Iterator[Tuple[int, ...]]:
+            if i == len(capacity) - 1:
+                if n == 0 or (self.allowed[suit][i] and n <= capacity[i]):
+                    yield (n,)
+                return
+            top = min(n, capacity[i]) if self.allowed[suit][i] else 0
+            for k in range(top + 1):
+                for rest in split(n - k, i + 1):
+                    yield (k,) + rest
+
+        return split(len(self.free_cards[suit]), 0)
+
+    def _ways(self, suit: int, capacity: Tuple[int, ...]) -> int:
+        """
+        The number of layouts of the free cards of the suits from suit on.
+        """
+        if suit == 4:
+            return int(not any(capacity))
+        total = 0
+        for split in self.splits(suit, capacity):
+            rest = tuple(cap - k for cap, k in zip(capacity, split))
+            total += multinomial(split) * self.ways(suit + 1, rest)
+        return total
+
+def multinomial(split: Tuple[int, ...]) -> int:
+    """
+    The number of ways to deal sum(split) cards in hands of the given sizes.
+    """
+    ways, n = 1, 0
+    for k in split:
+        n += k
+        ways *= math.comb(n, k)
+    return ways
+
+if __name__ == "__main__":
+    # South is the declarer and EAST has shown out of clubs
+    deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+    deals = deal_str.split()
+    cardsets = [card_to_index(deal) for deal in deals]
+    unseen_cards = set(list(cardsets[1]) + list(cardsets[3]))
+    unseen_counts = {PlayerPosition.WEST: 13, PlayerPosition.EAST: 13}
+    shown_out_suits = {PlayerPosition.EAST: {CardSuit.CLUBS}}
+    print(ExactAssigner.count_layouts(unseen_cards, unseen_counts, shown_out_suits))
+    print(ExactAssigner.assign(unseen_cards, unseen_counts, shown_out_suits, rand_seed=3))
@@ -0,0 +1,428 @@
+"""
+bitboard.py
+-----------
+
+A compact game state engine for the minimax agents. Each hand is stored as
+a 52-bit integer where bit i is set when the player holds the card with
+index i (see the card to index mapping in README). The partial trick is
+packed into a single integer, 6 bits per card, in the order the cards were
+played. Legal moves are generated by masking the hand with the suit mask of
+the led suit, and the trick winner is computed with integer arithmetic only.
+
+Seats are the integer values of PlayerPosition (NORTH = 0, EAST = 1,
+SOUTH = 2, WEST = 3) and the trump is the integer value of CardSuit, where
+NT (4) never matches the suit of a card.
+"""
+
+import random
+import time
+from typing import Iterator, List, Tuple
+
+from agent.card_stats import Card, CardSuit, PlayerPosition
+from agent.card_utils import CardSet, RANKS
+from agent.dds_eval import DDSEvaluator
+from agent.eval_cache import EvalCache, leaf_key
+from agent.game_env import DEDUCTION, GameState
+from ddsolver.ddsolver import DDSolver
+
+# Mask of the 13 cards of each suit, indexed by CardSuit.value
+SUIT_MASKS = tuple(((1 << 13) - 1) << (13 * suit) for suit in range(4))
+FULL_DECK = (1 << 52) - 1
+
+# Cards ranked T or above, NORTH-SOUTH loses DEDUCTION for each of them in a lost trick
+HONOR_MASK = sum(0b11111 << (13 * suit) for suit in range(4))
+
+TRICK_BITS = 6
+TRICK_CARD_MASK = (1 << TRICK_BITS) - 1
+
+# Zobrist keys of a card held by a seat and of the seat on lead, the seed is
+# fixed so that the keys are the same in every process.
+_zobrist_rng = random.Random(221)
+ZOBRIST_CARDS = tuple(tuple(_zobrist_rng.getrandbits(64) for _ in range(52)) for _ in range(4))
+ZOBRIST_LEADER = tuple(_zobrist_rng.getrandbits(64) for _ in range(4))
+
+def zobrist_key(hands: List[int], leader: int) -> int:
+    """
+    Zobrist hash of the remaining hands and the player on lead.
+    """
+    key = ZOBRIST_LEADER[leader]
+    for seat in range(4):
+        for card in iter_cards(hands[seat]):
+            key ^= ZOBRIST_CARDS[seat][card]
+    return key
+
+def cardset_to_bits(cardset: CardSet) -> int:
+    """
+    Convert a set of card indices into a 52-bit hand.
+    """
+    bits = 0
+    for card in cardset:
+        bits |= 1 << card
+    return bits
+
+def bits_to_cardset(bits: int) -> CardSet:
+    """
+    Convert a 52-bit hand into a set of card indices.
+    """
+    return set(iter_cards(bits))
+
+def iter_cards(bits: int) -> Iterator[int]:
+    """
+    Iterate over the card indices in a 52-bit hand, from the lowest index
+    (SA) to the highest index (C2).
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def count_cards(bits: int) -> int:
+    """
+    Number of cards in a 52-bit hand.
+    """
+    return bin(bits).count("1")
+
+def bits_to_hand(bits: int) -> str:
+    """
+    Convert a 52-bit hand into the PBN string of the hand, e.g. "KJT83.86.632.Q62".
+    """
+    suits = []
+    for suit in range(4):
+        holding = (bits >> (13 * suit)) & 0x1FFF
+        suits.append("".join(RANKS[rank] for rank in range(13) if holding >> rank & 1))
+    return ".".join(suits)
+
+def holding_to_dds(holding: int) -> int:
+    """
+    Convert the 13-bit holding of a suit, bit 0 for the ace, into the DDS
+    rank bitmask, bit 14 for the ace down to bit 2 for the two.
+    """
+    return sum(1 << (14 - rank) for rank in range(13) if holding >> rank & 1)
+
+# DDS rank bitmask of every 13-bit holding
+DDS_HOLDINGS = tuple(holding_to_dds(holding) for holding in range(1 << 13))
+
+def bits_to_remain_cards(hands: List[int]) -> List[List[int]]:
+    """
+    Convert the 52-bit hands, NORTH first, into the remainCards of a binary
+    DDS deal: the rank bitmask of every suit of every hand.
+    """
+    return [[DDS_HOLDINGS[(hand >> (13 * suit)) & 0x1FFF] for suit in range(4)] for hand in hands]
+
+def trump_index(trump_suit: CardSuit) -> int:
+    """
+    Return the integer trump used by the engine. Anything that is not one of
+    the four suits (NT, or a string such as "NT") means no trump.
+    """
+    if isinstance(trump_suit, CardSuit):
+        return trump_suit.value
+    return CardSuit.NT.value
+
+def legal_moves(hand: int, trick: int, trick_len: int) -> int:
+    """
+    Return the legal cards of a hand as a 52-bit mask. The player has to
+    follow the suit of the first card in the trick if possible.
+    """
+    if trick_len == 0:
+        return hand
+    follow = hand & SUIT_MASKS[(trick & TRICK_CARD_MASK) // 13]
+    return follow if follow else hand
+
+def collapse_equivalent(moves: int, live: int, split_honors: bool) -> int:
+    """
+    Keep one card of each sequence of equivalent moves. Two cards of a suit
+    are equivalent when every card ranked between them has been played in an
+    earlier trick, so they win and lose the same tricks. The highest card of
+    the sequence is kept.
+
+    @param live: the cards still in the hands or in the current trick.
+    @param split_honors: do not join a card ranked T or above with a lower
+                         card, they score differently when NORTH-SOUTH
+                         loses the trick.
+    """
+    result = 0
+    prev = -1
+    for card in iter_cards(moves):
+        if prev >= 0 and card // 13 == prev // 13 \
+                and (live >> (prev + 1)) & ((1 << (card - prev - 1)) - 1) == 0 \
+                and not (split_honors and (HONOR_MASK >> prev & 1) != (HONOR_MASK >> card & 1)):
+            prev = card
+            continue
+        result |= 1 << card
+        prev = card
+    return result
+
+def trick_winner(trick: int, trick_len: int, leader: int, trump: int) -> int:
+    """
+    Return the seat of the player who is currently winning the trick.
+    A lower card index within the same suit is a higher ranked card.
+    """
+    best = trick & TRICK_CARD_MASK
+    best_k = 0
+    for k in range(1, trick_len):
+        card = (trick >> (TRICK_BITS * k)) & TRICK_CARD_MASK
+        suit = card // 13
+        best_suit = best // 13
+        if suit == best_suit:
+            if card < best:
+                best, best_k = card, k
+        elif suit == trump:
+            best, best_k = card, k
+    return (leader + best_k) % 4
+
+def pack_trick(cards: List[int]) -> int:
+    """
+    Pack the card indices of a partial trick in the order played.
+    """
+    trick = 0
+    for k, card in enumerate(cards):
+        trick |= card << (TRICK_BITS * k)
+    return trick
+
+def unpack_trick(trick: int, trick_len: int) -> List[int]:
+    """
+    Unpack the partial trick into a list of card indices in the order played.
+    """
+    return [(trick >> (TRICK_BITS * k)) & TRICK_CARD_MASK for k in range(trick_len)]
+
+class BitGameState:
+    """
+    Game state of the minimax search. The state stores the four hands, the
+    player who led the current trick, the packed partial trick and the number
+    of tricks won by NORTH-SOUTH. tricks_won is less DEDUCTION for each honour
+    NORTH-SOUTH gave up, deductions is the total taken off so that the whole
+    tricks are tricks_won + deductions. The search plays and takes back cards on a
+    single state: play() pushes what it changes onto the undo stack and
+    undo() pops it, so the memory used does not grow with the search depth.
+
+    The Zobrist key of the remaining hands and the leader is kept up to date
+    as cards are played. It identifies the position at the start of a trick,
+    in the middle of a trick the cards in the trick are not part of the key.
+    """
+    __slots__ = ("hands", "leader", "trick", "trick_len", "tricks_won", "deductions", "key", "_undo")
+
+    def __init__(self, hands: List[int], leader: int,
+                 trick: int = 0, trick_len: int = 0, tricks_won: float = 0, deductions: float = 0) -> None:
+        self.hands = list(hands)
+        self.leader = leader
+        self.trick = trick
+        self.trick_len = trick_len
+        self.tricks_won = tricks_won
+        self.deductions = deductions
+        self.key = zobrist_key(self.hands, leader)
+        self._undo: List[Tuple[int, int, int, int, int, float, float, int]] = []
+
+    @staticmethod
+    def from_game_state(game_state: GameState) -> "BitGameState":
+        """
+        Build the compact state from a GameState.
+        """
+        hands = [cardset_to_bits(cardset) for cardset in game_state._cardsets]
+        partial_trick = game_state._partial_trick
+        if partial_trick is None or len(partial_trick) == 0:
+            leader = game_state.cur_player().position().value
+            return BitGameState(hands, leader, 0, 0, game_state._tricks_won)
+
+        trick = pack_trick([card for _, card in partial_trick])
+        leader = PlayerPosition(partial_trick[0][0]).value
+        return BitGameState(hands, leader, trick, len(partial_trick), game_state._tricks_won)
+
+    def copy(self) -> "BitGameState":
+        """
+        Return an independent copy of the state with an empty undo stack.
+        """
+        return BitGameState(self.hands, self.leader, self.trick, self.trick_len, self.tricks_won, self.deductions)
+
+    def cur_player(self) -> int:
+        """
+        Seat of the player to play the next card.
+        """
+        return (self.leader + self.trick_len) % 4
+
+    def play(self, card: int, trump: int) -> None:
+        """
+        The current player plays the card. The trick is settled when it is
+        the fourth card of the trick.
+        """
+        player = (self.leader + self.trick_len) % 4
+        self._undo.append((player, card, self.leader, self.trick, self.trick_len, self.tricks_won, self.deductions,
+                           self.key))
+        self.hands[player] &= ~(1 << card)
+        self.key ^= ZOBRIST_CARDS[player][card]
+        trick = self.trick | (card << (TRICK_BITS * self.trick_len))
+        trick_len = self.trick_len + 1
+        if trick_len < 4:
+            self.trick = trick
+            self.trick_len = trick_len
+            return
+
+        winner = trick_winner(trick, 4, self.leader, trump)
+        if winner % 2 == 0:
+            self.tricks_won += 1
+        else:
+            for k in range(4):
+                seat = (self.leader + k) % 4
+                card_k = (trick >> (TRICK_BITS * k)) & TRICK_CARD_MASK
+                if seat % 2 == 0 and HONOR_MASK >> card_k & 1:
+                    self.tricks_won -= DEDUCTION
+                    self.deductions += DEDUCTION
+        self.key ^= ZOBRIST_LEADER[self.leader] ^ ZOBRIST_LEADER[winner]
+        self.leader = winner
+        self.trick = 0
+        self.trick_len = 0
+
+    def undo(self) -> None:
+        """
+        Take back the last card played.
+        """
+        player, card, self.leader, self.trick, self.trick_len, self.tricks_won, self.deductions, self.key = \
+            self._undo.pop()
+        self.hands[player] |= 1 << card
+
+class BitGameEnv:
+    """
+    The counterpart of game_env.GameEnv that works on BitGameState.
+    """
+    def __init__(self, contract, collapse_equivalent: bool = False, cache: EvalCache = None) -> None:
+        """
+        @param collapse_equivalent: generate one card of each sequence of
+                                    equivalent cards, see collapse_equivalent().
+        @param cache: cache of the double dummy evaluations, may be shared
+                      with other environments of the same deal.
+        """
+        self._contract = contract
+        self._cache = cache
+        self.trump = trump_index(contract.trump_suit)
+        self.collapse_equivalent = collapse_equivalent
+
+    def is_end(self, state: BitGameState) -> bool:
+        """
+        Check if the game has ended.
+        """
+        hands = state.hands
+        return (hands[0] | hands[1] | hands[2] | hands[3]) == 0
+
+    def get_legal_actions(self, state: BitGameState) -> int:
+        """
+        Get the legal cards of the current player as a 52-bit mask.
+        """
+        player = state.cur_player()
+        moves = legal_moves(state.hands[player], state.trick, state.trick_len)
+        if not self.collapse_equivalent:
+            return moves
+        hands = state.hands
+        live = hands[0] | hands[1] | hands[2] | hands[3]
+        for card in unpack_trick(state.trick, state.trick_len):
+            live |= 1 << card
+        return collapse_equivalent(moves, live, player % 2 == 0)
+
+    def move_to_next_player(self, state: BitGameState, card: int) -> BitGameState:
+        """
+        Generate the successor state by applying the action. The state passed
+        in is left unchanged.
+        """
+        new_state = state.copy()
+        new_state.play(card, self.trump)
+        return new_state
+
+    def play(self, state: BitGameState, card: int) -> None:
+        """
+        Play the card on the state in place, see BitGameState.undo().
+        """
+        state.play(card, self.trump)
+
+    def last_card_to_play(self, state: BitGameState) -> bool:
+        """
+        Check if the current player plays the last card of the trick.
+        """
+        return state.trick_len == 3
+
+    def get_scores(self, state: BitGameState) -> float:
+        """
+        Get the scores of the game. Scores are assigned only at the end of the game.
+        """
+        return state.tricks_won
+
+    def evaluation(self, state: BitGameState) -> float:
+        """
+        Evaluate the state with the double dummy solver. The result is the tricks
+        won by NORTH-SOUTH so far plus the tricks NORTH-SOUTH takes from now on.
+        """
+        cache = self._cache
+        if cache is not None:
+            key = leaf_key(state.hands, state.leader, state.trick, state.trick_len, self.trump)
+            future_tricks = cache.get(key)
+            if future_tricks is not None:
+                return state.tricks_won + future_tricks
+
+        # DDS scores the tricks left, the current trick included, for the side
+        # to play. The player to play has not played to the trick yet, so
+        # their hand holds a card for each of these tricks, also mid-trick.
+        player = state.cur_player()
+        remaining_tricks = count_cards(state.hands[player])
+        cards = [Card.from_code(card) for card in unpack_trick(state.trick, state.trick_len)]
+        scores = DDSEvaluator(self._contract.trump_suit, PlayerPosition(state.leader), cards,
+                              bits_to_remain_cards(state.hands))
+
+        if player % 2 == 0:
+            highest_score = scores.get_highest_scores()
+        else:
+            highest_score = remaining_tricks - scores.get_highest_scores()
+
+        if cache is not None:
+            cache.put(key, highest_score)
+        return state.tricks_won + highest_score
+
+    def prefetch(self, state: BitGameState, depth: int, solver: DDSolver, limit: int = None,
+                 deadline: float = None) -> int:
+        """
+        Collect the positions the search reaches after depth tricks that are
+        not in the cache yet, solve them in batches with SolveAllBoardsBin (which
+        uses all the DDS threads) and store the results in the cache. The
+        search then backs up the cached values. The state is played and taken
+        back in place.
+
+        @param limit: stop collecting positions when there are this many.
+        @param deadline: time.perf_counter() value after which no more
+                         positions are collected and no new batch is solved.
+        @return: the number of positions solved.
+        """
+        cache = self._cache
+        if cache is None:
+            return 0
+        keys: List[int] = []
+        seen = set()
+        positions = []
+
+        def collect(depth: int) -> bool:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            if self.is_end(state):
+                return True
+            if depth == 0:
+                key = leaf_key(state.hands, state.leader, state.trick, state.trick_len, self.trump)
+                if key not in cache and key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+                    player = state.cur_player()
+                    positions.append((player, count_cards(state.hands[player]), (
+                        self.trump, state.leader, unpack_trick(state.trick, state.trick_len),
+                        bits_to_remain_cards(state.hands))))
+                return limit is None or len(keys) < limit
+            next_depth = depth - 1 if state.trick_len == 3 else depth
+            for card in iter_cards(self.get_legal_actions(state)):
+                state.play(card, self.trump)
+                more = collect(next_depth)
+                state.undo()
+                if not more:
+                    return False
+            return True
+
+        collect(depth)
+        if not positions or (deadline is not None and time.perf_counter() > deadline):
+            return 0
+        tricks = solver.solve_positions([position for _, _, position in positions], deadline)
+        for key, (player, remaining_tricks, _), score in zip(keys, positions, tricks):
+            # The same as evaluation()
+            cache.put(key, score if player % 2 == 0 else remaining_tricks - score)
+        return len(tricks)
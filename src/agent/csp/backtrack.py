@@ -7,10 +7,14 @@ the CSP and some helper functions.
 """
 
 import collections
-import copy
+import heapq
+import random
+import time
 from .util import CSP, get_or_variable, CourseBulletin, Profile
 from typing import Dict, List
 
+import numpy as np
+
 ############################################################
 # Problem 0
 
@@ -114,14 +118,25 @@ class BacktrackingSearch:
         # Keep track of the number of times backtrack() gets called.
         self.numOperations = 0
 
+        # Keep track of the number of values whose delta weight was computed.
+        self.numConstraintChecks = 0
+
         # Keep track of the number of operations to get to the very first successful
         # assignment (doesn't have to be optimal).
         self.firstAssignmentNumOperations = 0
 
-        # List of all solutions found.
+        # List of all solutions found, left empty when only the top
+        # assignments are kept.
         self.allAssignments = []
         self.allOptimalAssignments = []
 
+        # The top_k assignments of the largest weights, as (weight, assignment)
+        # from the largest weight, see solve().
+        self.topAssignments = []
+
+        # Keep track of the number of partial assignments cut by branch and bound.
+        self.numPrunedAssignments = 0
+
     def print_stats(self) -> None:
         """
         Prints a message summarizing the outcome of the solver.
@@ -131,59 +146,37 @@ class BacktrackingSearch:
                     with weight {self.optimalWeight} in {self.numOperations} operations')
             print(
                 f'First assignment took {self.firstAssignmentNumOperations} operations')
+            print(f'Checked the constraints of {self.numConstraintChecks} values')
+            if self.branchAndBound:
+                print(f'Pruned {self.numPrunedAssignments} partial assignments')
         else:
             print(
                 "No consistent assignment to the CSP was found. The CSP is not solvable.")
 
-    def get_delta_weight(self, assignment: Dict, var, val) -> float:
+    def get_delta_weights(self, assignment: List[int], var: int) -> np.ndarray:
         """
-        Given a CSP, a partial assignment, and a proposed new value for a variable,
-        return the change of weights after assigning the variable with the proposed
-        value.
+        Given a CSP, a partial assignment, and a variable, return the change of
+        weights after assigning the variable with each value of its domain.
 
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
-        @param var: name of an unassigned variable.
-        @param val: the proposed value.
+        @param assignment: The index of the value assigned to every variable,
+            -1 for the unassigned variables. e.g. if the domain of the variable
+            A is [5,6], and 6 was assigned to it, then assignment[A] == 1.
+        @param var: index of an unassigned variable.
 
-        @return w: Change in weights as a result of the proposed assignment. This
+        @return w: Change in weights as a result of assigning each value. This
             will be used as a multiplier on the current weight.
         """
-        assert var not in assignment
-        w = 1.0
-        if self.csp.unaryFactors[var]:
-            w *= self.csp.unaryFactors[var][val]
-            if w == 0:
-                return w
-        for var2, factor in list(self.csp.binaryFactors[var].items()):
-            if var2 not in assignment:
+        assert assignment[var] < 0
+        w = self.compiled.unaryFactors[var].copy()
+        self.numConstraintChecks += len(w)
+        for var2, factor in self.compiled.binaryFactors[var]:
+            if assignment[var2] < 0:
                 continue  # Not assigned yet
-            w *= factor[val][assignment[var2]]
-            if w == 0:
-                return w
+            w *= factor[:, assignment[var2]]
         return w
 
-    def satisfies_constraints(self, assignment: Dict, var, val) -> bool:
-        """
-        Given a CSP, a partial assignment, and a proposed new value for a variable,
-        return whether or not assigning the variable with the proposed new value
-        still satisfies all of the constraints.
-
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
-        @param var: name of an unassigned variable.
-        @param val: the proposed value.
-
-        @return w: Change in weights as a result of the proposed assignment. This
-            will be used as a multiplier on the current weight.
-        """
-        return self.get_delta_weight(assignment, var, val) != 0
-
-    def solve(self, csp: CSP, mcv: bool = False, ac3: bool = False) -> None:
+    def solve(self, csp: CSP, mcv: bool = False, ac3: bool = False,
+              top_k: int = 0, branch_and_bound: bool = False) -> None:
         """
         Solves the given weighted CSP using heuristics as specified in the
         parameter. Note that unlike a typical unweighted CSP where the search
@@ -195,56 +188,99 @@ class BacktrackingSearch:
         @param mcv: When enabled, Most Constrained Variable heuristics is used.
         @param ac3: When enabled, AC-3 will be used after each assignment of an
             variable is made.
-        """
-        # CSP to be solved.
+        @param top_k: When positive, only the top_k assignments of the largest
+            weights are kept, in topAssignments, instead of every assignment.
+            Use 1 to only keep the optimal assignment.
+        @param branch_and_bound: When enabled, a partial assignment is not
+            explored when its weight times an upper bound of the weight of the
+            unassigned variables is below the weight of the top_k-th assignment
+            found so far. Requires top_k.
+        """
+        if branch_and_bound and top_k <= 0:
+            raise ValueError("Branch and bound needs a positive top_k")
+
+        # CSP to be solved, and the array form the search runs on.
         self.csp = csp
+        self.compiled = csp.compile()
 
         # Set the search heuristics requested asked.
         self.mcv = mcv
         self.ac3 = ac3
+        self.topK = top_k
+        self.branchAndBound = branch_and_bound
+        if branch_and_bound:
+            # The largest weight of every binary factor, for the upper bounds.
+            self.factorMaxima = [[(var2, float(factor.max())) for var2, factor in factors]
+                                 for factors in self.compiled.binaryFactors]
 
         # Reset solutions from previous search.
         self.reset_results()
 
-        # The dictionary of domains of every variable in the CSP.
-        self.domains = {
-            var: list(self.csp.values[var]) for var in self.csp.variables}
+        # The domain of every variable in the CSP, as a mask over its values.
+        self.domains = [np.ones(len(values), dtype=bool) for values in self.compiled.values]
+        # The domains of a single value, units[var][val].
+        self.units = [np.eye(len(values), dtype=bool) for values in self.compiled.values]
+        # The domains and domain sizes replaced by the search, as
+        # (var, mask, size), so that they can be put back when the search
+        # backtracks.
+        self.trail = []
+
+        # The partial assignment the search is on, see backtrack().
+        self.assignment = [-1] * self.compiled.numVars
+        if mcv:
+            # The number of values of the domain of every unassigned variable
+            # that keep a nonzero weight, kept up to date as the variables are
+            # assigned and the domains pruned, and a min-heap of
+            # (size, var) to find the most constrained variable. The heap
+            # entries whose size is out of date are dropped when popped.
+            self.domainSizes = [self.count_domain(var) for var in range(self.compiled.numVars)]
+            self.mcvHeap = [(size, var) for var, size in enumerate(self.domainSizes)]
+            heapq.heapify(self.mcvHeap)
+
+        # Min-heap of (weight, numAssignments, assignment) of the top
+        # assignments.
+        self.topHeap = []
 
         # Perform backtracking search.
-        self.backtrack({}, 0, 1)
+        self.backtrack(self.assignment, 0, 1)
+        self.topAssignments = [(weight, assignment) for weight, _, assignment in
+                               sorted(self.topHeap, reverse=True)]
         # Print summary of solutions.
         self.print_stats()
 
-    def backtrack(self, assignment: Dict, numAssigned: int, weight: float) -> None:
+    def backtrack(self, assignment: List[int], numAssigned: int, weight: float) -> None:
         """
         Perform the back-tracking algorithms to find all possible solutions to
         the CSP.
 
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
+        @param assignment: The index of the value assigned to every variable,
+            -1 for the unassigned variables, see get_delta_weights().
         @param numAssigned: Number of currently assigned variables
         @param weight: The weight of the current partial assignment.
         """
 
         self.numOperations += 1
         assert weight > 0
-        if numAssigned == self.csp.numVars:
+        if numAssigned == self.compiled.numVars:
             # A satisfiable solution have been found. Update the statistics.
             self.numAssignments += 1
-            newAssignment = {}
-            for var in self.csp.variables:
-                newAssignment[var] = assignment[var]
-            self.allAssignments.append(newAssignment)
+            if self.topK > 0:
+                self.keep_top_assignment(assignment, weight)
+                if len(self.optimalAssignment) > 0 and weight < self.optimalWeight:
+                    return
+            newAssignment = self.compiled.get_values(assignment)
+            if self.topK <= 0:
+                self.allAssignments.append(newAssignment)
 
             if len(self.optimalAssignment) == 0 or weight >= self.optimalWeight:
                 if weight == self.optimalWeight:
                     self.numOptimalAssignments += 1
-                    self.allOptimalAssignments.append(newAssignment)
+                    if self.topK <= 0:
+                        self.allOptimalAssignments.append(newAssignment)
                 else:
                     self.numOptimalAssignments = 1
-                    self.allOptimalAssignments = [newAssignment]
+                    if self.topK <= 0:
+                        self.allOptimalAssignments = [newAssignment]
                 self.optimalWeight = weight
 
                 self.optimalAssignment = newAssignment
@@ -252,111 +288,199 @@ class BacktrackingSearch:
                     self.firstAssignmentNumOperations = self.numOperations
             return
 
+        if self.branchAndBound and \
+                weight * self.get_upper_bound(assignment) < self.get_incumbent_weight():
+            # No assignment below this one can make the top assignments.
+            self.numPrunedAssignments += 1
+            return
+
         # Select the next variable to be assigned.
         var = self.get_unassigned_variable(assignment)
-        # Get an ordering of the values.
-        ordered_values = self.domains[var]
+        # Get the values of the domain that keep a nonzero weight, in order.
+        weights = self.get_delta_weights(assignment, var)
+        ordered_values = np.flatnonzero(self.domains[var] & (weights > 0)).tolist()
 
         # Continue the backtracking recursion using |var| and |ordered_values|.
         if not self.ac3:
             # When arc consistency check is not enabled.
             for val in ordered_values:
-                deltaWeight = self.get_delta_weight(assignment, var, val)
-                if deltaWeight > 0:
-                    assignment[var] = val
-                    self.backtrack(assignment, numAssigned +
-                                   1, weight * deltaWeight)
-                    del assignment[var]
+                assignment[var] = val
+                mark = len(self.trail)
+                # MCV has no choice to make for the last variable
+                if self.mcv and numAssigned + 2 < self.compiled.numVars:
+                    self.update_neighbor_sizes(var)
+                self.backtrack(assignment, numAssigned +
+                               1, weight * float(weights[val]))
+                self.undo_trail(mark)
+            assignment[var] = -1
         else:
             # Arc consistency check is enabled. This is helpful to speed up 3c.
             for val in ordered_values:
-                deltaWeight = self.get_delta_weight(assignment, var, val)
-                if deltaWeight > 0:
-                    assignment[var] = val
-                    # create a deep copy of domains as we are going to look
-                    # ahead and change domain values
-                    localCopy = copy.deepcopy(self.domains)
-                    # fix value for the selected variable so that hopefully we
-                    # can eliminate values for other variables
-                    self.domains[var] = [val]
-
-                    # enforce arc consistency
+                assignment[var] = val
+                # remember where the trail is as we are going to look
+                # ahead and change domain values
+                mark = len(self.trail)
+                # fix value for the selected variable so that hopefully we
+                # can eliminate values for other variables
+                self.fix_value(var, val)
+                # MCV has no choice to make for the last variable
+                if self.mcv and numAssigned + 2 < self.compiled.numVars:
+                    self.update_neighbor_sizes(var)
+
+                # enforce arc consistency, unless no variable is left
+                if numAssigned + 1 < self.compiled.numVars:
                     self.apply_arc_consistency(var)
 
-                    self.backtrack(assignment, numAssigned +
-                                   1, weight * deltaWeight)
-                    # restore the previous domains
-                    self.domains = localCopy
-                    del assignment[var]
+                self.backtrack(assignment, numAssigned +
+                               1, weight * float(weights[val]))
+                # restore the previous domains
+                self.undo_trail(mark)
+            assignment[var] = -1
+        if self.mcv:
+            # var is a candidate again
+            heapq.heappush(self.mcvHeap, (self.domainSizes[var], var))
 
-    def get_unassigned_variable(self, assignment: Dict):
+    def keep_top_assignment(self, assignment: List[int], weight: float) -> None:
+        """
+        Add a complete assignment to the top assignments if its weight is at
+        least the smallest one kept. Like the optimal assignment, an assignment
+        replaces the ones of the same weight found before it.
+        """
+        if len(self.topHeap) < self.topK:
+            heapq.heappush(self.topHeap, (weight, self.numAssignments, self.compiled.get_values(assignment)))
+        elif weight >= self.topHeap[0][0]:
+            heapq.heapreplace(self.topHeap, (weight, self.numAssignments, self.compiled.get_values(assignment)))
+
+    def get_incumbent_weight(self) -> float:
+        """
+        The weight a complete assignment needs to make the top assignments.
+        """
+        if len(self.topHeap) < self.topK:
+            return 0
+        return self.topHeap[0][0]
+
+    def get_upper_bound(self, assignment: List[int]) -> float:
+        """
+        An upper bound of the weight the unassigned variables can multiply the
+        partial assignment by: the largest delta weight of every unassigned
+        variable given the assigned ones, times the largest weight of every
+        binary factor between two unassigned variables.
+        """
+        bound = 1.0
+        for var in range(self.compiled.numVars):
+            if assignment[var] >= 0:
+                continue
+            weights = self.get_delta_weights(assignment, var)[self.domains[var]]
+            if weights.size == 0:
+                return 0
+            bound *= float(weights.max())
+            for var2, factorMax in self.factorMaxima[var]:
+                if var2 > var and assignment[var2] < 0:
+                    bound *= factorMax
+        return bound
+
+    def get_unassigned_variable(self, assignment: List[int]) -> int:
         """
         Given a partial assignment, return a currently unassigned variable.
 
-        @param assignment: A dictionary of current assignment. This is the same as
-            what you've seen so far.
+        @param assignment: The partial assignment, see get_delta_weights().
 
-        @return var: a currently unassigned variable. The type of the variable
-            depends on what was added with csp.add_variable
+        @return var: the index of a currently unassigned variable.
         """
 
         if not self.mcv:
             # Select a variable without any heuristics.
-            for var in self.csp.variables:
-                if var not in assignment:
-                    return var
+            return assignment.index(-1)
         else:
-            # Problem 1b
             # Heuristic: most constrained variable (MCV)
-            # Select a variable with the least number of remaining domain values.
-            # Hint: given var, self.domains[var] gives you all the possible values.
-            #       Make sure you're finding the domain of the right variable!
-            # Hint: satisfies_constraints determines whether or not assigning a
-            #       variable to some value given a partial assignment continues
-            #       to satisfy all constraints.
-            # Hint: for ties, choose the variable with lowest index in self.csp.variables
-            # BEGIN_YOUR_CODE (our solution is 13 lines of code, but don't worry if you deviate from this)
-            mcv = (None, float('inf'))
-            for var in self.csp.variables:
-                if var in assignment:
-                    continue
-                domain_size = 0
-                for val in self.domains[var]:
-                    if self.satisfies_constraints(assignment, var, val):
-                        domain_size += 1
-                
-                if domain_size < mcv[1]:
-                    mcv = (var, domain_size)
-            
-            return mcv[0]
-            # END_YOUR_CODE
+            # Select a variable with the least number of remaining domain
+            # values that keep a nonzero weight. For ties, choose the variable
+            # with lowest index.
+            heap = self.mcvHeap
+            if len(heap) > 4 * self.compiled.numVars:
+                # Too many entries are out of date
+                heap[:] = [(self.domainSizes[var], var) for var in range(self.compiled.numVars)
+                           if assignment[var] < 0]
+                heapq.heapify(heap)
+            while True:
+                size, var = heapq.heappop(heap)
+                if assignment[var] < 0 and size == self.domainSizes[var]:
+                    return var
 
-    def apply_arc_consistency(self, var) -> None:
+    def count_domain(self, var: int) -> int:
+        """
+        The number of values of the domain of the variable that keep a nonzero
+        weight given the current assignment.
+        """
+        weights = self.get_delta_weights(self.assignment, var)
+        return int(np.count_nonzero(weights[self.domains[var]]))
+
+    def set_domain_size(self, var: int) -> None:
+        """
+        Recount the domain of an unassigned variable for MCV.
+        """
+        size = self.count_domain(var)
+        if size != self.domainSizes[var]:
+            self.domainSizes[var] = size
+            heapq.heappush(self.mcvHeap, (size, var))
+
+    def update_neighbor_sizes(self, var: int) -> None:
+        """
+        Recount the domains of the unassigned neighbors of a variable that has
+        just been assigned, and record the previous sizes on the trail.
+        """
+        for var2, _ in self.compiled.binaryFactors[var]:
+            if self.assignment[var2] < 0:
+                self.trail.append((var2, self.domains[var2], self.domainSizes[var2]))
+                self.set_domain_size(var2)
+
+    def restrict_domain(self, var: int, mask: np.ndarray) -> None:
+        """
+        Replace the domain of the variable and record the previous domain on
+        the trail.
+        """
+        self.trail.append((var, self.domains[var], self.domainSizes[var] if self.mcv else 0))
+        self.domains[var] = mask
+        if self.mcv and self.assignment[var] < 0:
+            self.set_domain_size(var)
+
+    def fix_value(self, var: int, val: int) -> None:
+        """
+        Remove every value but val from the domain of the variable.
+        """
+        self.restrict_domain(var, self.units[var][val])
+
+    def undo_trail(self, mark: int) -> None:
+        """
+        Put back the domains and domain sizes replaced since the trail had
+        mark entries.
+        """
+        trail = self.trail
+        while len(trail) > mark:
+            var, mask, size = trail.pop()
+            self.domains[var] = mask
+            if self.mcv and size != self.domainSizes[var]:
+                self.domainSizes[var] = size
+                heapq.heappush(self.mcvHeap, (size, var))
+
+    def apply_arc_consistency(self, var: int) -> None:
         """
         Perform the AC-3 algorithm. The goal is to reduce the size of the
         domain values for the unassigned variables based on arc consistency.
 
         @param var: The variable whose value has just been set.
         """
-
-        def remove_inconsistent_values(var1, var2):
-            removed = False
-            # the binary factor must exist because we add var1 from var2's neighbor
-            factor = self.csp.binaryFactors[var1][var2]
-            for val1 in list(self.domains[var1]):
-                # Note: in our implementation, it's actually unnecessary to check unary factors,
-                #       because in get_delta_weight() unary factors are always checked.
-                if (self.csp.unaryFactors[var1] and self.csp.unaryFactors[var1][val1] == 0) or \
-                        all(factor[val1][val2] == 0 for val2 in self.domains[var2]):
-                    self.domains[var1].remove(val1)
-                    removed = True
-            return removed
-
-        queue = [var]
+        queue = collections.deque([var])
         while len(queue) > 0:
-            curr = queue.pop(0)
-            for neighbor in self.csp.get_neighbor_vars(curr):
-                if remove_inconsistent_values(neighbor, curr):
+            curr = queue.popleft()
+            for neighbor, _ in self.compiled.binaryFactors[curr]:
+                # Keep the values of neighbor with a nonzero unary weight and
+                # a nonzero binary weight with some value left for curr
+                support = self.compiled.supports[neighbor][curr]
+                mask = self.domains[neighbor] & (self.compiled.unaryFactors[neighbor] != 0) & \
+                    support[:, self.domains[curr]].any(axis=1)
+                if np.count_nonzero(mask) < np.count_nonzero(self.domains[neighbor]):
+                    self.restrict_domain(neighbor, mask)
                     queue.append(neighbor)
 
 
@@ -435,16 +559,22 @@ class BeamSearch:
         self.numOptimalAssignments = 0
         self.numAssignments = 0
 
-        # Keep track of the number of times backtrack() gets called.
+        # Keep track of the number of partial assignments expanded.
         self.numOperations = 0
 
         # Keep track of the number of operations to get to the very first successful
         # assignment (doesn't have to be optimal).
         self.firstAssignmentNumOperations = 0
 
-        # List of all solutions found.
+        # List of all solutions found, the complete assignments left in the
+        # beam, and their weights.
         self.allAssignments = []
         self.allOptimalAssignments = []
+        self.allWeights = []
+
+        # Whether the deadline passed before the last level, the beam then
+        # narrowed down to its best partial assignment.
+        self.timedOut = False
 
     def print_stats(self) -> None:
         """
@@ -455,73 +585,52 @@ class BeamSearch:
                     with weight {self.optimalWeight} in {self.numOperations} operations')
             print(
                 f'First assignment took {self.firstAssignmentNumOperations} operations')
+            if self.timedOut:
+                print('The deadline passed, the assignment was completed greedily')
         else:
             print(
                 "No consistent assignment to the CSP was found. The CSP is not solvable.")
 
-    def get_delta_weight(self, assignment: Dict, var, val) -> float:
+    def get_delta_weights(self, assignments: np.ndarray, var: int) -> np.ndarray:
         """
-        Given a CSP, a partial assignment, and a proposed new value for a variable,
-        return the change of weights after assigning the variable with the proposed
-        value.
+        Return the change of weights after assigning the variable with each
+        value of its domain, for every partial assignment of the beam.
 
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
-        @param var: name of an unassigned variable.
-        @param val: the proposed value.
+        @param assignments: A (beam, numVars) array of the index of the value
+            assigned to every variable, -1 for the unassigned variables. The
+            partial assignments of a beam all assign the same variables.
+        @param var: index of an unassigned variable.
 
-        @return w: Change in weights as a result of the proposed assignment. This
-            will be used as a multiplier on the current weight.
+        @return w: A (beam, values) array, w[b][val] is the multiplier on the
+            weight of the b-th partial assignment when var is assigned val.
         """
-        assert var not in assignment
-        w = 1.0
-        if self.csp.unaryFactors[var]:
-            w *= self.csp.unaryFactors[var][val]
-            if w == 0:
-                return w
-        for var2, factor in list(self.csp.binaryFactors[var].items()):
-            if var2 not in assignment:
+        w = np.repeat(self.compiled.unaryFactors[var][None, :], len(assignments), axis=0)
+        for var2, factor in self.compiled.binaryFactors[var]:
+            if assignments[0, var2] < 0:
                 continue  # Not assigned yet
-            w *= factor[val][assignment[var2]]
-            if w == 0:
-                return w
+            w *= factor[:, assignments[:, var2]].T
         return w
 
-    def satisfies_constraints(self, assignment: Dict, var, val) -> bool:
+    def solve(self, csp: CSP, mcv: bool = False, ac3: bool = False, deadline: float = None) -> None:
         """
-        Given a CSP, a partial assignment, and a proposed new value for a variable,
-        return whether or not assigning the variable with the proposed new value
-        still satisfies all of the constraints.
-
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
-        @param var: name of an unassigned variable.
-        @param val: the proposed value.
-
-        @return w: Change in weights as a result of the proposed assignment. This
-            will be used as a multiplier on the current weight.
-        """
-        return self.get_delta_weight(assignment, var, val) != 0
-
-    def solve(self, csp: CSP, mcv: bool = False, ac3: bool = False) -> None:
-        """
-        Solves the given weighted CSP using heuristics as specified in the
-        parameter. Note that unlike a typical unweighted CSP where the search
-        terminates when one solution is found, we want this function to find
-        all possible assignments. The results are stored in the variables
-        described in reset_result().
+        Solves the given weighted CSP with a beam search: the variables are
+        assigned one level at a time, and only the beam_width partial
+        assignments of the largest weights are extended to the next level.
+        The results are stored in the variables described in reset_result().
 
         @param csp: A weighted CSP.
-        @param mcv: When enabled, Most Constrained Variable heuristics is used.
-        @param ac3: When enabled, AC-3 will be used after each assignment of an
-            variable is made.
-        """
-        # CSP to be solved.
+        @param mcv: When enabled, each level assigns the variable with the
+            fewest values that keep a nonzero weight over the beam.
+        @param ac3: When enabled, the extensions that leave an unassigned
+            neighbor without a value of nonzero weight are dropped before the
+            beam is cut, a one step look-ahead.
+        @param deadline: A time.perf_counter() value. Past it, the search keeps
+            only its best partial assignment and completes it greedily, so
+            that an assignment is still returned (anytime).
+        """
+        # CSP to be solved, and the array form the search runs on.
         self.csp = csp
+        self.compiled = csp.compile()
 
         # Set the search heuristics requested asked.
         self.mcv = mcv
@@ -530,169 +639,95 @@ class BeamSearch:
         # Reset solutions from previous search.
         self.reset_results()
 
-        # The dictionary of domains of every variable in the CSP.
-        self.domains = {
-            var: list(self.csp.values[var]) for var in self.csp.variables}
-
-        # Perform backtracking search.
-        self.backtrack({}, 0, 1)
-        # Print summary of solutions.
-        self.print_stats()
+        numVars = self.compiled.numVars
+        assignments = np.full((1, numVars), -1, dtype=int)
+        weights = np.ones(1)
+        for _ in range(numVars):
+            if not self.timedOut and deadline is not None and time.perf_counter() > deadline:
+                self.timedOut = True
+            width = 1 if self.timedOut else self.beam_width
+            self.numOperations += len(assignments)
+
+            var = self.get_unassigned_variable(assignments)
+            candidates = weights[:, None] * self.get_delta_weights(assignments, var)
+            if self.ac3:
+                candidates *= self.look_ahead(assignments, var)
+
+            # Keep the top values, the first partial assignments and values
+            # first on ties
+            flat = candidates.ravel()
+            order = np.argsort(-flat, kind='stable')[:width]
+            order = order[flat[order] > 0]
+            if len(order) == 0:
+                break
+            rows, vals = np.divmod(order, candidates.shape[1])
+            assignments = assignments[rows]
+            assignments[:, var] = vals
+            weights = flat[order]
+        else:
+            self.record_assignments(assignments, weights)
 
-    def backtrack(self, assignment: Dict, numAssigned: int, weight: float) -> None:
+    def record_assignments(self, assignments: np.ndarray, weights: np.ndarray) -> None:
         """
-        Perform the back-tracking algorithms to find all possible solutions to
-        the CSP.
-
-        @param assignment: A dictionary of current assignment. Unassigned variables
-            do not have entries, while an assigned variable has the assigned value
-            as value in dictionary. e.g. if the domain of the variable A is [5,6],
-            and 6 was assigned to it, then assignment[A] == 6.
-        @param numAssigned: Number of currently assigned variables
-        @param weight: The weight of the current partial assignment.
+        Keep the complete assignments of the beam as the solutions.
         """
+        self.firstAssignmentNumOperations = self.numOperations
+        self.numAssignments = len(assignments)
+        self.allAssignments = [self.compiled.get_values(assignment.tolist()) for assignment in assignments]
+        self.allWeights = weights.tolist()
+        # The beam is sorted by weight
+        self.optimalWeight = self.allWeights[0]
+        self.optimalAssignment = self.allAssignments[0]
+        self.allOptimalAssignments = [assignment for assignment, weight in
+                                      zip(self.allAssignments, self.allWeights) if weight == self.optimalWeight]
+        self.numOptimalAssignments = len(self.allOptimalAssignments)
 
-        self.numOperations += 1
-        assert weight > 0
-        if numAssigned == self.csp.numVars:
-            # A satisfiable solution have been found. Update the statistics.
-            self.numAssignments += 1
-            newAssignment = {}
-            for var in self.csp.variables:
-                newAssignment[var] = assignment[var]
-            self.allAssignments.append(newAssignment)
-
-            if len(self.optimalAssignment) == 0 or weight >= self.optimalWeight:
-                if weight == self.optimalWeight:
-                    self.numOptimalAssignments += 1
-                    self.allOptimalAssignments.append(newAssignment)
-                else:
-                    self.numOptimalAssignments = 1
-                    self.allOptimalAssignments = [newAssignment]
-                self.optimalWeight = weight
-
-                self.optimalAssignment = newAssignment
-                if self.firstAssignmentNumOperations == 0:
-                    self.firstAssignmentNumOperations = self.numOperations
-            return
-
-        # Select the next variable to be assigned.
-        var = self.get_unassigned_variable(assignment)
-        # Get an ordering of the values.
-        ordered_values = self.domains[var]
-
-        deltaWeights = []
-
-        # Continue the backtracking recursion using |var| and |ordered_values|.
-        if not self.ac3:
-            # When arc consistency check is not enabled.
-            for val in ordered_values:
-                deltaWeight = self.get_delta_weight(assignment, var, val)
-                if deltaWeight > 0:
-                    deltaWeights.append((val, deltaWeight))
-            
-            # Keep only the top K values
-            deltaWeights = sorted(deltaWeights, key=lambda x: x[1], reverse=True)[:self.beam_width]
-            for val, deltaWeight in deltaWeights:
-                assignment[var] = val
-                self.backtrack(assignment, numAssigned + 1, weight * deltaWeight)
-                del assignment[var]
-        else:
-            # Arc consistency check is enabled. This is helpful to speed up 3c.
-            for val in ordered_values:
-                deltaWeight = self.get_delta_weight(assignment, var, val)
-                if deltaWeight > 0:
-                    deltaWeights.append((val, deltaWeight))
-
-            # Keep only the top K values
-            deltaWeights = sorted(deltaWeights, key=lambda x: x[1], reverse=True)[:self.beam_width]
-            for val, deltaWeight in deltaWeights:
-                assignment[var] = val
-                # create a deep copy of domains as we are going to look
-                # ahead and change domain values
-                localCopy = copy.deepcopy(self.domains)
-                # fix value for the selected variable so that hopefully we
-                # can eliminate values for other variables
-                self.domains[var] = [val]
-
-                # enforce arc consistency
-                self.apply_arc_consistency(var)
-
-                self.backtrack(assignment, numAssigned +
-                                1, weight * deltaWeight)
-                # restore the previous domains
-                self.domains = localCopy
-                del assignment[var]
-
-    def get_unassigned_variable(self, assignment: Dict):
+    def get_unassigned_variable(self, assignments: np.ndarray) -> int:
         """
-        Given a partial assignment, return a currently unassigned variable.
+        Return the variable the next level of the beam assigns.
 
-        @param assignment: A dictionary of current assignment. This is the same as
-            what you've seen so far.
+        @param assignments: The partial assignments of the beam, see
+            get_delta_weights().
 
-        @return var: a currently unassigned variable. The type of the variable
-            depends on what was added with csp.add_variable
+        @return var: the index of a currently unassigned variable.
         """
-
+        unassigned = np.flatnonzero(assignments[0] < 0)
         if not self.mcv:
             # Select a variable without any heuristics.
-            for var in self.csp.variables:
-                if var not in assignment:
-                    return var
-        else:
-            # Problem 1b
-            # Heuristic: most constrained variable (MCV)
-            # Select a variable with the least number of remaining domain values.
-            # Hint: given var, self.domains[var] gives you all the possible values.
-            #       Make sure you're finding the domain of the right variable!
-            # Hint: satisfies_constraints determines whether or not assigning a
-            #       variable to some value given a partial assignment continues
-            #       to satisfy all constraints.
-            # Hint: for ties, choose the variable with lowest index in self.csp.variables
-            # BEGIN_YOUR_CODE (our solution is 13 lines of code, but don't worry if you deviate from this)
-            mcv = (None, float('inf'))
-            for var in self.csp.variables:
-                if var in assignment:
-                    continue
-                domain_size = 0
-                for val in self.domains[var]:
-                    if self.satisfies_constraints(assignment, var, val):
-                        domain_size += 1
-                
-                if domain_size < mcv[1]:
-                    mcv = (var, domain_size)
-            
-            return mcv[0]
-            # END_YOUR_CODE
-
-    def apply_arc_consistency(self, var) -> None:
-        """
-        Perform the AC-3 algorithm. The goal is to reduce the size of the
-        domain values for the unassigned variables based on arc consistency.
-
-        @param var: The variable whose value has just been set.
-        """
-
-        def remove_inconsistent_values(var1, var2):
-            removed = False
-            # the binary factor must exist because we add var1 from var2's neighbor
-            factor = self.csp.binaryFactors[var1][var2]
-            for val1 in list(self.domains[var1]):
-                # Note: in our implementation, it's actually unnecessary to check unary factors,
-                #       because in get_delta_weight() unary factors are always checked.
-                if (self.csp.unaryFactors[var1] and self.csp.unaryFactors[var1][val1] == 0) or \
-                        all(factor[val1][val2] == 0 for val2 in self.domains[var2]):
-                    self.domains[var1].remove(val1)
-                    removed = True
-            return removed
-
-        queue = [var]
-        while len(queue) > 0:
-            curr = queue.pop(0)
-            for neighbor in self.csp.get_neighbor_vars(curr):
-                if remove_inconsistent_values(neighbor, curr):
-                    queue.append(neighbor)
+            return int(unassigned[0])
+        # Heuristic: most constrained variable (MCV)
+        # Select the variable with the least number of values that keep a
+        # nonzero weight for some partial assignment of the beam. For ties,
+        # choose the variable with lowest index.
+        sizes = [np.count_nonzero((self.get_delta_weights(assignments, var) > 0).any(axis=0))
+                 for var in unassigned]
+        return int(unassigned[np.argmin(sizes)])
+
+    def look_ahead(self, assignments: np.ndarray, var: int) -> np.ndarray:
+        """
+        Return a (beam, values) mask of the values of var that leave every
+        unassigned neighbor some value of nonzero weight.
+        """
+        mask = np.ones((len(assignments), len(self.compiled.values[var])), dtype=bool)
+        for neighbor, _ in self.compiled.binaryFactors[var]:
+            if assignments[0, neighbor] >= 0:
+                continue
+            # The values of the neighbor possible before var is assigned,
+            # then the ones supported by each value of var
+            possible = self.get_delta_weights(assignments, neighbor) > 0
+            support = self.compiled.supports[neighbor][var]
+            mask &= (possible.astype(int) @ support.astype(int)) > 0
+        return mask
+
+    def sample(self, rng: random.Random = random) -> Dict:
+        """
+        Draw one of the complete assignments of the beam with a probability
+        proportional to its weight, or return an empty assignment when the
+        search found none.
+        """
+        if not self.allAssignments:
+            return {}
+        return rng.choices(self.allAssignments, weights=self.allWeights)[0]
 
 
 ############################################################
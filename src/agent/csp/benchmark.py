@@ -0,0 +1,121 @@
+"""
+benchmark.py
+------------
+
+Times BacktrackingSearch on the CSPs that CSPAssignerV2 builds for random
+deals, against the former search that deep copied all the domains at every
+assignment, and checks that both find the same assignment.
+
+Run from src with: python -m agent.csp.benchmark [num_deals]
+"""
+
+import contextlib
+import copy
+import io
+import random
+import sys
+import time
+
+from agent.assigners.csp_assigner_v2 import CSPAssignerV2
+from agent.card_stats import CardSuit, PlayerPosition
+from .backtrack import BacktrackingSearch
+
+class RescanSearch(BacktrackingSearch):
+    """
+    Selects the most constrained variable by counting the domain of every
+    unassigned variable at every node, as the search did before the domain
+    sizes were kept up to date.
+    """
+    def get_unassigned_variable(self, assignment):
+        if not self.mcv:
+            return super().get_unassigned_variable(assignment)
+        mcv = (None, float('inf'))
+        for var in range(self.compiled.numVars):
+            if assignment[var] >= 0:
+                continue
+            domain_size = self.count_domain(var)
+            if domain_size < mcv[1]:
+                mcv = (var, domain_size)
+        return mcv[0]
+
+    def set_domain_size(self, var: int) -> None:
+        pass
+
+    def update_neighbor_sizes(self, var: int) -> None:
+        pass
+
+class DeepCopySearch(RescanSearch):
+    """
+    Saves and restores all the domains around every assignment, as the
+    search did before the trail.
+    """
+    def restrict_domain(self, var: int, mask) -> None:
+        self.domains[var] = mask
+
+    def fix_value(self, var: int, val: int) -> None:
+        self.trail.append(copy.deepcopy(self.domains))
+        super().fix_value(var, val)
+
+    def undo_trail(self, mark: int) -> None:
+        if len(self.trail) > mark:
+            self.domains = self.trail.pop()
+
+def random_csps(num_deals: int, seed: int = 0):
+    """
+    Yield the CSPs of random deals where the two hidden hands are full and
+    each bid a random suit, or nothing.
+    """
+    rng = random.Random(seed)
+    suits = [CardSuit.SPADES, CardSuit.HEARTS, CardSuit.DIAMONDS, CardSuit.CLUBS, None]
+    for _ in range(num_deals):
+        unseen_cards = set(rng.sample(range(52), 26))
+        player_stats = {PlayerPosition.EAST: (13, rng.choice(suits)),
+                        PlayerPosition.WEST: (13, rng.choice(suits))}
+        suit_counts = {suit: 0 for suit in suits[:4]}
+        honor_counts = {suit: 0 for suit in suits[:4]}
+        for card in unseen_cards:
+            suit = CardSuit(card // 13)
+            suit_counts[suit] += 1
+            honor_counts[suit] += card % 13 <= 3
+        assigner = CSPAssignerV2(unseen_cards, player_stats, {}, (suit_counts, honor_counts))
+        assigner.add_constraints()
+        yield assigner._csp
+
+def time_search(search_class, csps, **options):
+    """
+    Solve every CSP, return the total time, the optimal assignments, the
+    total number of operations and of constraint checks. The options are
+    passed to solve().
+    """
+    assignments = []
+    elapsed = 0.0
+    operations = checks = 0
+    for csp in csps:
+        solver = search_class()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.solve(csp, mcv=True, ac3=True, **options)
+        elapsed += time.perf_counter() - start
+        assignments.append((solver.optimalAssignment, solver.optimalWeight))
+        operations += solver.numOperations
+        checks += solver.numConstraintChecks
+    return elapsed, assignments, operations, checks
+
+def main(num_deals: int = 50) -> None:
+    csps = list(random_csps(num_deals))
+    searches = [("deepcopy", DeepCopySearch, {}),
+                ("rescan mcv", RescanSearch, {}),
+                ("trail", BacktrackingSearch, {}),
+                ("best only with branch and bound", BacktrackingSearch, {"top_k": 1, "branch_and_bound": True})]
+    print(f"{num_deals} deals, {sum(len(csp.variables) for csp in csps) / num_deals:.1f} variables per CSP")
+    expected = None
+    for name, search_class, options in searches:
+        elapsed, assignments, operations, checks = time_search(search_class, csps, **options)
+        if expected is None:
+            expected = assignments
+        elif assignments != expected:
+            raise AssertionError(f"The {name} search disagrees")
+        print(f"{name}: {elapsed * 1000:.1f} ms, {operations} operations, {checks} constraint checks")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
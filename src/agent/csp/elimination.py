@@ -0,0 +1,187 @@
+"""
+elimination.py
+--------------
+
+Exact variable elimination for CSPs whose factor graph is a forest, such as
+the ones CSPAssignerV2 builds. Unlike BacktrackingSearch, the solve runs in
+time linear in the number of variables: the messages are passed once from
+the leaves to the roots (max-product for the MAP assignment, sum-product for
+the marginals) and once back down for the marginals.
+"""
+
+import random
+from typing import Dict
+
+import numpy as np
+
+from .util import CSP
+
+class VariableElimination:
+    def reset_results(self) -> None:
+        """
+        Resets the results of the previous solve.
+        """
+        # The assignment of the maximum weight and its weight, the assignment
+        # is empty when every assignment has a zero weight.
+        self.optimalAssignment = {}
+        self.optimalWeight = 0
+
+        # The marginal distribution of every variable, marginals[var][val] is
+        # the total weight of the assignments with var == val divided by the
+        # total weight of all assignments.
+        self.marginals = {}
+
+    def print_stats(self) -> None:
+        """
+        Prints a message summarizing the outcome of the solver.
+        """
+        if self.optimalAssignment:
+            print(f'Found the optimal assignment with weight {self.optimalWeight} '
+                  f'over {len(self.roots)} trees')
+        else:
+            print("No consistent assignment to the CSP was found. The CSP is not solvable.")
+
+    def solve(self, csp: CSP) -> None:
+        """
+        Compute the MAP assignment and the marginals of the CSP. The results
+        are stored in the variables described in reset_results().
+
+        @param csp: A weighted CSP whose binary factors form a forest.
+        """
+        self.csp = csp
+        self.compiled = csp.compile()
+        self.reset_results()
+
+        self.build_forest()
+        self.pass_messages_up()
+        self.find_optimal_assignment()
+        self.pass_messages_down()
+
+    def build_forest(self) -> None:
+        """
+        Root every tree of the factor graph at its variable of lowest index and
+        order the variables so that every parent comes before its children.
+
+        The factor table between a variable and its parent is kept as
+        parentFactors[var][val][parent_val].
+        """
+        numVars = self.compiled.numVars
+        self.parents = [-1] * numVars
+        self.children = [[] for _ in range(numVars)]
+        self.parentFactors = [None] * numVars
+        self.roots = []
+        self.order = []
+
+        visited = [False] * numVars
+        for root in range(numVars):
+            if visited[root]:
+                continue
+            self.roots.append(root)
+            visited[root] = True
+            queue = [root]
+            for var in queue:
+                self.order.append(var)
+                for var2, factor in self.compiled.binaryFactors[var]:
+                    if var2 == self.parents[var]:
+                        self.parentFactors[var] = factor
+                        continue
+                    if visited[var2]:
+                        raise ValueError(f"The CSP is not a forest, {self.compiled.variables[var2]} is on a cycle")
+                    visited[var2] = True
+                    self.parents[var2] = var
+                    self.children[var].append(var2)
+                    queue.append(var2)
+
+    def pass_messages_up(self) -> None:
+        """
+        Compute the belief of every subtree from the leaves up. beliefs[var] is
+        the sum-product and maxBeliefs[var] the max-product over the subtree of
+        var for every value of var. bestValues[var][parent_val] is the value of
+        var in the best assignment of its subtree given the value of its parent.
+        """
+        numVars = self.compiled.numVars
+        self.beliefs = [None] * numVars
+        self.maxBeliefs = [None] * numVars
+        self.upMessages = [None] * numVars
+        self.upMaxMessages = [None] * numVars
+        self.bestValues = [None] * numVars
+
+        for var in reversed(self.order):
+            belief = self.compiled.unaryFactors[var].copy()
+            maxBelief = belief.copy()
+            for child in self.children[var]:
+                belief *= self.upMessages[child]
+                maxBelief *= self.upMaxMessages[child]
+            self.beliefs[var] = belief
+            self.maxBeliefs[var] = maxBelief
+
+            if self.parents[var] < 0:
+                continue
+            factor = self.parentFactors[var]
+            # The sum-product messages are normalized as only their ratios
+            # matter, which keeps deep trees from underflowing
+            self.upMessages[var] = normalize(factor.T @ belief)
+            weights = factor * maxBelief[:, None]
+            self.bestValues[var] = np.argmax(weights, axis=0)
+            self.upMaxMessages[var] = weights.max(axis=0)
+
+    def find_optimal_assignment(self) -> None:
+        """
+        Pick the best value of every root and follow bestValues down the
+        trees. Ties go to the first value of the domain.
+        """
+        assignment = [-1] * self.compiled.numVars
+        weight = 1.0
+        for root in self.roots:
+            assignment[root] = int(np.argmax(self.maxBeliefs[root]))
+            weight *= float(self.maxBeliefs[root][assignment[root]])
+        if weight == 0:
+            return
+        for var in self.order:
+            if self.parents[var] >= 0:
+                assignment[var] = int(self.bestValues[var][assignment[self.parents[var]]])
+        self.optimalAssignment = self.compiled.get_values(assignment)
+        self.optimalWeight = weight
+
+    def pass_messages_down(self) -> None:
+        """
+        Send every variable the message of the rest of the tree through its
+        parent and combine it with the belief of its subtree.
+        """
+        downMessages = [np.ones(len(values)) for values in self.compiled.values]
+        for var in self.order:
+            marginal = self.beliefs[var] * downMessages[var]
+            self.marginals[self.compiled.variables[var]] = \
+                dict(zip(self.compiled.values[var], normalize(marginal).tolist()))
+
+            for child in self.children[var]:
+                # The belief of var without the subtree of the child
+                rest = self.compiled.unaryFactors[var] * downMessages[var]
+                for sibling in self.children[var]:
+                    if sibling != child:
+                        rest = rest * self.upMessages[sibling]
+                downMessages[child] = normalize(self.parentFactors[child] @ rest)
+
+    def sample(self, rng: random.Random = random) -> Dict:
+        """
+        Draw an assignment with a probability proportional to its weight: the
+        roots are drawn from their marginals and every other variable given the
+        value drawn for its parent. Return an empty assignment when every
+        assignment has a zero weight.
+        """
+        if not self.optimalAssignment:
+            return {}
+        assignment = [-1] * self.compiled.numVars
+        for var in self.order:
+            weights = self.beliefs[var]
+            if self.parents[var] >= 0:
+                weights = weights * self.parentFactors[var][:, assignment[self.parents[var]]]
+            assignment[var] = rng.choices(range(len(weights)), weights=weights.tolist())[0]
+        return self.compiled.get_values(assignment)
+
+def normalize(weights: np.ndarray) -> np.ndarray:
+    """
+    Scale the weights to sum to 1, all zero weights are left as they are.
+    """
+    total = weights.sum()
+    return weights / total if total > 0 else weights
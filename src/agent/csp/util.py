@@ -9,6 +9,8 @@ import json
 import re
 from typing import Dict, List, Tuple
 
+import numpy as np
+
 # General code for representing a weighted CSP (Constraint Satisfaction Problem).
 # All variables are being referenced by their index instead of their original
 # names.
@@ -51,6 +53,9 @@ class CSP:
 
         self.binaryFactors = {}
 
+        # The array form of the CSP, built by compile().
+        self.compiled = None
+
     def add_variable(self, var, domain: List) -> None:
         """
         Add a new variable to the CSP.
@@ -58,6 +63,7 @@ class CSP:
         if var in self.variables:
             raise Exception("Variable name already exists: %s" % str(var))
 
+        self.compiled = None
         self.numVars += 1
         self.variables.append(var)
         self.values[var] = domain
@@ -81,6 +87,7 @@ class CSP:
         value from the domain |val|?
         => csp.unaryFactors[var][val]
         """
+        self.compiled = None
         factor = {}
         for val in self.values[var]:
             factor[val] = float(factorFunc(val))
@@ -127,6 +134,7 @@ class CSP:
         If it exists, element-wise multiplications will be performed to merge
         them together.
         """
+        self.compiled = None
         if var2 not in self.binaryFactors[var1]:
             self.binaryFactors[var1][var2] = table
         else:
@@ -136,6 +144,62 @@ class CSP:
                     assert i in currentTable and j in currentTable[i]
                     currentTable[i][j] *= table[i][j]
 
+    def compile(self) -> 'CompiledCSP':
+        """
+        Build the array form of the CSP that the solvers search on. It is
+        kept until a variable or a factor is added.
+        """
+        if self.compiled is None:
+            self.compiled = CompiledCSP(self)
+        return self.compiled
+
+
+class CompiledCSP:
+    def __init__(self, csp: CSP):
+        """
+        Variables are referenced by their index in csp.variables and domain
+        values by their index in csp.values[var], so that the factor tables
+        are NumPy arrays:
+
+        unaryFactors[i][a] == csp.unaryFactors[var_i][val_a], 1 without any
+        unary factor.
+        binaryFactors[i] is the list of (j, table) for every neighbor j of
+        variable i, in the order of csp.get_neighbor_vars(var_i), where
+        table[a][b] == csp.binaryFactors[var_i][var_j][val_a][val_b].
+        supports[i][j] is the same table as a boolean array of the pairs of
+        values with a nonzero weight, for AC-3.
+        """
+        self.numVars = csp.numVars
+        self.variables = list(csp.variables)
+        self.varIndex = {var: i for i, var in enumerate(self.variables)}
+        self.values = [list(csp.values[var]) for var in self.variables]
+
+        self.unaryFactors = []
+        self.binaryFactors = []
+        self.supports = []
+        for var, values in zip(self.variables, self.values):
+            factor = csp.unaryFactors[var]
+            if factor:
+                self.unaryFactors.append(np.array([factor[val] for val in values], dtype=float))
+            else:
+                self.unaryFactors.append(np.ones(len(values)))
+
+            tables = []
+            for var2, factor in csp.binaryFactors[var].items():
+                j = self.varIndex[var2]
+                table = np.array([[factor[val][val2] for val2 in self.values[j]] for val in values],
+                                 dtype=float).reshape(len(values), len(self.values[j]))
+                tables.append((j, table))
+            self.binaryFactors.append(tables)
+            self.supports.append({j: table != 0 for j, table in tables})
+
+    def get_values(self, assignment: List[int]) -> Dict:
+        """
+        Convert a complete assignment of value indices to a dictionary of the
+        values keyed by variable name.
+        """
+        return {var: self.values[i][assignment[i]] for i, var in enumerate(self.variables)}
+
 ############################################################
 # CSP examples.
 
@@ -1,21 +1,34 @@
 import ctypes
 from queue import PriorityQueue
-from typing import List
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
 
 from ddsolver import dds, functions
+from ddsolver.ddsolver import DDS_LOCK, DDSolver, hands_to_remain_cards, pbn_to_remain_cards
+from ddsolver.solve_cache import deal_key
 try:
     from .card_stats import CardSuit, CardRank, PlayerPosition, Card
-    from .card_utils import CARD_INDEX_MAP
+    from .card_utils import CARD_INDEX_MAP, CardSet
     from .pbn import PBN
 except ImportError:
     from card_stats import CardSuit, CardRank, PlayerPosition, Card
-    from card_utils import CARD_INDEX_MAP
+    from card_utils import CARD_INDEX_MAP, CardSet
     from pbn import PBN
 
 VERBOSE = False
 
 def solve_board_pbn(trump_suit: CardSuit, lead_idx: PlayerPosition, 
                     current_trick: List[Card], remaining_cards: PBN) -> dds.futureTricks:
+    """
+    Solve the position with SolveBoardPBN, unless DDSolver.CACHE has it.
+    """
+    key = deal_key(bytes(make_deal(trump_suit, lead_idx, current_trick,
+                                   pbn_to_remain_cards(remaining_cards.pbn_str))), 3)
+    fut3 = cached_board(key)
+    if fut3 is not None:
+        return fut3
+
     dlPBN = dds.dealPBN()
     fut3 = dds.futureTricks()
     dlPBN.trump = trump_suit.value
@@ -28,14 +41,15 @@ def solve_board_pbn(trump_suit: CardSuit, lead_idx: PlayerPosition,
     dlPBN.remainCards = remaining_cards.to_bytes()
     target = -1
     solutions = 3
-    mode = 0
-    res = dds.SolveBoardPBN(
-        dlPBN,
-        target,
-        solutions,
-        mode,
-        ctypes.pointer(fut3),
-        0)
+    mode = 1
+    with DDS_LOCK:
+        res = dds.SolveBoardPBN(
+            dlPBN,
+            target,
+            solutions,
+            mode,
+            ctypes.pointer(fut3),
+            0)
 
     if res != dds.RETURN_NO_FAULT:
         line = ctypes.create_string_buffer(80)
@@ -46,12 +60,97 @@ def solve_board_pbn(trump_suit: CardSuit, lead_idx: PlayerPosition,
         line = "Cards"
         functions.PrintPBNHand(line, dlPBN.remainCards)
 
+    store_board(key, fut3)
     return fut3
 
+def solve_board_bin(trump_suit: CardSuit, lead_idx: PlayerPosition,
+                    current_trick: List[Card], remain_cards: Sequence[Sequence[int]]) -> dds.futureTricks:
+    """
+    Same as solve_board_pbn(), with the hands given as the 4x4 rank bitmasks
+    DDS solves on, see hands_to_remain_cards(), so no PBN string is parsed.
+    """
+    dl = make_deal(trump_suit, lead_idx, current_trick, remain_cards)
+    target = -1
+    solutions = 3
+    mode = 1
+    key = deal_key(bytes(dl), solutions)
+    fut3 = cached_board(key)
+    if fut3 is not None:
+        return fut3
+
+    fut3 = dds.futureTricks()
+    with DDS_LOCK:
+        res = dds.SolveBoard(
+            dl,
+            target,
+            solutions,
+            mode,
+            ctypes.pointer(fut3),
+            0)
+
+    if res != dds.RETURN_NO_FAULT:
+        line = ctypes.create_string_buffer(80)
+        dds.ErrorMessage(res, line)
+        raise Exception("DDS error {}".format(line.value.decode("utf-8")))
+
+    if VERBOSE:
+        functions.PrintHand("Cards", dl.remainCards)
+
+    store_board(key, fut3)
+    return fut3
+
+def make_deal(trump_suit: CardSuit, lead_idx: PlayerPosition,
+              current_trick: List[Card], remain_cards: Sequence[Sequence[int]]) -> dds.deal:
+    """
+    Fill a binary DDS deal.
+    """
+    dl = dds.deal()
+    dl.trump = trump_suit.value
+    dl.first = lead_idx.value
+
+    for idx, card in enumerate(current_trick):
+        dl.currentTrickSuit[idx] = card.suit.value
+        dl.currentTrickRank[idx] = card.rank.value
+
+    for hand in range(dds.DDS_HANDS):
+        for suit in range(dds.DDS_SUITS):
+            dl.remainCards[hand][suit] = int(remain_cards[hand][suit])
+    return dl
+
+def cached_board(key: bytes) -> Optional[dds.futureTricks]:
+    """
+    Return the solution DDSolver.CACHE has for the position or None.
+    """
+    if DDSolver.CACHE is None:
+        return None
+    value = DDSolver.CACHE.get(key)
+    return dds.futureTricks.from_buffer_copy(value) if value is not None else None
+
+def store_board(key: bytes, fut3: dds.futureTricks) -> None:
+    if DDSolver.CACHE is not None:
+        DDSolver.CACHE.put(key, bytes(fut3))
+
+def cardsets_to_remain_cards(cardsets: List[CardSet]) -> np.ndarray:
+    """
+    Convert the card sets of the four hands, NORTH first, into the rank
+    bitmasks of solve_board_bin().
+    """
+    hands = np.zeros((4, 52), dtype=bool)
+    for hand, cardset in zip(hands, cardsets):
+        hand[list(cardset)] = True
+    return hands_to_remain_cards(hands)
+
 class DDSEvaluator:
     def __init__(self, trump_suit: CardSuit, lead_idx: PlayerPosition, 
-                 current_trick: List[Card], remaining_cards: PBN):
-        self.scores = solve_board_pbn(trump_suit, lead_idx, current_trick, remaining_cards)
+                 current_trick: List[Card], remaining_cards: Union[PBN, Sequence[Sequence[int]]]):
+        """
+        @param remaining_cards: The hands as a PBN, or as the rank bitmasks of
+                                solve_board_bin() to skip the PBN parsing.
+        """
+        if isinstance(remaining_cards, PBN):
+            self.scores = solve_board_pbn(trump_suit, lead_idx, current_trick, remaining_cards)
+        else:
+            self.scores = solve_board_bin(trump_suit, lead_idx, current_trick, remaining_cards)
     
     def print_scores(self):
         functions.PrintFut("scores: ", ctypes.pointer(self.scores))
@@ -0,0 +1,79 @@
+"""
+eval_cache.py
+-------------
+
+A bounded LRU cache of the double dummy leaf evaluations of the minimax
+search. Sibling subtrees, and the searches of consecutive cards of the same
+deal, reach many positions with the same remaining cards and leader, and
+each of them would otherwise cost a SolveBoardPBN call.
+
+Positions are keyed on a single integer: the four 52-bit hands, the packed
+partial trick (see bitboard.py), the leader and the trump. The value cached
+is the number of tricks NORTH-SOUTH takes from the position on, which does
+not depend on the tricks won so far.
+"""
+
+from collections import OrderedDict
+from typing import List, Optional
+
+def leaf_key(hands: List[int], leader: int, trick: int, trick_len: int, trump: int) -> int:
+    """
+    Canonical encoding of a position. The trick is packed as by
+    bitboard.pack_trick(), 6 bits per card in the order played.
+    """
+    key = hands[0] | hands[1] << 52 | hands[2] << 104 | hands[3] << 156
+    key |= trick << 208
+    return key << 8 | trick_len << 5 | leader << 3 | trump
+
+class EvalCache:
+    def __init__(self, size: int = 1 << 15) -> None:
+        """
+        @param size: maximum number of positions kept, the least recently
+                     used position is dropped first.
+        """
+        if size <= 0:
+            raise ValueError(f"Invalid cache size {size}")
+        self.size = size
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: int) -> bool:
+        """
+        Check for the position without counting a lookup or refreshing it.
+        """
+        return key in self._entries
+
+    def get(self, key: int) -> Optional[int]:
+        """
+        Return the tricks cached for the position or None.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: int, value: int) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def print_stats(self) -> None:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups > 0 else 0
+        print(f"DDS cache: {self.hits} hits / {lookups} lookups ({hit_rate:.1%}), {len(self)}/{self.size} entries")
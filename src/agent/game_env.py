@@ -11,9 +11,9 @@ import copy
 from typing import List
 from agent.card_stats import Card, CardSuit, CardTrick, PlayerPosition, PlayerTurn
 from agent.card_utils import CardSet
-from agent.dds_eval import DDSEvaluator
+from agent.dds_eval import DDSEvaluator, cardsets_to_remain_cards
+from agent.eval_cache import EvalCache, leaf_key
 from agent.generic_agent import Contract
-from agent.pbn import PBN
 
 class GameState:
     """
@@ -57,11 +57,13 @@ class GameState:
 DEDUCTION = 0.5 # Deduct 0.5 due to an error in the trick
 
 class GameEnv:
-    def __init__(self, contract: Contract) -> None:
+    def __init__(self, contract: Contract, cache: EvalCache = None) -> None:
         """
         Initialize the game environment the remaining card sets, contract, and the partial trick.
+        The optional cache keeps the double dummy evaluations of the positions seen.
         """
         self._contract = contract
+        self._cache = cache
 
     def is_end(self, game_state: GameState) -> bool:
         """
@@ -146,19 +148,33 @@ class GameEnv:
         for cardset in game_state._cardsets:
             assert len(cardset) == remaining_tricks
 
-        pbn_str = PBN.from_cardsets(game_state._cardsets, PlayerPosition.NORTH)
         lead_pos = self.get_current_player(game_state).position()
         if game_state._partial_trick is not None:
             lead_pos = game_state._partial_trick[0][0]
-        cards = [] if game_state._partial_trick is None \
-            else [Card.from_code(idx) for (pos, idx) in game_state._partial_trick]
-        scores = DDSEvaluator(self._contract.trump_suit, lead_pos, cards, pbn_str)
+        trick_cards = [] if game_state._partial_trick is None \
+            else [idx for (pos, idx) in game_state._partial_trick]
+
+        if self._cache is not None:
+            hands = [sum(1 << card for card in cardset) for cardset in game_state._cardsets]
+            # bitboard builds on this module, import it when it is needed
+            from agent.bitboard import pack_trick, trump_index
+            key = leaf_key(hands, PlayerPosition(lead_pos).value, pack_trick(trick_cards), len(trick_cards),
+                           trump_index(self._contract.trump_suit))
+            highest_score = self._cache.get(key)
+            if highest_score is not None:
+                return self.get_tricks_won(game_state) + highest_score
+
+        remain_cards = cardsets_to_remain_cards(game_state._cardsets)
+        cards = [Card.from_code(idx) for idx in trick_cards]
+        scores = DDSEvaluator(self._contract.trump_suit, lead_pos, cards, remain_cards)
         
         if lead_pos in [PlayerPosition.NORTH, PlayerPosition.SOUTH]:
             highest_score = scores.get_highest_scores()
         else:
             highest_score = remaining_tricks - scores.get_highest_scores()
 
+        if self._cache is not None:
+            self._cache.put(key, highest_score)
         return self.get_tricks_won(game_state) + highest_score
 
     def win_trick(self, trick: CardTrick) -> PlayerPosition:
@@ -7,7 +7,7 @@ Create a generic agent class that defines a common set of interfaces.
 """
 
 from collections import deque
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple
 
 import numpy as np
 
@@ -19,6 +19,9 @@ from .card_utils import (CardSet, card_to_index, cardset_to_hand,
                         CARD_INDEX_MAP, index_to_card, complementary_cardset)
 from .card_stats import PlayerPosition, CardSuit, CardTrick, CardPlayed, CardDist, append_trick, print_deque
 
+SUITS = (CardSuit.SPADES, CardSuit.HEARTS, CardSuit.DIAMONDS, CardSuit.CLUBS)
+HONOR_RANK = 3  # Cards with a rank index up to 3 (A, K, Q, J) are honours
+
 class Contract:
     def __init__(self, level: int, trump_suit: CardSuit, declarer: PlayerPosition) -> None:
         self.level = level
@@ -71,6 +74,13 @@ class GenericAgent:
         self._shown_out_suits: Dict[PlayerPosition, Set[CardSuit]] = {
             PlayerPosition.NORTH: set(), PlayerPosition.EAST: set(), 
             PlayerPosition.SOUTH: set(), PlayerPosition.WEST: set()}
+        # The unseen cards, the number of cards left in each hidden hand and the
+        # unseen cards (and honours, AKQJ) in each suit. They are built by the first
+        # get_unseen_cards() and kept up to date by set_real_card_played().
+        self._unseen_cards: CardSet = None
+        self._unseen_counts: Dict[PlayerPosition, int] = None
+        self._unseen_suit_counts: Dict[CardSuit, int] = None
+        self._unseen_honor_counts: Dict[CardSuit, int] = None
 
     @property
     def __cards__(self) -> CardSet:
@@ -183,6 +193,7 @@ class GenericAgent:
             self.__cardsets__[declarer] = card_to_index(public_hand_str)
         else:
             self.__cardsets__[self.dummy_position.value] = card_to_index(public_hand_str)
+        self.reset_unseen_cards()
         level = int(contract[0])
         strain_i = bidding.get_strain_i(contract)
         self.x_play = np.zeros((1, 13, 298))
@@ -231,6 +242,14 @@ class GenericAgent:
                 self._shown_out_suits[position].add(lead_suit)
 
         append_trick(self.__played__, position, opening_lead52)
+        if self._unseen_cards is not None and opening_lead52 in self._unseen_cards:
+            self._unseen_cards.remove(opening_lead52)
+            if position in self._unseen_counts:
+                self._unseen_counts[position] -= 1
+            suit = CardSuit.from_card_idx(opening_lead52)
+            self._unseen_suit_counts[suit] -= 1
+            if opening_lead52 % 13 <= HONOR_RANK:
+                self._unseen_honor_counts[suit] -= 1
     
     def set_card_played(self, trick_i: int, leader_i: int, i: int, card: int) -> None:
         # TODO: don't know the difference from this and set_real_card_played()
@@ -278,6 +297,7 @@ class GenericAgent:
         
     def set_contract(self, contract: str, declarer: int) -> None:
         self.__contract__ = Contract.from_str(contract, PlayerPosition(declarer))
+        self.reset_unseen_cards()
 
     def set_auction(self, bided_suit: List[CardSuit]) -> None:
         self.__bided_suit__ = bided_suit
@@ -299,7 +319,17 @@ class GenericAgent:
         
         return hidden_players
     
-    def get_unseen_cards(self) -> CardSet:
+    def reset_unseen_cards(self) -> None:
+        """
+        Rebuild the unseen cards on the next get_unseen_cards(), to be called
+        when a hand becomes known.
+        """
+        self._unseen_cards = None
+
+    def build_unseen_cards(self) -> None:
+        """
+        Collect the unseen cards from the known hands and the cards played.
+        """
         unseen_cards = set(range(52))
         for player in [self.__position__.value, self.dummy_position.value]:
             unseen_cards -= self.__cardsets__[player]
@@ -312,4 +342,33 @@ class GenericAgent:
                     unseen_counts[player] -= 1
                 unseen_cards.remove(card_idx)
 
-        return unseen_cards, unseen_counts
\ No newline at end of file
+        suit_counts = {suit: 0 for suit in SUITS}
+        honor_counts = {suit: 0 for suit in SUITS}
+        for card_idx in unseen_cards:
+            suit = CardSuit.from_card_idx(card_idx)
+            suit_counts[suit] += 1
+            if card_idx % 13 <= HONOR_RANK:
+                honor_counts[suit] += 1
+
+        self._unseen_cards = unseen_cards
+        self._unseen_counts = unseen_counts
+        self._unseen_suit_counts = suit_counts
+        self._unseen_honor_counts = honor_counts
+
+    def get_unseen_cards(self) -> CardSet:
+        """
+        Return the unseen cards and the number of cards in each hidden hand.
+        They are kept up to date as cards are played, callers must not
+        modify them.
+        """
+        if self._unseen_cards is None:
+            self.build_unseen_cards()
+        return self._unseen_cards, self._unseen_counts
+
+    def get_unseen_tallies(self) -> Tuple[Dict[CardSuit, int], Dict[CardSuit, int]]:
+        """
+        Return the number of unseen cards and unseen honours (AKQJ) in each suit.
+        """
+        if self._unseen_cards is None:
+            self.build_unseen_cards()
+        return self._unseen_suit_counts, self._unseen_honor_counts
\ No newline at end of file
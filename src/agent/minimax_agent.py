@@ -6,33 +6,208 @@ Agent that uses the minimax algorithm to choose the best card to play.
 """
 
 import copy
-from typing import Dict, List, Tuple
-from agent.assigners.csp_assigner_v2 import CSPAssignerV2
-from agent.card_stats import CardTrick, PlayerPosition, PlayerTurn, Card
-from agent.card_utils import card_to_index, index_to_card
-from agent.game_env import GameEnv, GameState
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from agent.assigners.batch_assigner import BatchAssigner
+from agent.bitboard import (BitGameEnv, BitGameState, bits_to_hand, count_cards, iter_cards, pack_trick, trump_index,
+                            trick_winner)
+from agent.card_stats import PlayerPosition, PlayerTurn, Card
+from agent.card_utils import CardSet, card_to_index, index_to_card
+from agent.eval_cache import EvalCache
+from agent.game_env import GameState
+from agent.move_ordering import MoveOrdering
+from agent.transposition import EXACT, LOWER, UPPER, REPLACE_DEPTH, TranspositionTable
+from ddsolver import dds
+from ddsolver.ddsolver import DDSolver
 from objects import CardResp
 from agent.generic_agent import GenericAgent
-from agent.assigners.random_assigner import RandomAssigner
+from agent.assigners.exact_assigner import ExactAssigner
+
+PIMC_MEAN = "mean"  # Play the card with the most tricks on average over the layouts
+PIMC_MAKE = "make"  # Play the card that makes (or defeats) the contract in the most layouts
+
+class SearchTimeout(Exception):
+    """
+    Raised when the search runs past its deadline.
+    """
+    pass
+
+_pool = None
+_pool_size = 0
+# Best score of the root player found so far in a root split search, shared
+# by the parent and the workers
+_root_bound = None
+_worker_agent = None
+
+def init_worker(root_bound) -> None:
+    """
+    Set up a worker process of the pool. The DDS library is loaded with the
+    agent modules, and each worker gets one DDS thread since the workers
+    already run in parallel.
+    """
+    global _root_bound
+    _root_bound = root_bound
+    dds.SetMaxThreads(1)
+
+def get_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Return the process pool that searches the layouts and the root cards,
+    it is shared by the agents of all the boards. The workers are started
+    when the pool is created so that they are warm for the first card.
+    """
+    global _pool, _pool_size, _root_bound
+    if _pool is None or _pool_size != processes:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+        _root_bound = multiprocessing.Value("d", float("-inf"))
+        _pool = ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(_root_bound,))
+        _pool_size = processes
+        for future in [_pool.submit(os.getpid) for _ in range(processes)]:
+            future.result()
+    return _pool
+
+def get_worker_agent(agent_type: type, contract, position: int, state: BitGameState) -> "MinimaxAgent":
+    """
+    Return the agent of the worker process. It is kept between calls of the
+    same deal, with its transposition table and DDS cache.
+    """
+    global _worker_agent
+    agent = _worker_agent
+    if agent is None or type(agent) is not agent_type or agent.__contract__ != contract:
+        agent = agent_type(bits_to_hand(state.hands[position]), position)
+        agent.__contract__ = contract
+        _worker_agent = agent
+    return agent
+
+def search_world(agent_type: type, contract, position: int, depth: int, state: BitGameState,
+                 deadline: float = None) -> Optional[Dict[int, float]]:
+    """
+    Search every card of a layout of the hidden hands in a worker process.
+
+    @param deadline: time.perf_counter() value after which the search gives
+                     up and returns None, so that a layout still running when
+                     the card is played does not hold the worker.
+    """
+    agent = get_worker_agent(agent_type, contract, position, state)
+    try:
+        return agent.root_values(state, depth, deadline)
+    except SearchTimeout:
+        return None
+
+def search_root_card(agent_type: type, contract, position: int, depth: int, state: BitGameState, 
+                     card: int, share_bound: bool, deadline: float = None
+                     ) -> Tuple[Optional[Tuple[float, float]], bool]:
+    """
+    Search a card of the root in a worker process. With share_bound the
+    search only has to match the best score the other workers have found so
+    far, and a score that does not is an upper bound. A score equal to the
+    bound is exact, the card may come first in the order of the root cards.
+
+    @param deadline: see search_world(), the score is None past it.
+    @return: the score and the whole tricks of the card as in root_values(),
+             and whether the score is exact.
+    """
+    agent = get_worker_agent(agent_type, contract, position, state)
+    sign = 1 if state.cur_player() % 2 == 0 else -1
+    bound = math.nextafter(_root_bound.value, float("-inf")) if share_bound else float("-inf")
+    next_depth = depth - 1 if state.trick_len == 3 else depth
+    state.play(card, trump_index(contract.trump_suit))
+    try:
+        if sign == 1:
+            value, _, _, deductions = agent.search(state, next_depth, deadline=deadline, alpha=bound)
+        else:
+            value, _, _, deductions = agent.search(state, next_depth, deadline=deadline, beta=-bound)
+    except SearchTimeout:
+        return None, False
+    if share_bound:
+        with _root_bound.get_lock():
+            if sign * value > _root_bound.value:
+                _root_bound.value = sign * value
+    return (value, value + deductions), sign * value > bound
 
 class MinimaxAgent(GenericAgent):
+    # Number of tricks searched before the double dummy evaluation
+    SEARCH_DEPTH = 1
+    # Time budget per card in milliseconds. When set, the search deepens one
+    # trick at a time until the budget runs out instead of using SEARCH_DEPTH.
+    THINK_MS = None
+
+    # Size and replacement policy of the transposition table, which is kept
+    # for the whole deal. Set TT_SIZE to 0 to search without the table.
+    TT_SIZE = 1 << 16
+    TT_REPLACEMENT = REPLACE_DEPTH
+
+    # Number of double dummy evaluations cached for the deal, 0 to disable
+    DDS_CACHE_SIZE = 1 << 15
+
+    # Solve up to this many positions at the search horizon in batches with
+    # SolveAllBoards before the search, 0 to evaluate the positions one by one
+    # as the search reaches them. Needs the DDS cache. The batch holds every
+    # position of the horizon, not only those alpha-beta visits, so it only
+    # pays off when DDS has several cores to solve the boards on.
+    BATCH_LEAVES = 1000 if (os.cpu_count() or 1) > 1 else 0
+
+    # Search one card of each sequence of equivalent cards
+    EQUIVALENT_CARDS = True
+    # Order the cards with the winning card, killer and history heuristics
+    ORDER_MOVES = True
+
+    # Number of layouts of the hidden hands searched for each card. With 0 the
+    # agent searches the single layout drawn by assign_cards().
+    PIMC_WORLDS = 0
+    # How the scores of the layouts are combined, PIMC_MEAN or PIMC_MAKE
+    PIMC_AGGREGATE = PIMC_MEAN
+    # Worker processes that search the layouts (and the root cards with
+    # ROOT_SPLIT), 0 to search them in this process
+    PROCESSES = 0
+    # Search each root card in its own job of the process pool. With a single
+    # layout the workers share the best score found so far to prune.
+    ROOT_SPLIT = False
+    # Time budget per card in milliseconds, layouts not searched by then are
+    # left out. At least one layout is always searched.
+    PIMC_DEADLINE_MS = None
+
+    def __init__(self, hand_str: str, position: int, verbose: bool = False) -> None:
+        super().__init__(hand_str, position, verbose)
+        self._tt = TranspositionTable(self.TT_SIZE, self.TT_REPLACEMENT) if self.TT_SIZE > 0 else None
+        self._ordering = MoveOrdering()
+        self._dds_cache = EvalCache(self.DDS_CACHE_SIZE) if self.DDS_CACHE_SIZE > 0 else None
+        self._solver = None
+
     def __str__(self) -> str:
         return "Minimax"
 
     def choose_card(self, lead_pos: PlayerPosition = None, current_trick: List[int] = None, playing_dummy = False) -> int:
-        self.assign_cards()
+        if self.PIMC_WORLDS > 0:
+            card_idx = self.choose_card_pimc(playing_dummy)
+        else:
+            self.assign_cards()
+            card_idx = self.get_optimal_card(self.current_state(self.__cardsets__, playing_dummy))
+        if self.__verbose__:
+            if self._tt is not None:
+                self._tt.print_stats()
+            if self._dds_cache is not None:
+                self._dds_cache.print_stats()
+        return card_idx
 
+    def current_state(self, cardsets: List[CardSet], playing_dummy: bool = False) -> GameState:
+        """
+        Build the state of the game from the cards of the four hands and the
+        cards played in the current trick.
+        """
         current_trick = None
         if self.__played__ is not None and len(self.__played__) > 0:
             if len(self.__played__[-1]) < 4:
                 current_trick = copy.deepcopy(self.__played__[-1])
 
         cur_turn = PlayerTurn(PlayerPosition.NORTH) if playing_dummy else PlayerTurn(self.__position__) 
-        cur_states = GameState(cardsets=copy.deepcopy(self.__cardsets__), 
-                               cur_turn=cur_turn, 
-                               partial_trick=copy.deepcopy(current_trick))
-        card_idx = self.get_optimal_card(cur_states)
-        return card_idx
+        return GameState(cardsets=copy.deepcopy(cardsets), 
+                         cur_turn=cur_turn, 
+                         partial_trick=current_trick)
     
     def fallback(self, lead_pos: PlayerPosition = None, current_trick52: List[int] = None, playing_dummy = False) -> int:
         cardset = self.__cards__ if not playing_dummy else self.__dummy__
@@ -90,57 +265,395 @@ class MinimaxAgent(GenericAgent):
     =================================================================================
     """
     
-    def assign_cards(self) -> None:
+    def sample_hands(self) -> Dict[PlayerPosition, CardSet]:
+        """
+        Draw a layout of the unseen cards, the hands of the hidden players.
+        """
         unseen_cards, unseen_counts = self.get_unseen_cards()
-        assigned_hands = RandomAssigner.assign(unseen_cards, unseen_counts)
+        return ExactAssigner.assign(unseen_cards, unseen_counts, self._shown_out_suits)
+
+    def sample_layouts(self, num_layouts: int) -> List[Dict[PlayerPosition, CardSet]]:
+        """
+        Draw num_layouts layouts of the unseen cards in one batch.
+        """
+        unseen_cards, unseen_counts = self.get_unseen_cards()
+        try:
+            layouts = BatchAssigner.assign(unseen_cards, unseen_counts, num_layouts, self._shown_out_suits)
+        except ValueError:
+            # Voids among three hidden hands are beyond the batch draw
+            return [self.sample_hands() for _ in range(num_layouts)]
+        players = list(unseen_counts.keys())
+        return [BatchAssigner.to_hands(layout, players) for layout in layouts]
+
+    def sample_weighted_layouts(self, num_layouts: int) -> Tuple[List[Dict[PlayerPosition, CardSet]], List[float]]:
+        """
+        Draw num_layouts layouts of the unseen cards with the weights they
+        carry in the aggregation of the scores, which sum to 1. The layouts
+        drawn by sample_layouts() all weigh the same.
+        """
+        layouts = self.sample_layouts(num_layouts)
+        return layouts, [1 / len(layouts)] * len(layouts)
+
+    def assign_cards(self) -> None:
+        assigned_hands = self.sample_hands()
         hidden_players = self.get_hidden_players()
         for player in hidden_players:
             self.__cardsets__[player.value] = assigned_hands[player]
 
+    """
+    =================================================================================
+    The section below defines methods for searching several layouts (PIMC).
+    =================================================================================
+    """
+
+    def choose_card_pimc(self, playing_dummy: bool = False) -> int:
+        """
+        Draw PIMC_WORLDS layouts of the hidden hands, search each of them
+        double dummy and play the card with the best aggregated score.
+        """
+        hidden_players = self.get_hidden_players()
+        worlds = []
+        layouts, layout_weights = self.sample_weighted_layouts(self.PIMC_WORLDS)
+        for assigned_hands in layouts:
+            cardsets = list(self.__cardsets__)
+            for player in hidden_players:
+                cardsets[player.value] = set(assigned_hands[player])
+            worlds.append(BitGameState.from_game_state(self.current_state(cardsets, playing_dummy)))
+
+        scores, weights = [], []
+        for world_scores, weight in zip(self.search_each_world(worlds), layout_weights):
+            if world_scores is not None:
+                scores.append(world_scores)
+                weights.append(weight)
+        if self.__verbose__:
+            print(f"Searched {len(scores)} of {len(worlds)} layouts")
+        return self.aggregate_scores(scores, worlds[0].cur_player(), weights)
+
+    def search_worlds(self, worlds: List[BitGameState]) -> List[Dict[int, Tuple[float, float]]]:
+        """
+        Search the layouts until PIMC_DEADLINE_MS and return the score of each
+        card in the layouts that were searched.
+        """
+        return [scores for scores in self.search_each_world(worlds) if scores is not None]
+
+    def search_each_world(self, worlds: List[BitGameState]) -> List[Optional[Dict[int, Tuple[float, float]]]]:
+        """
+        As search_worlds(), with None in place of the scores of the layouts
+        that were not searched in time.
+        """
+        depth = self.SEARCH_DEPTH
+        deadline = None
+        if self.PIMC_DEADLINE_MS is not None:
+            deadline = time.perf_counter() + self.PIMC_DEADLINE_MS / 1000
+
+        if self.PROCESSES <= 0:
+            scores = [None] * len(worlds)
+            for i, world in enumerate(worlds):
+                if i > 0 and deadline is not None and time.perf_counter() > deadline:
+                    break
+                scores[i] = self.root_values(world, depth)
+            return scores
+
+        pool = get_pool(self.PROCESSES)
+        contract, position = self.__contract__, self.__position__.value
+        # The workers get the deadline too so that the layouts still running
+        # stop with the search instead of holding the pool for the next card.
+        # time.perf_counter() is a system-wide monotonic clock. The first
+        # layout is always searched to the end.
+        deadlines = [None if i == 0 else deadline for i in range(len(worlds))]
+        if self.ROOT_SPLIT:
+            # One job per (layout, card), the scores have to be exact
+            cards = list(iter_cards(BitGameEnv(contract).get_legal_actions(worlds[0])))
+            jobs = [[pool.submit(search_root_card, type(self), contract, position, depth, world, card, False, 
+                                 world_deadline) for card in cards]
+                    for world, world_deadline in zip(worlds, deadlines)]
+        else:
+            jobs = [[pool.submit(search_world, type(self), contract, position, depth, world, world_deadline)]
+                    for world, world_deadline in zip(worlds, deadlines)]
+        futures = [future for world_jobs in jobs for future in world_jobs]
+        timeout = None if deadline is None else max(0, deadline - time.perf_counter())
+        wait(futures, timeout=timeout)
+        # The first layout is searched to the end, as in the serial search.
+        # The other layouts are searched in time when their jobs are done
+        # with a score.
+        wait(jobs[0])
+        done = {future for future in futures if future.done()}
+        not_done = [future for future in futures if future not in done]
+        for future in not_done:
+            future.cancel()
+        # The jobs that had started stop at the deadline, the pool is idle
+        # again once they have
+        wait(not_done)
+
+        scores = []
+        for world_jobs in jobs:
+            if not all(future in done for future in world_jobs):
+                scores.append(None)
+            elif self.ROOT_SPLIT:
+                values = [future.result()[0] for future in world_jobs]
+                scores.append(None if None in values else dict(zip(cards, values)))
+            else:
+                scores.append(world_jobs[0].result())
+        return scores
+
+    def root_values(self, state: BitGameState, depth: int, deadline: float = None) -> Dict[int, Tuple[float, float]]:
+        """
+        Search every legal card of the player to play in a single layout.
+        Unlike search(), every card gets its exact score so that the scores
+        can be compared across layouts. The score of a card comes with the
+        whole tricks NORTH-SOUTH takes on its line, before DEDUCTION.
+
+        @param deadline: time.perf_counter() value after which the search
+                         raises SearchTimeout.
+        """
+        game_env = BitGameEnv(self.__contract__)
+        next_depth = depth - 1 if game_env.last_card_to_play(state) else depth
+        values = {}
+        for card in iter_cards(game_env.get_legal_actions(state)):
+            state.play(card, game_env.trump)
+            try:
+                value, _, _, deductions = self.search(state, next_depth, deadline=deadline)
+                values[card] = (value, value + deductions)
+            finally:
+                state.undo()
+        return values
+
+    def tricks_won(self) -> int:
+        """
+        Number of tricks NORTH-SOUTH has won in the tricks played so far.
+        """
+        trump = trump_index(self.__contract__.trump_suit)
+        tricks = 0
+        for trick in self.__played__:
+            if len(trick) < 4:
+                continue
+            winner = trick_winner(pack_trick([card for _, card in trick]), 4, PlayerPosition(trick[0][0]).value, trump)
+            tricks += winner % 2 == 0
+        return tricks
+
+    def aggregate_scores(self, scores: List[Dict[int, Tuple[float, float]]], player: int, 
+                         weights: List[float] = None) -> int:
+        """
+        Combine the scores of the layouts and return the best card for the
+        player. With PIMC_MAKE the card that reaches the tricks NORTH-SOUTH
+        needs in the most layouts is played, ties are broken by the mean.
+        The contract is checked on the whole tricks, the mean is taken over
+        the scores.
+
+        @param scores: The score and the whole tricks of each card in each
+                       layout, see root_values().
+
+        @param weights: The weights of the layouts, all the same by default.
+        """
+        cards = sorted(scores[0].keys())
+        sign = 1 if player % 2 == 0 else -1
+        if weights is None:
+            weights = [1] * len(scores)
+        total = sum(weights)
+        mean = {card: sum(weight * score[card][0] for score, weight in zip(scores, weights)) / total for card in cards}
+        if self.PIMC_AGGREGATE == PIMC_MAKE:
+            level = self.__contract__.level
+            needed = level + 6 if self.__contract__.declarer.value % 2 == 0 else 8 - level
+            needed -= self.tricks_won()
+            made = {card: sum(weight for score, weight in zip(scores, weights) if score[card][1] >= needed)
+                    / total for card in cards}
+            best = max(cards, key=lambda card: (sign * made[card], sign * mean[card], -card))
+        else:
+            best = max(cards, key=lambda card: (sign * mean[card], -card))
+        if self.__verbose__:
+            for card in cards:
+                print(f"{index_to_card(card)}: {mean[card]:.2f}")
+        return best
+
     """
     =================================================================================
     The section below defines methods for the game tree.
     =================================================================================
     """
 
-    def get_optimal_card(self, cur_states: GameState) -> int:
+    def get_optimal_card(self, cur_states: GameState, depth: int = None) -> int:
         """
-        Get the optimal card to play using the minimax strategy.
+        Get the optimal card to play using the minimax strategy. The search
+        goes SEARCH_DEPTH tricks deep, or deepens until the THINK_MS budget
+        runs out when it is set.
+
+        @param depth: number of tricks to play out before evaluating the
+                      position with the double dummy solver.
         """
-        game_env = GameEnv(self.__contract__)
-        team = [PlayerPosition.NORTH, PlayerPosition.SOUTH]
+        if depth is None and self.THINK_MS is not None:
+            return self.iterative_deepening(cur_states, self.THINK_MS)
+        depth = self.SEARCH_DEPTH if depth is None else depth
+        state = BitGameState.from_game_state(cur_states)
+        if self.ROOT_SPLIT and self.PROCESSES > 0:
+            return self.split_root(state, depth)
+        _, card_idx, _, _ = self.search(state, depth)
+        return card_idx
 
-        def recurse(game_state: GameState, depth: int, root_card: int, 
-                    alpha: float, beta: float) -> Tuple[int, float]:
-            if game_env.is_end(game_state):
-                return (game_env.get_scores(game_state), root_card)
+    def split_root(self, state: BitGameState, depth: int) -> int:
+        """
+        Search the root cards in parallel in the process pool. The workers
+        share the best score found so far, so the cards searched later only
+        have to prove that they do not beat it. Ties go to the first card in
+        the order of get_legal_actions(), as in search().
+        """
+        pool = get_pool(self.PROCESSES)
+        with _root_bound.get_lock():
+            _root_bound.value = float("-inf")
+        game_env = BitGameEnv(self.__contract__, self.EQUIVALENT_CARDS)
+        cards = list(iter_cards(game_env.get_legal_actions(state)))
+        futures = [pool.submit(search_root_card, type(self), self.__contract__, self.__position__.value, 
+                               depth, state, card, True) for card in cards]
+        sign = 1 if state.cur_player() % 2 == 0 else -1
+        best_card, best_value = None, float("-inf")
+        for card, future in zip(cards, futures):
+            value, exact = future.result()
+            if exact and sign * value[0] > best_value:
+                best_card, best_value = card, sign * value[0]
+        return best_card
+
+    def iterative_deepening(self, cur_states: GameState, think_ms: float) -> int:
+        """
+        Search one more trick deep at each iteration until the time budget
+        runs out or the search reaches the end of the hand. Each iteration
+        tries the principal variation of the previous iteration first. The
+        card of the last completed iteration is returned, the first iteration
+        always runs to completion.
+        """
+        deadline = time.perf_counter() + think_ms / 1000
+        state = BitGameState.from_game_state(cur_states)
+        max_depth = count_cards(state.hands[state.cur_player()])
+        card_idx, pv = None, []
+        for depth in range(1, max_depth + 1):
+            try:
+                _, card_idx, pv, _ = self.search(state, depth, pv, deadline if depth > 1 else None)
+            except SearchTimeout:
+                break
+            if self.__verbose__:
+                print(f"Depth {depth}: {[index_to_card(card) for card in pv]}")
+            if time.perf_counter() >= deadline:
+                break
+        return card_idx
+
+    def search(self, state: BitGameState, depth: int, prev_pv: List[int] = None, 
+               deadline: float = None, alpha: float = float('-inf'), 
+               beta: float = float('inf')) -> Tuple[float, int, List[int], float]:
+        """
+        Alpha-beta search of the state. The search plays and takes back cards
+        on the state, which is back to where it was when the search returns.
+        Positions at the start of a trick are looked up in the transposition
+        table.
+
+        @param prev_pv: the cards along the principal variation of a previous
+                        search, tried first at each ply.
+        @param deadline: time.perf_counter() value after which the search
+                         raises SearchTimeout.
+        @param alpha, beta: the search window, a value outside of it is a bound.
+        @return: the value, the card to play, the principal variation and the
+                 DEDUCTION taken off the value along its line.
+        """
+        game_env = BitGameEnv(self.__contract__, self.EQUIVALENT_CARDS, self._dds_cache)
+        trump = game_env.trump
+        tt = self._tt
+        prev_pv = prev_pv or []
+        pv_table: List[List[int]] = [[] for _ in range(4 * depth + 5)]
+        ordering = self._ordering if self.ORDER_MOVES else None
+        if ordering is not None:
+            ordering.new_search(len(pv_table))
+        if self.BATCH_LEAVES > 0 and self._dds_cache is not None:
+            if self._solver is None:
+                self._solver = DDSolver()
+            game_env.prefetch(state, depth, self._solver, min(self.BATCH_LEAVES, self._dds_cache.size), deadline)
+
+        def recurse(depth: int, ply: int, on_pv: bool, root_card: int, 
+                    alpha: float, beta: float) -> Tuple[float, int, float]:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout()
+            pv_table[ply] = []
+            if game_env.is_end(state):
+                return (game_env.get_scores(state), root_card, state.deductions)
             if depth == 0:
-                return (game_env.evaluation(game_state), root_card)
+                return (game_env.evaluation(state), root_card, state.deductions)
+
+            tt_card = None
+            use_tt = tt is not None and state.trick_len == 0
+            if use_tt:
+                entry = tt.probe(state.key)
+                if entry is not None:
+                    _, entry_depth, bound, value, tt_card, deductions = entry
+                    # The root always has to search to come up with a card
+                    if entry_depth >= depth and root_card is not None:
+                        value += state.tricks_won
+                        deductions += state.deductions
+                        if bound == EXACT:
+                            return (value, root_card, deductions)
+                        if bound == LOWER:
+                            alpha = max(alpha, value)
+                        else:
+                            beta = min(beta, value)
+                        if alpha >= beta:
+                            return (value, root_card, deductions)
+            alpha_orig, beta_orig = alpha, beta
             
-            actions = game_env.get_legal_actions(game_state)
-            depth = depth - 1 if game_env.last_card_to_play(game_state) else depth
-            if game_env.get_current_player(game_state).position() in team:
-                best_val = (float('-inf'), None)
-                for action in actions:
-                    new_state = game_env.move_to_next_player(game_state, action)
+            actions = game_env.get_legal_actions(state)
+            pv_card = prev_pv[ply] if on_pv and ply < len(prev_pv) else None
+            first = [card for card in (pv_card, tt_card) if card is not None and actions >> card & 1]
+            ordered = ordering.order(actions, state, trump, ply) if ordering is not None else iter_cards(actions)
+            if first:
+                first = first[:1] + [card for card in first[1:] if card != first[0]]
+                ordered = first + [card for card in ordered if card not in first]
+            player = state.cur_player()
+            depth = depth - 1 if game_env.last_card_to_play(state) else depth
+            best_card = None
+            if player % 2 == 0:
+                best_val = (float('-inf'), None, 0)
+                for action in ordered:
+                    state.play(action, trump)
                     new_root_card = action if root_card is None else root_card
-                    val = recurse(new_state, depth, new_root_card, alpha, beta)
-                    best_val = max(best_val, val, key=lambda x: x[0])
+                    val = recurse(depth, ply + 1, action == pv_card, new_root_card, alpha, beta)
+                    state.undo()
+                    if val[0] > best_val[0]:
+                        best_val = val
+                        best_card = action
+                        pv_table[ply] = [action] + pv_table[ply + 1]
                     if best_val[0] >= beta:
+                        if ordering is not None:
+                            ordering.record_cutoff(player, action, ply, depth)
                         break
                     alpha = max(alpha, best_val[0])
-                return best_val
             else:
-                best_val = (float('inf'), None)
-                for action in actions:
-                    new_state = game_env.move_to_next_player(game_state, action)
+                best_val = (float('inf'), None, 0)
+                for action in ordered:
+                    state.play(action, trump)
                     new_root_card = action if root_card is None else root_card
-                    val = recurse(new_state, depth, new_root_card, alpha, beta)
-                    best_val = min(best_val, val, key=lambda x: x[0])
+                    val = recurse(depth, ply + 1, action == pv_card, new_root_card, alpha, beta)
+                    state.undo()
+                    if val[0] < best_val[0]:
+                        best_val = val
+                        best_card = action
+                        pv_table[ply] = [action] + pv_table[ply + 1]
                     if best_val[0] <= alpha:
+                        if ordering is not None:
+                            ordering.record_cutoff(player, action, ply, depth)
                         break
                     beta = min(beta, best_val[0])
-                return best_val
 
-        optimal = recurse(cur_states, 1, None, float('-inf'), float('inf'))
-        return optimal[1]
\ No newline at end of file
+            if use_tt:
+                if best_val[0] <= alpha_orig:
+                    bound = UPPER
+                elif best_val[0] >= beta_orig:
+                    bound = LOWER
+                else:
+                    bound = EXACT
+                tt.store(state.key, depth, bound, best_val[0] - state.tricks_won, best_card,
+                         best_val[2] - state.deductions)
+            return best_val
+
+        num_played = len(state._undo)
+        try:
+            value, card_idx, deductions = recurse(depth, 0, True, None, alpha, beta)
+        except SearchTimeout:
+            # Take back the cards of the interrupted search
+            while len(state._undo) > num_played:
+                state.undo()
+            raise
+        return value, card_idx, pv_table[0], deductions
@@ -7,13 +7,25 @@ The agent makes inferences about the cards in the hidden hands using a
 Bayesian Network and a CSP solver.
 """
 
-from typing import Any
-from agent.assigners.csp_assigner_v2 import CSPAssignerV2
-from agent.assigners.random_assigner import RandomAssigner
+from typing import Any, Dict, List, Tuple
+from agent.assigners.batch_assigner import BatchAssigner
+from agent.assigners.csp_assigner_v2 import CSPAssignerV2, SolverCache
+from agent.card_stats import PlayerPosition
+from agent.card_utils import CardSet
 from agent.minimax_agent import MinimaxAgent
 
 
 class MinimaxBayesAgent(MinimaxAgent):
+    # Draw the PIMC layouts uniformly and weight them by the likelihood of
+    # the bids, instead of drawing them from the CSP with equal weights
+    PIMC_IMPORTANCE = False
+    # Solved CSPs of the assigners of the deal, see CSPAssignerV2
+    CSP_SOLVER_CACHE_SIZE = 256
+
+    def __init__(self, hand_str: str, position: int, verbose: bool = False) -> None:
+        super().__init__(hand_str, position, verbose)
+        self._csp_solvers = SolverCache(self.CSP_SOLVER_CACHE_SIZE)
+
     def __str__(self) -> str:
         return "MinimaxBayesAgent"
     
@@ -23,7 +35,7 @@ class MinimaxBayesAgent(MinimaxAgent):
     =================================================================================
     """
     
-    def assign_cards(self) -> None:
+    def make_assigner(self) -> CSPAssignerV2:
         unseen_cards, unseen_counts = self.get_unseen_cards()
         player_stats = {}
         suit_seen = set()
@@ -34,12 +46,34 @@ class MinimaxBayesAgent(MinimaxAgent):
                 bided_suit = None
             player_stats[player] = (num_cards, bided_suit)
             suit_seen.add(bided_suit)
-        assigner = CSPAssignerV2(unseen_cards, player_stats, self._shown_out_suits)
+        return CSPAssignerV2(unseen_cards, player_stats, self._shown_out_suits, 
+                             self.get_unseen_tallies(), self._csp_solvers)
+
+    def sample_hands(self) -> Dict[PlayerPosition, CardSet]:
+        assigner = self.make_assigner()
+        try:
+            # Several worlds should follow the weights of the layouts, not all be the best one
+            assigned_hands = assigner.assign_cards(sample=self.PIMC_WORLDS > 0)
+        except:
+            assigned_hands = super().sample_hands()
+        return assigned_hands
+
+    def sample_layouts(self, num_layouts: int) -> List[Dict[PlayerPosition, CardSet]]:
+        assigner = self.make_assigner()
         try:
-            assigned_hands = assigner.assign_cards()
+            layouts = assigner.assign_layouts(num_layouts)
         except:
-            assigned_hands = RandomAssigner.assign(unseen_cards, unseen_counts)
+            return super().sample_layouts(num_layouts)
+        players = list(assigner._player_stats.keys())
+        return [BatchAssigner.to_hands(layout, players) for layout in layouts]
 
-        hidden_players = self.get_hidden_players()
-        for player in hidden_players:
-            self.__cardsets__[player.value] = assigned_hands[player]
+    def sample_weighted_layouts(self, num_layouts: int) -> Tuple[List[Dict[PlayerPosition, CardSet]], List[float]]:
+        if not self.PIMC_IMPORTANCE:
+            return super().sample_weighted_layouts(num_layouts)
+        assigner = self.make_assigner()
+        try:
+            layouts, weights = assigner.assign_weighted_layouts(num_layouts)
+        except:
+            return super().sample_weighted_layouts(num_layouts)
+        players = list(assigner._player_stats.keys())
+        return [BatchAssigner.to_hands(layout, players) for layout in layouts], weights.tolist()
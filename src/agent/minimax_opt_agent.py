@@ -1,18 +1,21 @@
+from typing import Dict, List, Tuple
 from agent.assigners.csp_assigner_v2 import CSPAssignerV2
-from agent.assigners.random_assigner import RandomAssigner
+from agent.card_stats import PlayerPosition
+from agent.card_utils import CardSet
+from agent.minimax_agent import MinimaxAgent
 from agent.minimax_bayes_agent import MinimaxBayesAgent
 
 class MinimaxOptAgent(MinimaxBayesAgent):
     def __str__(self) -> str:
         return "MinimaxOpt"
     
-    def assign_cards(self) -> None:
+    def sample_hands(self) -> Dict[PlayerPosition, CardSet]:
         unseen_cards, unseen_counts = self.get_unseen_cards()
         player_stats = {}
         suit_seen = set()        
         
         if self.__contract__.declarer is self.__position__:
-            assigned_hands = RandomAssigner.assign(unseen_cards, unseen_counts)
+            assigned_hands = MinimaxAgent.sample_hands(self)
         else:
             for player, num_cards in unseen_counts.items():
                 bided_suit = self.__bided_suit__[player.value]
@@ -20,12 +23,21 @@ class MinimaxOptAgent(MinimaxBayesAgent):
                     bided_suit = None
                 player_stats[player] = (num_cards, bided_suit)
                 suit_seen.add(bided_suit)
-            assigner = CSPAssignerV2(unseen_cards, player_stats, self._shown_out_suits)
+            assigner = CSPAssignerV2(unseen_cards, player_stats, self._shown_out_suits, 
+                                     self.get_unseen_tallies(), self._csp_solvers)
             try:
-                assigned_hands = assigner.assign_cards()
+                # Several worlds should follow the weights of the layouts, not all be the best one
+                assigned_hands = assigner.assign_cards(sample=self.PIMC_WORLDS > 0)
             except:
-                assigned_hands = RandomAssigner.assign(unseen_cards, unseen_counts)
+                assigned_hands = MinimaxAgent.sample_hands(self)
+        return assigned_hands
 
-        hidden_players = self.get_hidden_players()
-        for player in hidden_players:
-            self.__cardsets__[player.value] = assigned_hands[player]
\ No newline at end of file
+    def sample_layouts(self, num_layouts: int) -> List[Dict[PlayerPosition, CardSet]]:
+        if self.__contract__.declarer is self.__position__:
+            return MinimaxAgent.sample_layouts(self, num_layouts)
+        return super().sample_layouts(num_layouts)
+
+    def sample_weighted_layouts(self, num_layouts: int) -> Tuple[List[Dict[PlayerPosition, CardSet]], List[float]]:
+        if self.__contract__.declarer is self.__position__:
+            return MinimaxAgent.sample_weighted_layouts(self, num_layouts)
+        return super().sample_weighted_layouts(num_layouts)
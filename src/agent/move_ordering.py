@@ -0,0 +1,75 @@
+"""
+move_ordering.py
+----------------
+
+Move ordering for the alpha-beta search of the minimax agents. The sooner
+the best card of a node is searched, the sooner the other cards are cut off.
+Cards are tried in the order
+
+1. cards that win the trick so far, unless the partner is already winning
+2. killer moves, the cards that caused a cutoff at the same ply recently
+3. the history heuristic, how often the card caused a cutoff for the player
+
+with ties broken by the card index, i.e. the higher card first.
+"""
+
+from typing import List
+
+from agent.bitboard import BitGameState, TRICK_BITS, iter_cards, trick_winner
+
+WINNING_SCORE = 1 << 40
+KILLER_SCORE = 1 << 39
+
+class MoveOrdering:
+    NUM_KILLERS = 2
+
+    def __init__(self) -> None:
+        # history[seat][card], kept for the whole deal
+        self.history = [[0] * 52 for _ in range(4)]
+        self.killers: List[List[int]] = []
+
+    def new_search(self, max_ply: int) -> None:
+        """
+        Clear the killer moves, the plies of the previous search are not the
+        plies of the next one.
+        """
+        self.killers = [[] for _ in range(max_ply)]
+
+    def order(self, moves: int, state: BitGameState, trump: int, ply: int) -> List[int]:
+        """
+        Return the cards in the 52-bit mask of moves, best first.
+        """
+        player = state.cur_player()
+        history = self.history[player]
+        killers = self.killers[ply] if ply < len(self.killers) else []
+
+        winning_bonus = 0
+        trick_len = state.trick_len
+        if trick_len > 0:
+            winner = trick_winner(state.trick, trick_len, state.leader, trump)
+            # Nothing to gain from overtaking the partner
+            winning_bonus = 0 if (winner - player) % 2 == 0 else WINNING_SCORE
+
+        def score(card: int) -> int:
+            value = history[card]
+            if card in killers:
+                value += KILLER_SCORE
+            if winning_bonus:
+                trick = state.trick | (card << (TRICK_BITS * trick_len))
+                if trick_winner(trick, trick_len + 1, state.leader, trump) == player:
+                    value += winning_bonus
+            return value
+
+        return sorted(iter_cards(moves), key=lambda card: (-score(card), card))
+
+    def record_cutoff(self, player: int, card: int, ply: int, depth: int) -> None:
+        """
+        The card caused a cutoff for the player at the ply, with depth tricks
+        left to search.
+        """
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+            if card not in killers:
+                killers.insert(0, card)
+                del killers[self.NUM_KILLERS:]
+        self.history[player][card] += (depth + 1) * (depth + 1)
@@ -2,7 +2,7 @@ from typing import List, Dict
 
 from objects import CardResp
 from .generic_agent import GenericAgent
-from .dds_eval import DDSEvaluator
+from .dds_eval import DDSEvaluator, cardsets_to_remain_cards
 from .pbn import PBN
 from .card_stats import Card, PlayerPosition
 from .card_utils import CardSet, card_to_index, index_to_card
@@ -21,11 +21,11 @@ class TheOracle(GenericAgent):
         return "Oracle"
 
     def choose_card(self, lead_pos: PlayerPosition = None, current_trick52: List[int] = None, playing_dummy = False) -> int:
-        pbn_str = PBN.from_cardsets(self.__cardsets__, PlayerPosition.NORTH)
+        remain_cards = cardsets_to_remain_cards(self.__cardsets__)
         lead_pos = self.__position__ if lead_pos is None else lead_pos
         cards = [] if current_trick52 is None \
             else [Card.from_code(idx) for idx in current_trick52]
-        scores = DDSEvaluator(self.__contract__.trump_suit, lead_pos, cards, pbn_str)
+        scores = DDSEvaluator(self.__contract__.trump_suit, lead_pos, cards, remain_cards)
         card_idx = scores.get_best_card()
         return card_idx
 
@@ -0,0 +1,153 @@
+import contextlib
+import io
+import random
+import time
+import unittest
+
+import numpy as np
+
+from agent.csp.backtrack import BacktrackingSearch, BeamSearch
+from agent.csp.benchmark import DeepCopySearch, RescanSearch, random_csps, time_search
+from agent.csp.util import create_map_coloring_csp
+
+class TestTrail(unittest.TestCase):
+    def test_same_assignment_as_deep_copy(self) -> None:
+        csps = list(random_csps(10))
+        self.assertEqual(time_search(BacktrackingSearch, csps)[1], time_search(DeepCopySearch, csps)[1])
+
+    def test_undo_restores_domains(self) -> None:
+        solver = BacktrackingSearch()
+        solver.domains = [np.ones(4, dtype=bool), np.ones(3, dtype=bool)]
+        solver.units = [np.eye(4, dtype=bool), np.eye(3, dtype=bool)]
+        solver.mcv = False
+        solver.trail = []
+        solver.restrict_domain(1, np.array([True, False, True]))
+        mark = len(solver.trail)
+        solver.fix_value(0, 2)
+        solver.restrict_domain(1, np.array([False, False, True]))
+        self.assertEqual([domain.tolist() for domain in solver.domains], [[False, False, True, False], [False, False, True]])
+        solver.undo_trail(mark)
+        self.assertEqual([domain.tolist() for domain in solver.domains], [[True] * 4, [True, False, True]])
+        solver.undo_trail(0)
+        self.assertEqual([domain.tolist() for domain in solver.domains], [[True] * 4, [True] * 3])
+
+class TestIncrementalMCV(unittest.TestCase):
+    def test_same_search_as_rescan(self) -> None:
+        """
+        The variables are picked in the same order, so the searches take the
+        same number of operations, with fewer constraint checks.
+        """
+        csps = list(random_csps(10, seed=2)) + [create_map_coloring_csp()]
+        for ac3 in (False, True):
+            for csp in csps:
+                solvers = [RescanSearch(), BacktrackingSearch()]
+                for solver in solvers:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        solver.solve(csp, mcv=True, ac3=ac3)
+                self.assertEqual(solvers[1].allAssignments, solvers[0].allAssignments)
+                self.assertEqual(solvers[1].numOperations, solvers[0].numOperations)
+                self.assertLessEqual(solvers[1].numConstraintChecks, solvers[0].numConstraintChecks)
+
+class TestTopAssignments(unittest.TestCase):
+    def solve(self, csp, **options) -> BacktrackingSearch:
+        solver = BacktrackingSearch()
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.solve(csp, mcv=True, ac3=True, **options)
+        return solver
+
+    def test_best_only(self) -> None:
+        for csp in random_csps(20, seed=1):
+            expected = self.solve(csp)
+            for branch_and_bound in (False, True):
+                solver = self.solve(csp, top_k=1, branch_and_bound=branch_and_bound)
+                self.assertEqual(solver.optimalAssignment, expected.optimalAssignment)
+                self.assertEqual(solver.optimalWeight, expected.optimalWeight)
+                self.assertEqual(solver.topAssignments, [(expected.optimalWeight, expected.optimalAssignment)])
+                self.assertEqual(solver.allAssignments, [])
+
+    def test_top_k(self) -> None:
+        csp = create_map_coloring_csp()
+        csp.add_unary_factor('T', lambda x: {'red': 1, 'blue': 2, 'green': 3}[x])
+        csp.add_unary_factor('SA', lambda x: 2 if x == 'red' else 1)
+        weights = sorted([solver_weight for solver_weight, _ in self.solve(csp, top_k=100).topAssignments], reverse=True)
+        self.assertEqual(len(weights), 18)
+        for branch_and_bound in (False, True):
+            solver = self.solve(csp, top_k=4, branch_and_bound=branch_and_bound)
+            self.assertEqual([weight for weight, _ in solver.topAssignments], weights[:4])
+        solver = self.solve(csp, top_k=1, branch_and_bound=True)
+        self.assertGreater(solver.numPrunedAssignments, 0)
+        self.assertLess(solver.numOperations, self.solve(csp).numOperations)
+
+    def test_branch_and_bound_needs_top_k(self) -> None:
+        with self.assertRaises(ValueError):
+            self.solve(create_map_coloring_csp(), branch_and_bound=True)
+
+class TestCompile(unittest.TestCase):
+    def test_factor_tables(self) -> None:
+        csp = create_map_coloring_csp()
+        csp.add_unary_factor('T', lambda x: 2 if x == 'green' else 1)
+        compiled = csp.compile()
+        sa, wa, t = (compiled.varIndex[var] for var in ['SA', 'WA', 'T'])
+        self.assertEqual(compiled.unaryFactors[t].tolist(), [1, 1, 2])
+        self.assertEqual(compiled.unaryFactors[sa].tolist(), [1, 1, 1])
+        self.assertEqual([compiled.variables[j] for j, _ in compiled.binaryFactors[sa]], csp.get_neighbor_vars('SA'))
+        table = dict(compiled.binaryFactors[wa])[sa]
+        self.assertEqual(table.tolist(), [[0, 1, 1], [1, 0, 1], [1, 1, 0]])
+        self.assertEqual(compiled.supports[wa][sa].tolist(), (table != 0).tolist())
+
+    def test_map_coloring(self) -> None:
+        csp = create_map_coloring_csp()
+        for mcv in (False, True):
+            for ac3 in (False, True):
+                solver = BacktrackingSearch()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    solver.solve(csp, mcv=mcv, ac3=ac3)
+                self.assertEqual(solver.numOptimalAssignments, 18)
+                assignment = solver.optimalAssignment
+                self.assertTrue(all(assignment['SA'] != assignment[var] for var in csp.get_neighbor_vars('SA')))
+
+class TestBeamSearch(unittest.TestCase):
+    def test_wide_beam_finds_optimum(self) -> None:
+        for csp in random_csps(20, seed=3):
+            expected = BacktrackingSearch()
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected.solve(csp, mcv=True, ac3=True, top_k=1)
+            for mcv in (False, True):
+                for ac3 in (False, True):
+                    solver = BeamSearch(16)
+                    solver.solve(csp, mcv=mcv, ac3=ac3)
+                    self.assertAlmostEqual(solver.optimalWeight, expected.optimalWeight)
+                    self.assertLessEqual(solver.numAssignments, 16)
+                    self.assertEqual(solver.allWeights, sorted(solver.allWeights, reverse=True))
+
+    def test_map_coloring(self) -> None:
+        csp = create_map_coloring_csp()
+        solver = BeamSearch(4)
+        solver.solve(csp, ac3=True)
+        self.assertEqual(solver.numAssignments, 4)
+        assignment = solver.optimalAssignment
+        self.assertTrue(all(assignment['SA'] != assignment[var] for var in csp.get_neighbor_vars('SA')))
+
+    def test_deadline(self) -> None:
+        """
+        Past the deadline the search still returns a complete assignment,
+        from its best partial assignment.
+        """
+        csp = next(random_csps(1, seed=4))
+        solver = BeamSearch(16)
+        solver.solve(csp, mcv=True, deadline=time.perf_counter() - 1)
+        self.assertTrue(solver.timedOut)
+        self.assertEqual(solver.numAssignments, 1)
+        self.assertEqual(len(solver.optimalAssignment), len(csp.variables))
+        self.assertGreater(solver.optimalWeight, 0)
+
+    def test_sample(self) -> None:
+        csp = create_map_coloring_csp()
+        solver = BeamSearch(8)
+        solver.solve(csp)
+        self.assertIn(solver.sample(random.Random(0)), solver.allAssignments)
+        solver.allAssignments = []
+        self.assertEqual(solver.sample(), {})
+
+if __name__ == "__main__":
+    unittest.main()
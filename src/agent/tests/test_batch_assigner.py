@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from agent.assigners.batch_assigner import BatchAssigner
+from agent.assigners.csp_assigner_v2 import CSPAssignerV2
+from agent.card_stats import CardSuit, PlayerPosition
+from agent.card_utils import card_to_index
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+def suit_counts(layouts: np.ndarray, suit: CardSuit) -> np.ndarray:
+    """
+    The number of cards of the suit of every player in every layout.
+    """
+    return layouts[:, :, suit.value * 13:(suit.value + 1) * 13].sum(axis=2)
+
+class TestBatchAssigner(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        SOUTH is the declarer, EAST and WEST are hidden.
+        """
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        self.unseen_cards = set(cardsets[EAST]) | set(cardsets[WEST])
+        self.unseen_counts = {PlayerPosition.EAST: 13, PlayerPosition.WEST: 13}
+
+    def check_layouts(self, layouts: np.ndarray, num_layouts: int) -> None:
+        self.assertEqual(layouts.shape, (num_layouts, 2, 52))
+        self.assertTrue((layouts.sum(axis=2) == 13).all())
+        # Every unseen card is held by exactly one player
+        held = layouts.sum(axis=1)
+        unseen = np.zeros(52, dtype=int)
+        unseen[list(self.unseen_cards)] = 1
+        self.assertTrue((held == unseen).all())
+
+    def test_counts(self) -> None:
+        layouts = BatchAssigner.assign(self.unseen_cards, self.unseen_counts, 500, rng=0)
+        self.check_layouts(layouts, 500)
+        # Every card goes to EAST half of the time
+        self.assertTrue((np.abs(layouts[:, 0, list(self.unseen_cards)].mean(axis=0) - 0.5) < 0.1).all())
+
+    def test_shown_out(self) -> None:
+        shown_out = {PlayerPosition.WEST: {CardSuit.CLUBS, CardSuit.SPADES}}
+        layouts = BatchAssigner.assign(self.unseen_cards, self.unseen_counts, 200, shown_out, rng=1)
+        self.check_layouts(layouts, 200)
+        self.assertTrue((suit_counts(layouts, CardSuit.CLUBS)[:, 1] == 0).all())
+        self.assertTrue((suit_counts(layouts, CardSuit.SPADES)[:, 1] == 0).all())
+
+    def test_suit_targets(self) -> None:
+        targets = {PlayerPosition.EAST: {CardSuit.HEARTS: (7, 1)}}
+        layouts = BatchAssigner.assign(self.unseen_cards, self.unseen_counts, 200, suit_targets=targets, rng=2)
+        self.check_layouts(layouts, 200)
+        self.assertTrue((suit_counts(layouts, CardSuit.HEARTS)[:, 0] == 7).all())
+        # EAST holds one of the AKQJ of hearts
+        self.assertTrue((layouts[:, 0, 13:17].sum(axis=1) == 1).all())
+
+    def test_impossible(self) -> None:
+        with self.assertRaises(ValueError):
+            # 11 hearts are unseen
+            BatchAssigner.assign(self.unseen_cards, self.unseen_counts, 10,
+                                 shown_out_suits={PlayerPosition.EAST: {CardSuit.HEARTS}},
+                                 suit_targets={PlayerPosition.WEST: {CardSuit.HEARTS: (2, 1)}})
+        with self.assertRaises(ValueError):
+            BatchAssigner.assign(self.unseen_cards, {PlayerPosition.EAST: 13, PlayerPosition.WEST: 12}, 10)
+
+    def test_csp_assigner_layouts(self) -> None:
+        player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS), PlayerPosition.WEST: (13, None)}
+        shown_out = {PlayerPosition.WEST: {CardSuit.CLUBS}}
+        assigner = CSPAssignerV2(self.unseen_cards, player_stats, shown_out)
+        layouts = assigner.assign_layouts(300, rng=3)
+        self.check_layouts(layouts, 300)
+        self.assertTrue((suit_counts(layouts, CardSuit.CLUBS)[:, 1] == 0).all())
+        # The hearts of EAST follow the weights of the CSP
+        marginals = assigner.solve().marginals[f"{PlayerPosition.EAST}_{CardSuit.HEARTS}"]
+        hearts = suit_counts(layouts, CardSuit.HEARTS)[:, 0]
+        for num_cards, prob in marginals.items():
+            self.assertAlmostEqual((hearts == num_cards).mean(), prob, delta=0.1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+
+from agent.bitboard import (BitGameEnv, BitGameState, bits_to_cardset, bits_to_hand,
+                            cardset_to_bits, collapse_equivalent, legal_moves, trick_winner, iter_cards, TRICK_BITS)
+from agent.card_stats import Card, CardSuit, PlayerPosition, PlayerTurn
+from agent.card_utils import card_to_index
+from agent.game_env import GameEnv, GameState
+from agent.generic_agent import Contract
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+def pack(cards) -> int:
+    trick = 0
+    for k, card in enumerate(cards):
+        trick |= Card.from_str(card).code() << (TRICK_BITS * k)
+    return trick
+
+class TestBitboard(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        Test case: from declarer.pbn
+
+        N: AJ4.T7.AT652.KJ2
+        E: K73.A985432.Q9.7
+        S: 985..KJ84.AQT654
+        W: QT62.KQJ6.73.983
+        """
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        self.deals = deal_str.split()
+        self.cardsets = [card_to_index(deal) for deal in self.deals]
+        self.hands = tuple(cardset_to_bits(cardset) for cardset in self.cardsets)
+
+    def test_conversions(self) -> None:
+        for seat in range(4):
+            self.assertEqual(bits_to_cardset(self.hands[seat]), self.cardsets[seat])
+            self.assertEqual(bits_to_hand(self.hands[seat]), self.deals[seat])
+            self.assertEqual(list(iter_cards(self.hands[seat])), sorted(self.cardsets[seat]))
+
+    def test_legal_moves(self) -> None:
+        # SOUTH is void in hearts and can play any card
+        self.assertEqual(legal_moves(self.hands[SOUTH], pack(["H2"]), 1), self.hands[SOUTH])
+        spades = legal_moves(self.hands[WEST], pack(["S9"]), 1)
+        self.assertEqual(bits_to_hand(spades), "QT62...")
+        self.assertEqual(legal_moves(self.hands[WEST], 0, 0), self.hands[WEST])
+
+    def test_collapse_equivalent(self) -> None:
+        live = self.hands[NORTH] | self.hands[EAST] | self.hands[SOUTH] | self.hands[WEST]
+        # With all the cards still out only touching cards are equivalent
+        self.assertEqual(bits_to_hand(collapse_equivalent(self.hands[SOUTH], live, True)), "95..KJ84.AQT6")
+        self.assertEqual(bits_to_hand(collapse_equivalent(self.hands[EAST], live, False)), "K73.A95.Q9.7")
+        # The S7, S6, H7 and H6 have been played
+        live &= ~cardset_to_bits(card_to_index("76.76.."))
+        self.assertEqual(bits_to_hand(collapse_equivalent(self.hands[SOUTH], live, True)), "9..KJ84.AQT6")
+        hearts = legal_moves(self.hands[EAST], pack(["HT"]), 1)
+        self.assertEqual(bits_to_hand(collapse_equivalent(hearts, live, False)), ".A9..")
+        # The DKQJ and D987 have been played, the D6 only joins the DA and DT
+        # when honours score the same
+        live &= ~cardset_to_bits(card_to_index("..KQJ987."))
+        self.assertEqual(bits_to_hand(collapse_equivalent(self.hands[NORTH], live, True)), "AJ4.T7.A62.KJ2")
+        self.assertEqual(bits_to_hand(collapse_equivalent(self.hands[NORTH], live, False)), "AJ4.T7.A2.KJ2")
+
+    def test_trick_winner(self) -> None:
+        trick = pack(["S9", "SQ", "SA", "S3"])
+        self.assertEqual(trick_winner(trick, 4, SOUTH, CardSuit.NT.value), NORTH)
+        trick = pack(["S9", "SQ", "SJ", "H2"])
+        self.assertEqual(trick_winner(trick, 4, SOUTH, CardSuit.NT.value), WEST)
+        self.assertEqual(trick_winner(trick, 4, SOUTH, CardSuit.HEARTS.value), EAST)
+        self.assertEqual(trick_winner(trick, 2, SOUTH, CardSuit.HEARTS.value), WEST)
+
+    def test_same_tricks_as_game_env(self) -> None:
+        contract = Contract(3, CardSuit.HEARTS, PlayerPosition.EAST)
+        game_env = GameEnv(contract)
+        bit_env = BitGameEnv(contract)
+        state = GameState([set(cardset) for cardset in self.cardsets], cur_turn=PlayerTurn(PlayerPosition.SOUTH))
+        bit_state = BitGameState(self.hands, SOUTH)
+        plays = ["S9", "SQ", "SA", "S3", "HT", "H2", "C4", "HK", "D3", "DA", "DQ", "D4"]
+        for card_str in plays:
+            card = Card.from_str(card_str).code()
+            self.assertEqual(bits_to_cardset(bit_env.get_legal_actions(bit_state)),
+                             set(game_env.get_legal_actions(state)))
+            state = game_env.move_to_next_player(state, card)
+            bit_state = bit_env.move_to_next_player(bit_state, card)
+            self.assertEqual(bit_state.cur_player(), state.cur_player().position().value)
+            self.assertEqual(bit_state.tricks_won, state._tricks_won)
+            for seat in range(4):
+                self.assertEqual(bits_to_cardset(bit_state.hands[seat]), state._cardsets[seat])
+        self.assertEqual(bit_state.tricks_won, 1.5)
+        # The HT was given up to the HK
+        self.assertEqual(bit_state.deductions, 0.5)
+
+    def test_evaluation_mid_trick(self) -> None:
+        # Spot cards only so that no DEDUCTION applies
+        hands = [cardset_to_bits(card_to_index(hand)) for hand in ["98...", "7.9..", ".87..", "65..."]]
+        contract = Contract(1, CardSuit.NT, PlayerPosition.EAST)
+        bit_env = BitGameEnv(contract)
+
+        def exact_tricks(state: BitGameState) -> float:
+            if bit_env.is_end(state):
+                return state.tricks_won
+            values = []
+            for card in iter_cards(bit_env.get_legal_actions(state)):
+                state.play(card, bit_env.trump)
+                values.append(exact_tricks(state))
+                state.undo()
+            return max(values) if state.cur_player() % 2 == 0 else min(values)
+
+        for leader in range(4):
+            state = BitGameState(hands, leader)
+            for _ in range(3):
+                state.play(next(iter_cards(bit_env.get_legal_actions(state))), bit_env.trump)
+                self.assertEqual(bit_env.evaluation(state), exact_tricks(state))
+
+    def test_play_and_undo(self) -> None:
+        trump = CardSuit.HEARTS.value
+        state = BitGameState(self.hands, SOUTH)
+        plays = ["S9", "SQ", "SA", "S3", "HT", "H2"]
+        snapshots = []
+        for card_str in plays:
+            snapshots.append((list(state.hands), state.leader, state.trick, state.trick_len, state.tricks_won))
+            state.play(Card.from_str(card_str).code(), trump)
+        self.assertEqual(state.leader, NORTH)
+        self.assertEqual(state.tricks_won, 1)
+        for snapshot in reversed(snapshots):
+            state.undo()
+            self.assertEqual((state.hands, state.leader, state.trick, state.trick_len, state.tricks_won), snapshot)
+
+    def test_from_game_state(self) -> None:
+        trick = [(PlayerPosition.SOUTH, Card.from_str("S9").code()),
+                 (PlayerPosition.WEST, Card.from_str("SQ").code())]
+        state = GameState(self.cardsets, cur_turn=PlayerTurn(PlayerPosition.NORTH), partial_trick=trick)
+        bit_state = BitGameState.from_game_state(state)
+        self.assertEqual(bit_state.leader, SOUTH)
+        self.assertEqual(bit_state.trick_len, 2)
+        self.assertEqual(bit_state.trick, pack(["S9", "SQ"]))
+        self.assertEqual(bit_state.cur_player(), NORTH)
+
+if __name__ == "__main__":
+    unittest.main()
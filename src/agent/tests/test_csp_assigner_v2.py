@@ -1,9 +1,12 @@
 import math
 import unittest
 
+import numpy as np
+
 from agent.card_utils import card_to_index
 from agent.card_stats import PlayerPosition, Card, CardSuit, CardRank
-from agent.assigners.csp_assigner_v2 import CSPAssignerV2
+from agent.assigners.csp_assigner_v2 import BIDDING_TABLE, SMOOTH_FACTOR, CSPAssignerV2, SolverCache, prob_H_given_C_table
+from agent.csp.backtrack import BeamSearch
 
 NORTH = 0
 EAST = 1
@@ -83,5 +86,131 @@ class TestCSPAssignerV2ContractEast(unittest.TestCase):
                     # This is no longer a probability since we multiply it by the weights of evidence
                     # self.assertAlmostEqual(accm_prob, 1)
 
+    def test_bidding_table_key_order(self):
+        # BIDDING_TABLE is keyed by (honors, cards), as built by parse_bid.py
+        table = prob_H_given_C_table(13, 4)
+        for (num_honor, num_cards), count in BIDDING_TABLE.items():
+            prob_honor = math.comb(4, num_honor) * math.comb(13 - 4, num_cards - num_honor) / math.comb(13, num_cards)
+            self.assertAlmostEqual(table[num_honor][num_cards], prob_honor * (count + SMOOTH_FACTOR))
+
+class TestSolverCache(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "52.J76.KQJ874.T9 AK3.T9854.T.K832 Q976.Q.9632.QJ74 JT84.AK32.A5.A65"
+        cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        self.unseen_cards = set(list(cardsets[NORTH]) + list(cardsets[EAST]))
+        self.player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS),
+                             PlayerPosition.NORTH: (13, CardSuit.DIAMONDS)}
+        self.solvers = SolverCache(16)
+
+    def test_same_csp_reuses_solver(self) -> None:
+        solver = CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=self.solvers).solve()
+        assigner = CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=self.solvers)
+        self.assertIs(assigner.solve(), solver)
+        self.assertIs(assigner._csp, solver.csp)
+        assignment = assigner.assign_cards()
+        self.assertEqual({player: len(cards) for player, cards in assignment.items()},
+                         {PlayerPosition.EAST: 13, PlayerPosition.NORTH: 13})
+
+    def test_different_csp(self) -> None:
+        solver = CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=self.solvers).solve()
+        shown_out = {PlayerPosition.EAST: {CardSuit.CLUBS}}
+        other = CSPAssignerV2(self.unseen_cards, self.player_stats, shown_out, solvers=self.solvers).solve()
+        self.assertIsNot(other, solver)
+        self.assertEqual(other.optimalAssignment["E_C"], 0)
+        player_stats = {PlayerPosition.EAST: (13, CardSuit.SPADES), PlayerPosition.NORTH: (13, None)}
+        self.assertIsNot(CSPAssignerV2(self.unseen_cards, player_stats, {}, solvers=self.solvers).solve(), solver)
+
+    def test_least_recently_used(self) -> None:
+        solvers = SolverCache(1)
+        solver = CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=solvers).solve()
+        shown_out = {PlayerPosition.EAST: {CardSuit.CLUBS}}
+        CSPAssignerV2(self.unseen_cards, self.player_stats, shown_out, solvers=solvers).solve()
+        self.assertEqual(len(solvers), 1)
+        self.assertIsNot(CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=solvers).solve(), solver)
+
+    def test_no_solver_cache(self) -> None:
+        solver = CSPAssignerV2(self.unseen_cards, self.player_stats, {}).solve()
+        self.assertIsNot(CSPAssignerV2(self.unseen_cards, self.player_stats, {}).solve(), solver)
+
+    def test_shown_out_key_order(self) -> None:
+        suits = [CardSuit.CLUBS, CardSuit.SPADES, CardSuit.DIAMONDS]
+        keys = {CSPAssignerV2(self.unseen_cards, self.player_stats, {PlayerPosition.EAST: set(order)}).csp_key()
+                for order in (suits, suits[::-1], suits[1:] + suits[:1])}
+        self.assertEqual(len(keys), 1)
+
+    def test_factor_tables_memoized(self) -> None:
+        hits = prob_H_given_C_table.cache_info().hits
+        for shown_out in ({}, {PlayerPosition.EAST: {CardSuit.CLUBS}}):
+            CSPAssignerV2(self.unseen_cards, self.player_stats, shown_out).solve()
+        self.assertGreaterEqual(prob_H_given_C_table.cache_info().hits, hits + 2)
+
+class TestWeightedLayouts(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "52.J76.KQJ874.T9 AK3.T9854.T.K832 Q976.Q.9632.QJ74 JT84.AK32.A5.A65"
+        cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        unseen_cards = set(cardsets[NORTH]) | set(cardsets[EAST])
+        player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS),
+                        PlayerPosition.NORTH: (13, CardSuit.DIAMONDS)}
+        self.assigner = CSPAssignerV2(unseen_cards, player_stats, {})
+
+    def test_weights(self) -> None:
+        layouts, weights = self.assigner.assign_weighted_layouts(100, rng=0)
+        self.assertEqual(layouts.shape, (100, 2, 52))
+        self.assertEqual(weights.shape, (100,))
+        self.assertTrue((weights > 0).all())
+        self.assertAlmostEqual(weights.sum(), 1)
+
+    def test_matches_posterior(self) -> None:
+        """
+        With a single bid, the weighted layouts estimate the marginals the
+        CSP solves for. With two, the CSP leaves out that the suits share
+        the same hands.
+        """
+        unseen_cards = {card.code() for card in self.assigner._unseen_cards}
+        player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS), PlayerPosition.NORTH: (13, None)}
+        assigner = CSPAssignerV2(unseen_cards, player_stats, {})
+        marginals = assigner.solve().marginals
+        layouts, weights = assigner.assign_weighted_layouts(20000, rng=0)
+        for var, counts in [("E_H", layouts[:, 0, 13:26].sum(axis=1)),
+                            ("E_H_Hon", layouts[:, 0, 13:17].sum(axis=1))]:
+            expected = sum(val * prob for val, prob in marginals[var].items())
+            self.assertAlmostEqual(float(np.dot(weights, counts)), expected, delta=0.05)
+
+class TestBeamFallback(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "52.J76.KQJ874.T9 AK3.T9854.T.K832 Q976.Q.9632.QJ74 JT84.AK32.A5.A65"
+        cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        self.unseen_cards = set(cardsets[NORTH]) | set(cardsets[EAST])
+        self.player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS),
+                             PlayerPosition.NORTH: (13, CardSuit.DIAMONDS)}
+
+    def test_beam_over_budget(self) -> None:
+        exact = CSPAssignerV2(self.unseen_cards, self.player_stats, {}).solve()
+        assigner = CSPAssignerV2(self.unseen_cards, self.player_stats, {})
+        # The exact solve is expected to take longer than the budget
+        assigner.SOLVE_MS = 60000
+        assigner.EXACT_MS_PER_ENTRY = 1e6
+        solver = assigner.solve()
+        self.assertIsInstance(solver, BeamSearch)
+        self.assertFalse(solver.timedOut)
+        self.assertAlmostEqual(solver.optimalWeight, exact.optimalWeight)
+        hands = assigner.assign_cards(sample=True)
+        self.assertEqual(hands[PlayerPosition.EAST] | hands[PlayerPosition.NORTH], self.unseen_cards)
+
+    def test_exact_within_budget(self) -> None:
+        assigner = CSPAssignerV2(self.unseen_cards, self.player_stats, {})
+        assigner.SOLVE_MS = 50
+        self.assertNotIsInstance(assigner.solve(), BeamSearch)
+
+    def test_timed_out_beam_not_cached(self) -> None:
+        solvers = SolverCache(16)
+        assigner = CSPAssignerV2(self.unseen_cards, self.player_stats, {}, solvers=solvers)
+        assigner.SOLVE_MS = 0
+        solver = assigner.solve()
+        self.assertIsInstance(solver, BeamSearch)
+        self.assertTrue(solver.timedOut)
+        self.assertEqual(len(solver.optimalAssignment), len(assigner._csp.variables))
+        self.assertEqual(len(solvers), 0)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from ddsolver.dd_result import DDResult
+
+# 3NT, the declarer's score by the number of tricks taken
+SCORE_3NT = [-50 * (9 - tricks) for tricks in range(9)] + [400 + 30 * (tricks - 9) for tricks in range(9, 14)]
+
+class TestDDResult(unittest.TestCase):
+    def setUp(self) -> None:
+        # Cards 0, 5 and 13 over 3 deals, card 13 is not scored in the 2nd
+        scores = np.full((3, 52), -1, dtype=np.int8)
+        scores[:, [0, 5, 13]] = [[3, 2, 1],
+                                 [2, 2, -1],
+                                 [1, 3, 3]]
+        self.result = DDResult(scores)
+
+    def test_cards(self) -> None:
+        self.assertEqual(len(self.result), 3)
+        self.assertEqual(self.result.cards.tolist(), [0, 5, 13])
+        self.assertEqual(self.result.to_dict(), {0: [3, 2, 1], 5: [2, 2, 3], 13: [1, 3]})
+
+    def test_expected_tricks(self) -> None:
+        expected = self.result.expected_tricks()
+        self.assertEqual(list(expected), [0, 5, 13])
+        self.assertAlmostEqual(expected[0], 2)
+        self.assertAlmostEqual(expected[5], 7 / 3)
+        self.assertAlmostEqual(expected[13], 2)
+
+        weighted = self.result.expected_tricks([0.5, 0.25, 0.25])
+        self.assertAlmostEqual(weighted[0], 2.25)
+        self.assertAlmostEqual(weighted[5], 2.25)
+        self.assertAlmostEqual(weighted[13], 1.25)
+
+    def test_p_make_and_min_tricks(self) -> None:
+        self.assertEqual(self.result.p_make(2), {0: 0.667, 5: 1.0, 13: 0.5})
+        self.assertEqual(self.result.min_tricks(), {0: 1, 5: 2, 13: 1})
+
+    def test_expected_score(self) -> None:
+        # The declarer has taken 6 tricks: 9, 8, 7 / 8, 8 / 7, 9, 9 tricks
+        declarer = self.result.expected_score(SCORE_3NT, 6, True)
+        self.assertAlmostEqual(declarer[0], (400 - 50 - 100) / 3)
+        self.assertAlmostEqual(declarer[5], (-50 - 50 + 400) / 3)
+        self.assertAlmostEqual(declarer[13], (-100 + 400) / 2)
+
+        # A defender to play, the defence has taken 4 tricks: the declarer
+        # takes 6, 7, 8 / 7, 7 / 8, 6, 6 tricks
+        defender = self.result.expected_score(SCORE_3NT, 4, False)
+        self.assertAlmostEqual(defender[0], (150 + 100 + 50) / 3)
+        self.assertAlmostEqual(defender[5], (100 + 100 + 150) / 3)
+        self.assertAlmostEqual(defender[13], (50 + 150) / 2)
+
+    def test_expected_imps(self) -> None:
+        # Losing 450 and 500 against the best card of the deal is 10 and 11 IMPs
+        imps = self.result.expected_imps(SCORE_3NT, 6, True)
+        self.assertAlmostEqual(imps[0], -11 / 3)
+        self.assertAlmostEqual(imps[5], -10 / 3)
+        self.assertAlmostEqual(imps[13], -5.5)
+
+    def test_expected_matchpoints(self) -> None:
+        matchpoints = self.result.expected_matchpoints()
+        self.assertAlmostEqual(matchpoints[0], 0.5)
+        self.assertAlmostEqual(matchpoints[5], 1.75 / 3)
+        self.assertAlmostEqual(matchpoints[13], 0.375)
+
+if __name__ == '__main__':
+    unittest.main()
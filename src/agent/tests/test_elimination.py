@@ -0,0 +1,94 @@
+import contextlib
+import io
+import itertools
+import random
+import unittest
+
+from agent.csp.backtrack import BacktrackingSearch
+from agent.csp.benchmark import random_csps
+from agent.csp.elimination import VariableElimination
+from agent.csp.util import CSP, create_map_coloring_csp
+
+def weight(csp: CSP, assignment) -> float:
+    w = 1.0
+    for var in csp.variables:
+        if csp.unaryFactors[var]:
+            w *= csp.unaryFactors[var][assignment[var]]
+        for var2, factor in csp.binaryFactors[var].items():
+            # Every binary factor is stored for both variables
+            if csp.variables.index(var) < csp.variables.index(var2):
+                w *= factor[assignment[var]][assignment[var2]]
+    return w
+
+def brute_force_marginals(csp: CSP):
+    marginals = {var: {val: 0.0 for val in csp.values[var]} for var in csp.variables}
+    total = 0.0
+    for values in itertools.product(*(csp.values[var] for var in csp.variables)):
+        assignment = dict(zip(csp.variables, values))
+        w = weight(csp, assignment)
+        total += w
+        for var, val in assignment.items():
+            marginals[var][val] += w
+    return {var: {val: w / total for val, w in marginal.items()} for var, marginal in marginals.items()}
+
+def chain_csp() -> CSP:
+    """
+    A - B - C with B also joined to D, and a separate variable E.
+    """
+    csp = CSP()
+    for var, size in [("A", 3), ("B", 4), ("C", 3), ("D", 2), ("E", 3)]:
+        csp.add_variable(var, list(range(size)))
+    csp.add_unary_factor("A", lambda x: x + 1)
+    csp.add_unary_factor("E", lambda x: 3 - x)
+    csp.add_binary_factor("A", "B", lambda x, y: 1 + (x == y) * 2)
+    csp.add_binary_factor("C", "B", lambda x, y: x <= y)
+    csp.add_binary_factor("B", "D", lambda x, y: (x + y) % 2 + 0.5)
+    return csp
+
+class TestVariableElimination(unittest.TestCase):
+    def test_same_optimum_as_backtracking(self) -> None:
+        for csp in random_csps(30):
+            backtracking = BacktrackingSearch()
+            with contextlib.redirect_stdout(io.StringIO()):
+                backtracking.solve(csp, mcv=True, ac3=True)
+            solver = VariableElimination()
+            solver.solve(csp)
+            self.assertAlmostEqual(solver.optimalWeight, backtracking.optimalWeight)
+            self.assertAlmostEqual(weight(csp, solver.optimalAssignment), backtracking.optimalWeight)
+
+    def test_marginals(self) -> None:
+        csps = [chain_csp()] + list(random_csps(5))
+        for csp in csps:
+            solver = VariableElimination()
+            solver.solve(csp)
+            expected = brute_force_marginals(csp)
+            for var in csp.variables:
+                for val in csp.values[var]:
+                    self.assertAlmostEqual(solver.marginals[var][val], expected[var][val], msg=f"{var}={val}")
+
+    def test_sample(self) -> None:
+        csp = chain_csp()
+        solver = VariableElimination()
+        solver.solve(csp)
+        rng = random.Random(0)
+        samples = [solver.sample(rng) for _ in range(4000)]
+        self.assertTrue(all(weight(csp, assignment) > 0 for assignment in samples))
+        for var in csp.variables:
+            for val in csp.values[var]:
+                frequency = sum(assignment[var] == val for assignment in samples) / len(samples)
+                self.assertAlmostEqual(frequency, solver.marginals[var][val], delta=0.03)
+
+    def test_unsolvable(self) -> None:
+        csp = chain_csp()
+        csp.add_unary_factor("C", lambda x: x > 3)
+        solver = VariableElimination()
+        solver.solve(csp)
+        self.assertEqual(solver.optimalAssignment, {})
+        self.assertEqual(solver.sample(), {})
+
+    def test_cycle(self) -> None:
+        with self.assertRaises(ValueError):
+            VariableElimination().solve(create_map_coloring_csp())
+
+if __name__ == "__main__":
+    unittest.main()
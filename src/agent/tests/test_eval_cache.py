@@ -0,0 +1,61 @@
+import unittest
+
+from agent.bitboard import BitGameEnv, BitGameState, cardset_to_bits
+from agent.card_stats import Card, CardSuit, PlayerPosition, PlayerTurn
+from agent.card_utils import card_to_index
+from agent.eval_cache import EvalCache, leaf_key
+from agent.game_env import GameEnv, GameState
+from agent.generic_agent import Contract
+
+SOUTH = 2
+
+class TestEvalCache(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        self.cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        self.hands = [cardset_to_bits(cardset) for cardset in self.cardsets]
+        self.contract = Contract(3, CardSuit.HEARTS, PlayerPosition.EAST)
+
+    def test_lru_eviction(self) -> None:
+        cache = EvalCache(2)
+        cache.put(1, 5)
+        cache.put(2, 6)
+        self.assertEqual(cache.get(1), 5)
+        cache.put(3, 7)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 5)
+        self.assertEqual(cache.get(3), 7)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (3, 1, 2))
+
+    def test_invalid_size(self) -> None:
+        with self.assertRaises(ValueError):
+            EvalCache(0)
+
+    def test_key_distinguishes_positions(self) -> None:
+        key = leaf_key(self.hands, SOUTH, 0, 0, CardSuit.HEARTS.value)
+        self.assertNotEqual(key, leaf_key(self.hands, SOUTH, 0, 0, CardSuit.NT.value))
+        self.assertNotEqual(key, leaf_key(self.hands, SOUTH + 1, 0, 0, CardSuit.HEARTS.value))
+        swapped = [self.hands[1], self.hands[0]] + self.hands[2:]
+        self.assertNotEqual(key, leaf_key(swapped, SOUTH, 0, 0, CardSuit.HEARTS.value))
+
+    def test_bit_env_cached_evaluation(self) -> None:
+        cache = EvalCache()
+        game_env = BitGameEnv(self.contract, cache=cache)
+        state = BitGameState(self.hands, SOUTH)
+        state.play(Card.from_str("S9").code(), game_env.trump)
+        expected = BitGameEnv(self.contract).evaluation(state)
+        self.assertEqual(game_env.evaluation(state), expected)
+        self.assertEqual(game_env.evaluation(state), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_game_env_cached_evaluation(self) -> None:
+        cache = EvalCache()
+        game_env = GameEnv(self.contract, cache)
+        state = GameState([set(cardset) for cardset in self.cardsets], cur_turn=PlayerTurn(PlayerPosition.SOUTH))
+        expected = GameEnv(self.contract).evaluation(state)
+        self.assertEqual(game_env.evaluation(state), expected)
+        self.assertEqual(game_env.evaluation(state), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import itertools
+import math
+import random
+import unittest
+from collections import Counter
+
+from agent.assigners.csp_assigner_v2 import CSPAssignerV2
+from agent.assigners.exact_assigner import ExactAssigner
+from agent.card_stats import CardSuit, PlayerPosition
+from agent.card_utils import card_to_index
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+class TestExactAssigner(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        Three spades, two hearts and a club are left, EAST has shown out of
+        spades and WEST of clubs.
+        """
+        self.unseen_cards = card_to_index("AKQ.AK..A")
+        self.unseen_counts = {PlayerPosition.EAST: 3, PlayerPosition.WEST: 3}
+        self.shown_out = {PlayerPosition.EAST: {CardSuit.SPADES}, PlayerPosition.WEST: {CardSuit.CLUBS}}
+
+    def valid_layouts(self, unseen_counts, shown_out, placed=None):
+        """
+        Every layout that meets the constraints, by brute force.
+        """
+        placed = placed or {}
+        east, west = PlayerPosition.EAST, PlayerPosition.WEST
+        for east_cards in itertools.combinations(sorted(self.unseen_cards), unseen_counts[east]):
+            hands = {east: set(east_cards), west: self.unseen_cards - set(east_cards)}
+            if all(CardSuit(card // 13) not in shown_out.get(player, ()) and
+                   placed.get(player, set()) <= cards
+                   for player, cards in hands.items() for card in cards):
+                yield hands
+
+    def test_count_layouts(self) -> None:
+        # The spades go to WEST and the club to EAST, the hearts fill up the hands
+        self.assertEqual(ExactAssigner.count_layouts(self.unseen_cards, self.unseen_counts, self.shown_out), 1)
+        unseen_counts = {PlayerPosition.EAST: 2, PlayerPosition.WEST: 4}
+        count = ExactAssigner.count_layouts(self.unseen_cards, unseen_counts, self.shown_out)
+        self.assertEqual(count, len(list(self.valid_layouts(unseen_counts, self.shown_out))))
+        self.assertEqual(count, 2)
+        self.assertEqual(ExactAssigner.count_layouts(self.unseen_cards, self.unseen_counts), math.comb(6, 3))
+
+    def test_infeasible(self) -> None:
+        # WEST cannot hold the three spades in two cards
+        unseen_counts = {PlayerPosition.EAST: 4, PlayerPosition.WEST: 2}
+        self.assertEqual(ExactAssigner.count_layouts(self.unseen_cards, unseen_counts, self.shown_out), 0)
+        with self.assertRaises(ValueError):
+            ExactAssigner.assign(self.unseen_cards, unseen_counts, self.shown_out)
+
+    def test_uniform(self) -> None:
+        unseen_counts = {PlayerPosition.EAST: 2, PlayerPosition.WEST: 4}
+        layouts = list(self.valid_layouts(unseen_counts, {}))
+        random.seed(0)
+        num_draws = 3000
+        draws = Counter()
+        for _ in range(num_draws):
+            hands = ExactAssigner.assign(self.unseen_cards, unseen_counts)
+            self.assertEqual({player: len(cards) for player, cards in hands.items()}, unseen_counts)
+            draws[frozenset(hands[PlayerPosition.EAST])] += 1
+        self.assertEqual(len(draws), len(layouts))
+        expected = num_draws / len(layouts)
+        for count in draws.values():
+            self.assertLess(abs(count - expected), 0.3 * expected)
+
+    def test_placed(self) -> None:
+        unseen_counts = {PlayerPosition.EAST: 3, PlayerPosition.WEST: 3}
+        shown_out = {PlayerPosition.WEST: {CardSuit.CLUBS}}
+        placed = {PlayerPosition.WEST: card_to_index("A.A..")}
+        layouts = list(self.valid_layouts(unseen_counts, shown_out, placed))
+        self.assertEqual(ExactAssigner.count_layouts(self.unseen_cards, unseen_counts, shown_out, placed),
+                         len(layouts))
+        for seed in range(20):
+            hands = ExactAssigner.assign(self.unseen_cards, unseen_counts, shown_out, placed, rand_seed=seed)
+            self.assertIn(hands, layouts)
+
+class TestCSPAssignerVoids(unittest.TestCase):
+    def test_fill_respects_voids(self) -> None:
+        """
+        Only EAST bid, the cards of the suits no one bid must still keep out
+        of the hand of a player who has shown out of them.
+        """
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        cardsets = [card_to_index(deal) for deal in deal_str.split()]
+        unseen_cards = set(cardsets[EAST]) | set(cardsets[WEST])
+        player_stats = {PlayerPosition.EAST: (13, CardSuit.HEARTS), PlayerPosition.WEST: (13, None)}
+        shown_out = {PlayerPosition.EAST: {CardSuit.CLUBS}}
+        assigner = CSPAssignerV2(unseen_cards, player_stats, shown_out)
+        random.seed(0)
+        for _ in range(20):
+            hands = assigner.assign_cards(sample=True)
+            self.assertEqual(hands[PlayerPosition.EAST] | hands[PlayerPosition.WEST], unseen_cards)
+            self.assertEqual(len(hands[PlayerPosition.EAST]), 13)
+            self.assertFalse(any(card // 13 == CardSuit.CLUBS.value for card in hands[PlayerPosition.EAST]))
+
+if __name__ == "__main__":
+    unittest.main()
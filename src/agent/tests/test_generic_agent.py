@@ -0,0 +1,53 @@
+import unittest
+
+from agent.card_stats import CardSuit, PlayerPosition
+from agent.card_utils import card_to_index
+from agent.minimax_agent import MinimaxAgent
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+class TestUnseenCards(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        SOUTH declares 5C with NORTH as the dummy.
+        """
+        self.deal = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983".split()
+        self.agent = MinimaxAgent(self.deal[SOUTH], SOUTH)
+        self.agent.set_contract("5C", SOUTH)
+        self.agent.__cardsets__[NORTH] = card_to_index(self.deal[NORTH])
+
+    def play(self, cards) -> None:
+        for player_i, card in enumerate(cards):
+            self.agent.set_real_card_played(card_to_index(card).pop(), player_i % 4)
+
+    def rebuilt(self):
+        """
+        The unseen cards and tallies built from scratch.
+        """
+        tracked = self.agent.get_unseen_cards(), self.agent.get_unseen_tallies()
+        self.agent.reset_unseen_cards()
+        expected = self.agent.get_unseen_cards(), self.agent.get_unseen_tallies()
+        return tracked, expected
+
+    def test_initial_unseen_cards(self) -> None:
+        (unseen_cards, unseen_counts), (suit_counts, honor_counts) = self.rebuilt()[1]
+        self.assertEqual(unseen_cards, card_to_index(self.deal[EAST]) | card_to_index(self.deal[WEST]))
+        self.assertEqual(unseen_counts, {PlayerPosition.EAST: 13, PlayerPosition.WEST: 13})
+        self.assertEqual(suit_counts, {CardSuit.SPADES: 7, CardSuit.HEARTS: 11, CardSuit.DIAMONDS: 4, CardSuit.CLUBS: 4})
+        self.assertEqual(honor_counts, {CardSuit.SPADES: 2, CardSuit.HEARTS: 4, CardSuit.DIAMONDS: 1, CardSuit.CLUBS: 0})
+
+    def test_incremental_update(self) -> None:
+        self.agent.get_unseen_cards()
+        # WEST leads the HK, NORTH plays the H7, EAST wins with the HA and SOUTH ruffs
+        self.play([".K..", ".7..", ".A..", "...4", ".J..", ".T..", ".2.."])
+        tracked, expected = self.rebuilt()
+        self.assertEqual(tracked, expected)
+        unseen_cards, unseen_counts = expected[0]
+        self.assertEqual(unseen_counts, {PlayerPosition.EAST: 11, PlayerPosition.WEST: 11})
+        self.assertEqual(len(unseen_cards), 22)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,286 @@
+"""
+test_minimax_agent.py
+---------------------
+
+Regression tests for the minimax search. The positions are endings built
+from the boards in agent/boards/dataset: every hand keeps its first few
+cards (in card index order) and the player on the declarer's left is on lead.
+"""
+
+import glob
+import os
+import re
+import time
+import unittest
+from typing import Tuple
+
+from agent.bitboard import BitGameEnv, BitGameState, cardset_to_bits, iter_cards
+from agent.card_stats import PlayerPosition, PlayerTurn
+from agent.card_utils import card_to_index
+from agent.conf import dds
+from agent.game_env import GameState
+from agent.minimax_agent import MinimaxAgent, SearchTimeout, PIMC_MAKE, PIMC_MEAN, search_root_card, search_world
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), "..", "boards", "dataset")
+BOARD_PATTERN = re.compile(r'\[Deal "N:([^"]+)"\]\s*\[Declarer "([NESW])"\]\s*\[Contract "(\d[SHDCN]T?X{0,2})"\]')
+SOUTH = 2
+
+def load_endings(num_cards: int, boards_per_file: int):
+    """
+    Yield (deal, declarer, contract, cardsets) for the endings built from
+    the dataset boards.
+    """
+    for filename in sorted(glob.glob(os.path.join(DATASET_DIR, "*", "*.PBN"))):
+        with open(filename, "r") as file:
+            boards = BOARD_PATTERN.findall(file.read())
+        for deal, declarer, contract in boards[:boards_per_file]:
+            hands = [sorted(card_to_index(hand)) for hand in deal.split()]
+            cardsets = [set(hand[:num_cards]) for hand in hands]
+            yield deal, "NESW".index(declarer), contract, cardsets
+
+def clone_search(agent: MinimaxAgent, cur_states: GameState, depth: int = 1) -> int:
+    """
+    Reference version of MinimaxAgent.get_optimal_card() that allocates a new
+    state for every node of the game tree, to check the undo-based search.
+    """
+    game_env = BitGameEnv(agent.__contract__)
+
+    def recurse(game_state: BitGameState, depth: int, root_card: int, 
+                alpha: float, beta: float) -> Tuple[float, int]:
+        if game_env.is_end(game_state):
+            return (game_env.get_scores(game_state), root_card)
+        if depth == 0:
+            return (game_env.evaluation(game_state), root_card)
+        
+        actions = game_env.get_legal_actions(game_state)
+        depth = depth - 1 if game_env.last_card_to_play(game_state) else depth
+        if game_state.cur_player() % 2 == 0:
+            best_val = (float('-inf'), None)
+            for action in iter_cards(actions):
+                new_state = game_env.move_to_next_player(game_state, action)
+                new_root_card = action if root_card is None else root_card
+                val = recurse(new_state, depth, new_root_card, alpha, beta)
+                if val[0] > best_val[0]:
+                    best_val = val
+                if best_val[0] >= beta:
+                    break
+                alpha = max(alpha, best_val[0])
+            return best_val
+        else:
+            best_val = (float('inf'), None)
+            for action in iter_cards(actions):
+                new_state = game_env.move_to_next_player(game_state, action)
+                new_root_card = action if root_card is None else root_card
+                val = recurse(new_state, depth, new_root_card, alpha, beta)
+                if val[0] < best_val[0]:
+                    best_val = val
+                if best_val[0] <= alpha:
+                    break
+                beta = min(beta, best_val[0])
+            return best_val
+
+    root_state = BitGameState.from_game_state(cur_states)
+    optimal = recurse(root_state, depth, None, float('-inf'), float('inf'))
+    return optimal[1]
+
+class TestUndoSearch(unittest.TestCase):
+    def prepare_agent(self, deal: str, declarer: int, contract: str) -> MinimaxAgent:
+        agent = MinimaxAgent(deal.split()[SOUTH], SOUTH)
+        agent.set_contract(contract, declarer)
+        return agent
+
+    def game_state(self, cardsets, declarer: int) -> GameState:
+        leader = PlayerTurn(PlayerPosition((declarer + 1) % 4))
+        return GameState([set(cardset) for cardset in cardsets], cur_turn=leader)
+
+    def test_same_card_as_clone_search(self) -> None:
+        for deal, declarer, contract, cardsets in load_endings(4, 6):
+            agent = self.prepare_agent(deal, declarer, contract)
+            # Cards of the same value may be searched in a different order
+            agent.EQUIVALENT_CARDS = agent.ORDER_MOVES = False
+            expected = clone_search(agent, self.game_state(cardsets, declarer))
+            card_idx = agent.get_optimal_card(self.game_state(cardsets, declarer))
+            self.assertEqual(card_idx, expected, f"{deal} {contract}")
+
+    def test_same_card_as_clone_search_two_tricks(self) -> None:
+        for deal, declarer, contract, cardsets in load_endings(3, 3):
+            agent = self.prepare_agent(deal, declarer, contract)
+            agent.EQUIVALENT_CARDS = agent.ORDER_MOVES = False
+            expected = clone_search(agent, self.game_state(cardsets, declarer), depth=2)
+            card_idx = agent.get_optimal_card(self.game_state(cardsets, declarer), depth=2)
+            self.assertEqual(card_idx, expected, f"{deal} {contract}")
+
+    def test_transposition_table_persists(self) -> None:
+        deal, declarer, contract, cardsets = next(load_endings(4, 1))
+        agent = self.prepare_agent(deal, declarer, contract)
+        card_idx = agent.get_optimal_card(self.game_state(cardsets, declarer), depth=2)
+        hits = agent._tt.hits
+        self.assertEqual(agent.get_optimal_card(self.game_state(cardsets, declarer), depth=2), card_idx)
+        self.assertGreater(agent._tt.hits, hits)
+
+    def test_pruning_keeps_value(self) -> None:
+        """
+        Equivalent card pruning and move ordering only change the cards searched,
+        not the value of the position.
+        """
+        for deal, declarer, contract, cardsets in load_endings(5, 3):
+            values = []
+            for flag in (False, True):
+                agent = self.prepare_agent(deal, declarer, contract)
+                agent.EQUIVALENT_CARDS = agent.ORDER_MOVES = flag
+                state = BitGameState.from_game_state(self.game_state(cardsets, declarer))
+                values.append(agent.search(state, 2)[0])
+            self.assertEqual(values[0], values[1], f"{deal} {contract}")
+
+    def test_batch_leaves(self) -> None:
+        """
+        Solving the horizon in batches before the search gives the same value.
+        """
+        for deal, declarer, contract, cardsets in load_endings(4, 2):
+            values = []
+            for batch_leaves in (0, 1000):
+                agent = self.prepare_agent(deal, declarer, contract)
+                agent.BATCH_LEAVES = batch_leaves
+                state = BitGameState.from_game_state(self.game_state(cardsets, declarer))
+                values.append(agent.search(state, 2)[0])
+            self.assertEqual(values[0], values[1], f"{deal} {contract}")
+            # Every position the search evaluated was solved in the batch
+            self.assertEqual(agent._dds_cache.misses, 0)
+
+    def test_batch_leaves_deadline(self) -> None:
+        """
+        The horizon is not solved once the deadline has passed.
+        """
+        deal, declarer, contract, cardsets = next(load_endings(5, 1))
+        agent = self.prepare_agent(deal, declarer, contract)
+        agent.BATCH_LEAVES = 1000
+        state = BitGameState.from_game_state(self.game_state(cardsets, declarer))
+        with self.assertRaises(SearchTimeout):
+            agent.search(state, 3, deadline=time.perf_counter())
+        self.assertEqual(len(agent._dds_cache), 0)
+
+    def test_split_root(self) -> None:
+        for deal, declarer, contract, cardsets in load_endings(4, 3):
+            agent = self.prepare_agent(deal, declarer, contract)
+            # The root cards are searched in the order of get_legal_actions()
+            agent.ORDER_MOVES = False
+            expected = agent.get_optimal_card(self.game_state(cardsets, declarer), depth=2)
+            agent.ROOT_SPLIT, agent.PROCESSES = True, 2
+            card_idx = agent.get_optimal_card(self.game_state(cardsets, declarer), depth=2)
+            self.assertEqual(card_idx, expected, f"{deal} {contract}")
+
+    def test_iterative_deepening(self) -> None:
+        deal, declarer, contract, cardsets = next(load_endings(3, 1))
+        agent = self.prepare_agent(deal, declarer, contract)
+        expected = clone_search(agent, self.game_state(cardsets, declarer), depth=3)
+        card_idx = agent.iterative_deepening(self.game_state(cardsets, declarer), 60000)
+        self.assertEqual(card_idx, expected, f"{deal} {contract}")
+
+    def test_iterative_deepening_out_of_time(self) -> None:
+        """
+        The first iteration always completes, so a card is returned even
+        when the time budget is too small for any search.
+        """
+        deal, declarer, contract, cardsets = next(load_endings(4, 1))
+        agent = self.prepare_agent(deal, declarer, contract)
+        expected = agent.get_optimal_card(self.game_state(cardsets, declarer), depth=1)
+        card_idx = agent.iterative_deepening(self.game_state(cardsets, declarer), 0)
+        self.assertEqual(card_idx, expected)
+
+class TestPIMC(unittest.TestCase):
+    def setUp(self) -> None:
+        """
+        SOUTH declares 5C, WEST leads the HK and SOUTH is void in hearts.
+        """
+        deal = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983".split()
+        self.agent = MinimaxAgent(deal[SOUTH], SOUTH)
+        self.agent.set_contract("5C", SOUTH)
+        self.agent.__cardsets__[0] = card_to_index(deal[0])
+        for player_i, card in enumerate([".K..", ".7..", ".A.."]):
+            self.agent.set_real_card_played(card_to_index(card).pop(), player_i)
+        self.agent.PIMC_WORLDS = 3
+
+    def draw_worlds(self):
+        worlds = []
+        for _ in range(self.agent.PIMC_WORLDS):
+            self.agent.assign_cards()
+            worlds.append(BitGameState.from_game_state(self.agent.current_state(self.agent.__cardsets__)))
+        return worlds
+
+    def test_plays_own_card(self) -> None:
+        self.assertIn(self.agent.choose_card(), self.agent.__cards__)
+
+    def test_process_pool(self) -> None:
+        worlds = self.draw_worlds()
+        serial = self.agent.search_worlds(worlds)
+        self.agent.PROCESSES = 2
+        self.assertEqual(self.agent.search_worlds(worlds), serial)
+        self.assertEqual(len(serial), 3)
+        self.assertEqual(set(serial[0].keys()), self.agent.__cards__)
+        self.agent.ROOT_SPLIT = True
+        self.assertEqual(self.agent.search_worlds(worlds), serial)
+
+    def test_deadline(self) -> None:
+        self.agent.PIMC_DEADLINE_MS = 0
+        self.assertEqual(len(self.agent.search_worlds(self.draw_worlds())), 1)
+
+    def test_worker_deadline(self) -> None:
+        world = self.draw_worlds()[0]
+        args = (type(self.agent), self.agent.__contract__, self.agent.__position__.value, 1, world)
+        # A layout still running at the deadline stops and reports nothing
+        self.assertIsNone(search_world(*args, time.perf_counter()))
+        self.assertEqual(search_root_card(*args, min(self.agent.__cards__), False, time.perf_counter()), (None, False))
+        self.assertEqual(search_world(*args), self.agent.root_values(world, 1))
+
+    def test_process_pool_deadline(self) -> None:
+        self.agent.PROCESSES = 2
+        self.agent.PIMC_DEADLINE_MS = 0
+        scores = self.agent.search_each_world(self.draw_worlds())
+        self.assertIsNotNone(scores[0])
+        self.assertEqual(len(scores), 3)
+
+    def test_aggregate_scores(self) -> None:
+        # 5C needs 11 tricks
+        scores = [{0: (13, 13), 1: (11, 11), 2: (13, 13)}, {0: (9, 9), 1: (11, 11), 2: (10, 10)}]
+        self.agent.PIMC_AGGREGATE = PIMC_MEAN
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH), 2)
+        # The defenders play the card with the fewest tricks, the higher card on a tie
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH + 1), 0)
+        self.agent.PIMC_AGGREGATE = PIMC_MAKE
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH), 1)
+        # 11 tricks less a DEDUCTION, the contract makes
+        scores = [{0: (10.5, 11), 1: (13, 13)}, {0: (10.5, 11), 1: (9, 9)}]
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH), 0)
+        # 11 tricks less two honours given up in a trick against 10 tricks
+        scores = [{0: (10, 10), 1: (10, 11)}]
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH), 1)
+
+    def test_weighted_aggregate_scores(self) -> None:
+        scores = [{0: (13, 13), 1: (11, 11), 2: (13, 13)}, {0: (9, 9), 1: (11, 11), 2: (10, 10)}]
+        self.agent.PIMC_AGGREGATE = PIMC_MEAN
+        # Mostly the second layout: 1 has the most tricks on average
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH, [0.2, 0.8]), 1)
+        self.assertEqual(self.agent.aggregate_scores(scores, SOUTH, [0.5, 0.5]),
+                         self.agent.aggregate_scores(scores, SOUTH))
+
+    def test_whole_tricks(self) -> None:
+        """
+        NORTH and SOUTH give up the SK and the SQ in the last trick.
+        """
+        agent = MinimaxAgent("Q...", SOUTH)
+        agent.set_contract("1N", SOUTH)
+        hands = [cardset_to_bits(card_to_index(hand)) for hand in ["K...", "A...", "Q...", "2..."]]
+        state = BitGameState(hands, 3)
+        value, _, _, deductions = agent.search(state, 1)
+        self.assertEqual((value, deductions), (-1, 1))
+        # NORTH-SOUTH takes no trick
+        self.assertEqual(agent.root_values(state, 1), {card_to_index("2...").pop(): (-1, 0)})
+
+    def test_search_each_world(self) -> None:
+        self.agent.PIMC_DEADLINE_MS = 0
+        scores = self.agent.search_each_world(self.draw_worlds())
+        self.assertEqual(len(scores), 3)
+        self.assertIsNotNone(scores[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from agent.bitboard import BitGameState, cardset_to_bits, legal_moves
+from agent.card_stats import Card, CardSuit
+from agent.card_utils import card_to_index
+from agent.move_ordering import MoveOrdering
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+def codes(cards) -> list:
+    return [Card.from_str(card).code() for card in cards]
+
+class TestMoveOrdering(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        self.hands = [cardset_to_bits(card_to_index(deal)) for deal in deal_str.split()]
+        self.trump = CardSuit.HEARTS.value
+        self.ordering = MoveOrdering()
+        self.ordering.new_search(8)
+
+    def test_winning_cards_first(self) -> None:
+        # SOUTH leads the S9, WEST overtakes with the SQ or the ST
+        state = BitGameState(self.hands, SOUTH)
+        state.play(Card.from_str("S9").code(), self.trump)
+        moves = legal_moves(state.hands[WEST], state.trick, state.trick_len)
+        self.assertEqual(self.ordering.order(moves, state, self.trump, 1), codes(["SQ", "ST", "S6", "S2"]))
+
+    def test_no_overtaking_partner(self) -> None:
+        # SOUTH leads the CQ, NORTH has no reason to overtake with the CK
+        state = BitGameState(self.hands, SOUTH)
+        for card in ["CQ", "C3"]:
+            state.play(Card.from_str(card).code(), self.trump)
+        self.ordering.record_cutoff(NORTH, Card.from_str("C2").code(), 0, 1)
+        moves = legal_moves(state.hands[NORTH], state.trick, state.trick_len)
+        self.assertEqual(self.ordering.order(moves, state, self.trump, 2), codes(["C2", "CK", "CJ"]))
+
+    def test_killers_and_history(self) -> None:
+        state = BitGameState(self.hands, SOUTH)
+        self.ordering.record_cutoff(SOUTH, Card.from_str("C6").code(), 0, 1)
+        self.ordering.record_cutoff(SOUTH, Card.from_str("D8").code(), 3, 2)
+        order = self.ordering.order(state.hands[SOUTH], state, self.trump, 0)
+        self.assertEqual(order[:2], codes(["C6", "D8"]))
+        # A new search forgets the killers but not the history
+        self.ordering.new_search(8)
+        order = self.ordering.order(state.hands[SOUTH], state, self.trump, 0)
+        self.assertEqual(order[:2], codes(["D8", "C6"]))
+
+if __name__ == "__main__":
+    unittest.main()
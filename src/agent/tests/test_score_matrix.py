@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from ddsolver import ddsolver
+from ddsolver.ddsolver import DDSolver
+
+def random_endings(num_deals: int, num_cards: int, seed: int = 0) -> np.ndarray:
+    """
+    Deals of num_cards cards per hand, as an (num_deals, 4, 52) array.
+    """
+    rng = np.random.default_rng(seed)
+    hands = np.zeros((num_deals, 4, 52), dtype=np.int32)
+    for n in range(num_deals):
+        hands[n, np.repeat(np.arange(4), num_cards), rng.permutation(52)[:4 * num_cards]] = 1
+    return hands
+
+class TestScoreMatrix(unittest.TestCase):
+    def setUp(self) -> None:
+        self.solver = DDSolver()
+        self.solver.CACHE = None
+        self.hands = random_endings(60, 4, seed=3)
+        # Copies of a deal are solved once
+        self.hands[50:] = self.hands[:10]
+
+    def test_matches_card_results(self) -> None:
+        for solutions in (1, 3):
+            results = self.solver.solve_bin(2, 1, [], self.hands, solutions)
+            result = self.solver.solve_scores(2, 1, [], self.hands, solutions)
+            self.assertEqual(result.scores.shape, (len(self.hands), 52))
+            self.assertEqual(set(result.cards.tolist()), set(results))
+            self.assertEqual(result.to_dict(), results)
+
+    def test_reductions(self) -> None:
+        # WEST, on lead, holds the same cards in every deal as when sampling
+        # the hidden hands, so every card of WEST is scored in every deal
+        rng = np.random.default_rng(4)
+        hands = np.zeros((40, 4, 52), dtype=np.int32)
+        hands[:, 3, :4] = 1
+        for deal in hands:
+            deal[np.repeat(np.arange(3), 4), 4 + rng.permutation(48)[:12]] = 1
+        results = self.solver.solve_bin(0, 3, [], hands, 3)
+        result = self.solver.solve_scores(0, 3, [], hands, 3)
+        self.assertTrue(result.valid[:, :4].all())
+        probabilities = rng.random(len(hands))
+        probabilities /= probabilities.sum()
+
+        expected = ddsolver.expected_tricks_dds(result)
+        weighted = ddsolver.expected_tricks_dds_probability(result, probabilities)
+        making = ddsolver.p_made_target(2)(result)
+        for card, values in results.items():
+            self.assertAlmostEqual(expected[card], sum(values) / len(values))
+            self.assertAlmostEqual(weighted[card], sum(p * v for p, v in zip(probabilities, values)))
+            self.assertEqual(making[card], round(sum(1 for v in values if v >= 2) / len(values), 3))
+
+    def test_cache_rows(self) -> None:
+        expected = self.solver.solve_scores(4, 0, [], self.hands, 3)
+        solver = DDSolver()
+        solver.CACHE = ddsolver.SolveCache()
+        solver.solve_scores(4, 0, [], self.hands[:20], 3)
+        np.testing.assert_array_equal(solver.solve_scores(4, 0, [], self.hands, 3).scores, expected.scores)
+
+if __name__ == '__main__':
+    unittest.main()
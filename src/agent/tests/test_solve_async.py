@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from ddsolver import dds
+from ddsolver.ddsolver import DDSolver
+
+def random_endings(num_deals: int, num_cards: int, seed: int = 0) -> np.ndarray:
+    """
+    Deals of num_cards cards per hand, as an (num_deals, 4, 52) array.
+    """
+    rng = np.random.default_rng(seed)
+    hands = np.zeros((num_deals, 4, 52), dtype=np.int32)
+    for n in range(num_deals):
+        hands[n, np.repeat(np.arange(4), num_cards), rng.permutation(52)[:4 * num_cards]] = 1
+    return hands
+
+class TestSolveAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.solver = DDSolver()
+        self.solver.CACHE = None
+        self.hands = random_endings(2 * dds.MAXNOOFBOARDS + 10, 1)
+
+    async def test_same_results(self) -> None:
+        expected = self.solver.solve_scores(4, 0, [], self.hands[:20], 3)
+        np.testing.assert_array_equal((await self.solver.solve_async(4, 0, [], self.hands[:20], 3)).scores, expected.scores)
+
+    async def test_loop_keeps_running(self) -> None:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        hands = random_endings(dds.MAXNOOFBOARDS, 6)
+        task = asyncio.create_task(ticker())
+        results = await self.solver.solve_async(4, 0, [], hands, 3)
+        task.cancel()
+        self.assertGreater(ticks, 1)
+        np.testing.assert_array_equal(results.scores, self.solver.solve_scores(4, 0, [], hands, 3).scores)
+
+    async def test_concurrent_solves(self) -> None:
+        first, second = self.hands[:30], self.hands[30:60]
+        expected = [self.solver.solve_scores(1, 2, [], first, 3), self.solver.solve_scores(1, 2, [], second, 3)]
+        results = await asyncio.gather(self.solver.solve_async(1, 2, [], first, 3),
+                                       DDSolver().solve_async(1, 2, [], second, 3))
+        np.testing.assert_array_equal([result.scores for result in results], [result.scores for result in expected])
+
+    async def test_deadline(self) -> None:
+        # Only the first batch is solved once the deadline has passed
+        results = await self.solver.solve_async(4, 0, [], self.hands, 1, deadline_ms=0)
+        self.assertEqual(results.scores.shape, (dds.MAXNOOFBOARDS, 52))
+        results = await self.solver.solve_async(4, 0, [], self.hands, 1, deadline_ms=60000)
+        self.assertEqual(results.scores.shape, (len(self.hands), 52))
+
+    async def test_cancel(self) -> None:
+        task = asyncio.create_task(self.solver.solve_async(4, 0, [], self.hands, 3))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # The solver is free for the next solve
+        expected = self.solver.solve_scores(4, 0, [], self.hands[:5], 3)
+        np.testing.assert_array_equal((await self.solver.solve_async(4, 0, [], self.hands[:5], 3)).scores, expected.scores)
+
+if __name__ == '__main__':
+    unittest.main()
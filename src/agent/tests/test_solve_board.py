@@ -1,10 +1,14 @@
 import unittest
 import ctypes
 
-from agent.dds_eval import solve_board_pbn
+import numpy as np
+
+from agent.dds_eval import solve_board_pbn, solve_board_bin, cardsets_to_remain_cards
 from agent.pbn import PBN
 from agent.card_stats import PlayerPosition, CardSuit, CardRank, Card
 from ddsolver import functions
+from ddsolver.ddsolver import DDS_LOCK, DDSolver, hands_to_remain_cards
+from agent.card_utils import card_to_index
 from agent.conf import dds
 
 
@@ -149,5 +153,88 @@ class TestDDSEvalCurrentTrick(unittest.TestCase):
             self.assertEqual(scores.score[idx], solution[idx][1])
             self.assertTrue(Card(CardSuit(scores.suit[idx]), CardRank(scores.rank[idx])) == solution[idx][0])
 
+    def test_solve_board_bin_current_trick(self):
+        pbn = PBN.from_hands(self.remains, self.dealer)
+        cardsets = [card_to_index(hand) for hand in self.remains]
+        scores_pbn = solve_board_pbn(self.trump_suit, self.dealer, self.current_trick, pbn)
+        scores_bin = solve_board_bin(self.trump_suit, self.dealer, self.current_trick,
+                                     cardsets_to_remain_cards(cardsets))
+        self.assertEqual(scores_bin.cards, scores_pbn.cards)
+        for idx in range(scores_pbn.cards):
+            self.assertEqual(scores_bin.suit[idx], scores_pbn.suit[idx])
+            self.assertEqual(scores_bin.rank[idx], scores_pbn.rank[idx])
+            self.assertEqual(scores_bin.score[idx], scores_pbn.score[idx])
+
+def solve_all_boards_pbn(strain_i, leader_i, current_trick, hands_pbn, solutions):
+    """
+    Solve the PBN strings with SolveAllBoards as DDSolver.solve() did before the
+    binary deals, as a reference for the rank bitmasks of solve_bin().
+    """
+    card_rank = [0x4000, 0x2000, 0x1000, 0x0800, 0x0400, 0x0200, 0x0100, 0x0080, 0x0040, 0x0020, 0x0010, 0x0008, 0x0004]
+    bo = dds.boardsPBN()
+    solved = dds.solvedBoards()
+    bo.noOfBoards = len(hands_pbn)
+    for handno, hand_pbn in enumerate(hands_pbn):
+        bo.deals[handno].trump = (strain_i - 1) % 5
+        bo.deals[handno].first = leader_i
+        for i in range(3):
+            bo.deals[handno].currentTrickSuit[i] = 0
+            bo.deals[handno].currentTrickRank[i] = 0
+            if i < len(current_trick):
+                bo.deals[handno].currentTrickSuit[i] = current_trick[i] // 13
+                bo.deals[handno].currentTrickRank[i] = 14 - current_trick[i] % 13
+        bo.deals[handno].remainCards = hand_pbn.encode('utf-8')
+        bo.target[handno] = -1
+        bo.solutions[handno] = solutions
+        bo.mode[handno] = 1
+    with DDS_LOCK:
+        res = dds.SolveAllBoards(ctypes.pointer(bo), ctypes.pointer(solved))
+    assert res == 1, dds.get_error_message(res)
+
+    card_results = {}
+    for handno in range(bo.noOfBoards):
+        fut = solved.solvedBoards[handno]
+        for i in range(fut.cards):
+            suit_i = fut.suit[i]
+            card_results.setdefault(suit_i * 13 + 14 - fut.rank[i], []).append(fut.score[i])
+            for k, rank_code in enumerate(card_rank):
+                if rank_code & fut.equals[i]:
+                    card_results.setdefault(suit_i * 13 + k, []).append(fut.score[i])
+    return card_results
+
+class TestDDSolverBin(unittest.TestCase):
+    def test_hands_to_remain_cards(self):
+        hands = np.zeros((4, 52), dtype=bool)
+        hands[0, list(card_to_index("A.2.."))] = True
+        hands[3, list(card_to_index("...AKQJT98765432"))] = True
+        remain_cards = hands_to_remain_cards(hands)
+        self.assertEqual(remain_cards[0].tolist(), [0x4000, 0x0004, 0, 0])
+        self.assertEqual(remain_cards[3].tolist(), [0, 0, 0, 0x7ffc])
+        self.assertFalse(remain_cards[1:3].any())
+
+    def test_solve_bin_matches_pbn(self):
+        rng = np.random.default_rng(0)
+        num_deals = 5
+        hands = np.zeros((num_deals, 4, 52), dtype=np.int32)
+        for n in range(num_deals):
+            hands[n, np.repeat(np.arange(4), 13), rng.permutation(52)] = 1
+        # WEST has led its lowest card, NORTH is to play
+        lead = [int(np.flatnonzero(deal[3])[-1]) for deal in hands]
+        for deal, card in zip(hands, lead):
+            deal[3, card] = 0
+        solver = DDSolver()
+        solver.CACHE = None
+        for n in range(num_deals):
+            hands_pbn = [PBN.from_cardsets([np.flatnonzero(hand).tolist() for hand in hands[n]],
+                                           PlayerPosition.NORTH).pbn_str]
+            for strain_i in (0, 1, 4):
+                self.assertEqual(solver.solve_bin(strain_i, 3, [lead[n]], hands[n:n + 1], 3),
+                                 solve_all_boards_pbn(strain_i, 3, [lead[n]], hands_pbn, 3))
+        # Several boards at once, NORTH leads to the first trick
+        hands[np.arange(num_deals), 3, lead] = 1
+        hands_pbn = [PBN.from_cardsets([np.flatnonzero(hand).tolist() for hand in deal], PlayerPosition.NORTH).pbn_str
+                     for deal in hands]
+        self.assertEqual(solver.solve_bin(2, 0, [], hands, 3), solve_all_boards_pbn(2, 0, [], hands_pbn, 3))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from agent.card_stats import Card, CardRank, CardSuit, PlayerPosition
+from agent.card_utils import card_to_index
+from agent.dds_eval import solve_board_bin, solve_board_pbn, cardsets_to_remain_cards
+from agent.pbn import PBN
+from ddsolver.ddsolver import DDSolver, pbn_to_remain_cards
+from ddsolver.solve_cache import SolveCache
+
+class TestSolveCache(unittest.TestCase):
+    def test_lru(self) -> None:
+        cache = SolveCache(2)
+        cache.put(b"a", b"1")
+        cache.put(b"b", b"2")
+        self.assertEqual(cache.get(b"a"), b"1")
+        # b is now the least recently used
+        cache.put(b"c", b"3")
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(cache.get_many([b"a", b"c", b"d"]), {b"a": b"1", b"c": b"3"})
+        self.assertEqual((cache.hits, cache.disk_hits, cache.misses), (3, 0, 2))
+        with self.assertRaises(ValueError):
+            SolveCache(0)
+
+    def test_disk_tier(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dds.sqlite")
+            writer = SolveCache(4, path)
+            writer.put_many({b"a": b"1", b"b": b"2"})
+            # Another process, or a later run, reads the same file
+            reader = SolveCache(4, path)
+            self.assertEqual(reader.get_many([b"a", b"b", b"c"]), {b"a": b"1", b"b": b"2"})
+            self.assertEqual((reader.hits, reader.disk_hits, reader.misses), (0, 2, 1))
+            # Found on disk, now kept in memory
+            self.assertEqual(reader.get(b"a"), b"1")
+            self.assertEqual(reader.hits, 1)
+            self.assertEqual(len(reader), 2)
+
+class TestDDSolverCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.saved_cache = DDSolver.CACHE
+        DDSolver.CACHE = SolveCache()
+        rng = np.random.default_rng(1)
+        self.hands = np.zeros((6, 4, 52), dtype=np.int32)
+        for n in range(len(self.hands)):
+            self.hands[n, np.repeat(np.arange(4), 13), rng.permutation(52)] = 1
+        # A deal solved twice in the same batch
+        self.hands[5] = self.hands[0]
+
+    def tearDown(self) -> None:
+        DDSolver.CACHE = self.saved_cache
+
+    def test_cached_results(self) -> None:
+        solver = DDSolver()
+        solver.CACHE = None
+        expected = solver.solve_bin(3, 1, [], self.hands, 3)
+
+        solver = DDSolver()
+        self.assertEqual(solver.solve_bin(3, 1, [], self.hands, 3), expected)
+        self.assertEqual((DDSolver.CACHE.hits, DDSolver.CACHE.misses), (0, 6))
+        self.assertEqual(len(DDSolver.CACHE), 5)
+        # Another solver, the PBN strings of the same deals
+        hands_pbn = [PBN.from_cardsets([np.flatnonzero(hand).tolist() for hand in deal], PlayerPosition.NORTH).pbn_str
+                     for deal in self.hands]
+        self.assertEqual(DDSolver().solve(3, 1, [], hands_pbn, 3), expected)
+        self.assertEqual(DDSolver.CACHE.hits, 6)
+        # The number of solutions is part of the position
+        DDSolver().solve_bin(3, 1, [], self.hands, 1)
+        self.assertEqual(DDSolver.CACHE.misses, 12)
+
+    def test_pbn_to_remain_cards(self) -> None:
+        hands = ["QJ6.K652.J85.T98", "873.J97.AT764.Q4", "K5.T83.KQ9.A7652", "AT942.AQ4.32.KJ3"]
+        remain_cards = pbn_to_remain_cards(PBN.from_hands(hands, PlayerPosition.EAST).pbn_str)
+        cardsets = [card_to_index(hand) for hand in hands]
+        # EAST holds the first hand
+        expected = cardsets_to_remain_cards(cardsets[3:] + cardsets[:3])
+        self.assertEqual(remain_cards, expected.tolist())
+
+    def test_solve_board(self) -> None:
+        hands = ["QJ6.K65.J85.T98", "873.J97.AT764.Q4", "K5.T83.KQ9.A7652", "AT942.AQ4.32.KJ3"]
+        current_trick = [Card(CardSuit.HEARTS, CardRank.TWO)]
+        pbn = PBN.from_hands(hands, PlayerPosition.NORTH)
+        scores = solve_board_pbn(CardSuit.SPADES, PlayerPosition.NORTH, current_trick, pbn)
+        self.assertEqual(DDSolver.CACHE.misses, 1)
+        remain_cards = cardsets_to_remain_cards([card_to_index(hand) for hand in hands])
+        cached = solve_board_bin(CardSuit.SPADES, PlayerPosition.NORTH, current_trick, remain_cards)
+        self.assertEqual(DDSolver.CACHE.hits, 1)
+        self.assertEqual(bytes(cached), bytes(scores))
+
+if __name__ == '__main__':
+    unittest.main()
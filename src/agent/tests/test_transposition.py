@@ -0,0 +1,73 @@
+import unittest
+
+from agent.bitboard import BitGameState, cardset_to_bits, zobrist_key
+from agent.card_stats import Card, CardSuit
+from agent.card_utils import card_to_index
+from agent.transposition import EXACT, LOWER, REPLACE_ALWAYS, REPLACE_DEPTH, TranspositionTable
+
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+class TestZobristKey(unittest.TestCase):
+    def setUp(self) -> None:
+        deal_str = "AJ4.T7.AT652.KJ2 K73.A985432.Q9.7 985..KJ84.AQT654 QT62.KQJ6.73.983"
+        self.hands = [cardset_to_bits(card_to_index(deal)) for deal in deal_str.split()]
+
+    def play(self, state: BitGameState, cards) -> None:
+        for card_str in cards:
+            state.play(Card.from_str(card_str).code(), CardSuit.NT.value)
+
+    def test_key_is_incremental(self) -> None:
+        state = BitGameState(self.hands, SOUTH)
+        self.play(state, ["S9", "SQ", "SA", "S3", "DA"])
+        self.assertEqual(state.key, zobrist_key(state.hands, state.leader))
+        state.undo()
+        state.undo()
+        self.assertEqual(state.key, zobrist_key(state.hands, state.leader))
+
+    def test_transposed_tricks(self) -> None:
+        """
+        NORTH cashes the SA and the DA in either order, the positions after
+        the two tricks are the same.
+        """
+        state1 = BitGameState(self.hands, NORTH)
+        self.play(state1, ["SA", "S3", "S5", "S2", "DA", "D9", "D4", "D3"])
+        state2 = BitGameState(self.hands, NORTH)
+        self.play(state2, ["DA", "D9", "D4", "D3", "SA", "S3", "S5", "S2"])
+        self.assertEqual(state1.leader, NORTH)
+        self.assertEqual(state1.leader, state2.leader)
+        self.assertEqual(state1.key, state2.key)
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_store_and_probe(self) -> None:
+        tt = TranspositionTable(100)
+        self.assertEqual(len(tt), 128)
+        self.assertIsNone(tt.probe(12345))
+        tt.store(12345, 2, EXACT, 3.5, 7)
+        self.assertEqual(tt.probe(12345), (12345, 2, EXACT, 3.5, 7, 0))
+        self.assertEqual((tt.hits, tt.misses, tt.stores), (1, 1, 1))
+
+    def test_depth_preferred_replacement(self) -> None:
+        tt = TranspositionTable(16, REPLACE_DEPTH)
+        tt.store(1, 3, EXACT, 1, 0)
+        tt.store(17, 1, LOWER, 2, 0)
+        self.assertIsNotNone(tt.probe(1))
+        self.assertIsNone(tt.probe(17))
+        tt.store(17, 3, LOWER, 2, 0)
+        self.assertIsNotNone(tt.probe(17))
+
+    def test_always_replace(self) -> None:
+        tt = TranspositionTable(16, REPLACE_ALWAYS)
+        tt.store(1, 3, EXACT, 1, 0)
+        tt.store(17, 1, LOWER, 2, 0)
+        self.assertIsNone(tt.probe(1))
+        self.assertIsNotNone(tt.probe(17))
+
+    def test_invalid_policy(self) -> None:
+        with self.assertRaises(ValueError):
+            TranspositionTable(16, "random")
+
+if __name__ == "__main__":
+    unittest.main()
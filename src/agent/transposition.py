@@ -0,0 +1,89 @@
+"""
+transposition.py
+----------------
+
+A transposition table for the alpha-beta search of the minimax agents.
+Positions are identified by the Zobrist key of BitGameState (remaining hands
+and the player on lead) and are only stored at the start of a trick, so the
+same trick played in a different order maps onto the same entry.
+
+The values stored are the tricks NORTH-SOUTH takes from the position on,
+i.e. the search value minus the tricks already won when the position is
+reached. The tricks won so far are therefore not part of the key, and a
+position reached with a different running total (or in a later call to
+choose_card of the same deal) shares the entry. The DEDUCTION taken off
+along the line of the value is stored the same way, from the position on.
+"""
+
+from typing import List, Optional, Tuple
+
+EXACT = 0
+LOWER = 1   # The value is a lower bound (the search failed high)
+UPPER = 2   # The value is an upper bound (the search failed low)
+
+REPLACE_DEPTH = "depth"     # Keep the entry searched deeper when two positions collide
+REPLACE_ALWAYS = "always"   # The latest entry always wins
+
+# (key, depth, bound, value, best card, deductions)
+TTEntry = Tuple[int, int, int, float, int, float]
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 16, replacement: str = REPLACE_DEPTH) -> None:
+        """
+        @param size: maximum number of entries, rounded up to a power of two.
+        @param replacement: the policy when a slot is taken by another position,
+                            REPLACE_DEPTH or REPLACE_ALWAYS.
+        """
+        if replacement not in (REPLACE_DEPTH, REPLACE_ALWAYS):
+            raise ValueError(f"Invalid replacement policy {replacement}")
+        num_slots = 1
+        while num_slots < size:
+            num_slots <<= 1
+        self._mask = num_slots - 1
+        self._slots: List[Optional[TTEntry]] = [None] * num_slots
+        self.replacement = replacement
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """
+        Return the entry of the position or None if it is not in the table.
+        """
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, bound: int, value: float, card: int, deductions: float = 0) -> None:
+        """
+        Store the result of searching the position to the given depth.
+
+        @param deductions: the DEDUCTION taken off the value along its line.
+        """
+        idx = key & self._mask
+        entry = self._slots[idx]
+        if self.replacement == REPLACE_DEPTH and entry is not None \
+                and entry[0] != key and entry[1] > depth:
+            return
+        self._slots[idx] = (key, depth, bound, value, card, deductions)
+        self.stores += 1
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters.
+        """
+        self._slots = [None] * len(self._slots)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def print_stats(self) -> None:
+        probes = self.hits + self.misses
+        hit_rate = self.hits / probes if probes > 0 else 0
+        print(f"Transposition table: {self.hits} hits / {probes} probes ({hit_rate:.1%}), {self.stores} stores")
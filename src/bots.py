@@ -993,12 +993,12 @@ class CardPlayer:
                     print("PIMC result:",card52_dd)
                 card_resp = self.pick_card_after_pimc_eval(trick_i, leader_i, current_trick, players_states, card52_dd, bidding_scores, quality, samples, play_status)            
             else:
-                card52_dd = self.get_cards_dd_evaluation(trick_i, leader_i, current_trick52, players_states, probability_of_occurence)
+                card52_dd = await self.get_cards_dd_evaluation(trick_i, leader_i, current_trick52, players_states, probability_of_occurence)
                 card_resp = self.pick_card_after_dd_eval(trick_i, leader_i, current_trick, players_states, card52_dd, bidding_scores, quality, samples, play_status)
 
         return card_resp
 
-    def get_cards_dd_evaluation(self, trick_i, leader_i, current_trick52, players_states, probabilities_list):
+    async def get_cards_dd_evaluation(self, trick_i, leader_i, current_trick52, players_states, probabilities_list):
         from ddsolver import ddsolver
         
         n_samples = players_states[0].shape[0]
@@ -1011,23 +1011,21 @@ class CardPlayer:
             [c for c in range(7, 13) if i*13+c not in unavailable_cards] for i in range(4)
         ]
 
-        symbols = 'AKQJT98765432'
-
         current_trick_players = [(leader_i + i) % 4 for i in range(len(current_trick52))]
 
-        hands_pbn = []
+        # The deals go to DDS as arrays of the hands, with no PBN string to
+        # build and parse. We always use West as start, but hands are in BEN from LHO
+        hands52 = np.zeros((n_samples, 4, 52), dtype=np.int32)
+        known_hands = [self.player_i, [1,3,1,1][self.player_i]]
+        hands52[:, known_hands[0]] = self.hand52
+        hands52[:, known_hands[1]] = self.public52
         for i in range(n_samples):
-            hands = [None, None, None, None]
             for j in range(4):
                 self.rng.shuffle(pips[j])
             pip_i = [0, 0, 0, 0]
 
-            hands[self.player_i] = deck52.deal_to_str(self.hand52)
-            hands[[1,3,1,1][self.player_i]] = deck52.deal_to_str(self.public52)
-
             for j in range(4):
-                if hands[j] is None:
-                    suits = []
+                if j not in known_hands:
                     hand32 = players_states[j][i,trick_i,:32].copy().astype(int)
 
                     # if already played to the trick, subtract the card from the hand
@@ -1037,41 +1035,32 @@ class CardPlayer:
                     hand_suits = hand32.reshape((4, 8))
 
                     for suit_i in range(4):
-                        suit = []
                         for card_i in np.nonzero(hand_suits[suit_i])[0]:
                             if card_i < 7:
                                 if suit_i * 13 + card_i not in current_trick52:
-                                    suit.append(card_i)
+                                    hands52[i, j, suit_i * 13 + card_i] = 1
                             else:
                                 for _ in range(hand_suits[suit_i,card_i]):
-                                    try:
-                                        if pip_i[suit_i] < len(pips[suit_i]):
-                                            pip = pips[suit_i][pip_i[suit_i]]
-                                            
-                                            if suit_i * 13 + pip not in current_trick52:
-                                                suit.append(pip)
-                                                pip_i[suit_i] += 1
-                                    except:
-                                        import pdb; pdb.set_trace()
-                                    
-                        suits.append(''.join([symbols[card] for card in sorted(suit)]))
-                    hands[j] = '.'.join(suits)
-            # We always use West as start, but hands are in BEN from LHO
-            hands_pbn.append('N:' + ' '.join(hands))
+                                    if pip_i[suit_i] < len(pips[suit_i]):
+                                        pip = pips[suit_i][pip_i[suit_i]]
 
+                                        if suit_i * 13 + pip not in current_trick52:
+                                            hands52[i, j, suit_i * 13 + pip] = 1
+                                            pip_i[suit_i] += 1
 
         if self.verbose:
-            print(hands_pbn[:10])
+            print(['N:' + ' '.join(deck52.deal_to_str(hand) for hand in hands) for hands in hands52[:10]])
 
         t_start = time.time()
         if self.verbose:
-            print("Samples: ",n_samples, " Solving: ",len(hands_pbn), self.strain_i, leader_i, current_trick52)
-        dd_solved = self.dd.solve(self.strain_i, leader_i, current_trick52, hands_pbn, 3)
+            print("Samples: ",n_samples, " Solving: ",len(hands52), self.strain_i, leader_i, current_trick52)
+        # Solved in the DDS thread pool so the event loop keeps serving other tables
+        dd_result = await self.dd.solve_async(self.strain_i, leader_i, current_trick52, hands52, 3)
 
         if self.models.use_probability:
-            card_tricks = ddsolver.expected_tricks_dds_probability(dd_solved, probabilities_list)
+            card_tricks = ddsolver.expected_tricks_dds_probability(dd_result, probabilities_list)
         else:
-            card_tricks = ddsolver.expected_tricks_dds(dd_solved)
+            card_tricks = ddsolver.expected_tricks_dds(dd_result)
 
         # if defending the target is another
         level = int(self.contract[0])
@@ -1080,23 +1069,23 @@ class CardPlayer:
         else:
             tricks_needed = 13 - (level + 6) - self.n_tricks_taken + 1
 
-        making = ddsolver.p_made_target(tricks_needed)(dd_solved)
+        making = ddsolver.p_made_target(tricks_needed)(dd_result)
 
         if self.models.use_probability:
             if self.models.matchpoint:
-                card_ev = self.get_card_ev_mp(dd_solved, probabilities_list)
+                card_ev = self.get_card_ev_mp_probability(dd_result, probabilities_list)
             else:
-                card_ev = self.get_card_ev_probability(dd_solved, probabilities_list)
+                card_ev = self.get_card_ev_probability(dd_result, probabilities_list)
         else:
             if self.models.matchpoint:
-                card_ev = self.get_card_ev_mp(dd_solved)
+                card_ev = self.get_card_ev_mp(dd_result)
             else:
-                card_ev = self.get_card_ev(dd_solved)
+                card_ev = self.get_card_ev(dd_result)
         if self.verbose:
             print("card_ev:", card_ev)
 
         card_result = {}
-        for key in dd_solved.keys():
+        for key in card_tricks.keys():
             card_result[key] = (card_tricks[key], card_ev[key], making[key])
             if self.verbose:
                 print(deck52.decode_card(key), card_tricks[key], card_ev[key], making[key])
@@ -1105,65 +1094,21 @@ class CardPlayer:
             print(f'dds took {time.time() - t_start:0.4}')
 
         return card_result
-    
-    def get_card_ev(self, dd_solved):
-        card_ev = {}
-        sign = 1 if self.player_i % 2 == 1 else -1
-        for card, future_tricks in dd_solved.items():
-            ev_sum = 0
-            for ft in future_tricks:
-                if ft < 0:
-                    continue
-                tot_tricks = self.n_tricks_taken + ft
-                tot_decl_tricks = tot_tricks if self.player_i % 2 == 1 else 13 - tot_tricks
-                ev_sum += sign * self.score_by_tricks_taken[tot_decl_tricks]
-            card_ev[card] = ev_sum / len(future_tricks)
-                
-        return card_ev
 
-    def get_card_ev_probability(self, dd_solved, probabilities_list):
-        card_ev = {}
-        sign = 1 if self.player_i % 2 == 1 else -1
-        for card, future_tricks in dd_solved.items():
-            ev_sum = 0
-            for ft, proba in zip(future_tricks, probabilities_list):
-                if ft < 0:
-                    continue
-                tot_tricks = self.n_tricks_taken + ft
-                tot_decl_tricks = (
-                    tot_tricks if self.player_i % 2 == 1 else 13 - tot_tricks
-                )
-                ev_sum += sign * self.score_by_tricks_taken[tot_decl_tricks] * proba
-            card_ev[card] = ev_sum
-
-        return card_ev
-    
-    def get_card_ev_mp(self, dd_solved, probabilities_list):
-        card_ev = {}
-        for card, future_tricks in dd_solved.items():
-            ev_sum = 0
-            for ft, proba in zip(future_tricks, probabilities_list):
-                if ft < 0:
-                    continue
-                ev_sum += ft * proba
-            card_ev[card] = ev_sum
+    def get_card_ev(self, dd_result):
+        return dd_result.expected_score(self.score_by_tricks_taken, self.n_tricks_taken, self.player_i % 2 == 1)
 
-        return card_ev
-    
-    def get_card_ev_mp(self, dd_solved):
-        card_ev = {}
+    def get_card_ev_probability(self, dd_result, probabilities_list):
+        return dd_result.expected_score(self.score_by_tricks_taken, self.n_tricks_taken, self.player_i % 2 == 1,
+                                        probabilities_list)
+
+    def get_card_ev_mp_probability(self, dd_result, probabilities_list):
+        return dd_result.expected_tricks(probabilities_list)
+
+    def get_card_ev_mp(self, dd_result):
         sign = 1 if self.player_i % 2 == 1 else -1
-        for card, future_tricks in dd_solved.items():
-            ev_sum = 0
-            for ft in future_tricks:
-                if ft < 0:
-                    continue
-                tot_tricks = self.n_tricks_taken + ft
-                tot_decl_tricks = tot_tricks if self.player_i % 2 == 1 else 13 - tot_tricks
-                ev_sum += sign * tot_decl_tricks
-            card_ev[card] = ev_sum / len(future_tricks)
-                
-        return card_ev
+        decl_tricks = dd_result.reduce(dd_result.decl_tricks(self.n_tricks_taken, self.player_i % 2 == 1))
+        return {card: sign * tricks for card, tricks in decl_tricks.items()}
     
     def next_card_softmax(self, trick_i):
         if self.verbose:
@@ -11,37 +11,31 @@ class Claimer:
         from ddsolver import ddsolver
         self.dd = ddsolver.DDSolver()
 
-    def claim(self, strain_i, player_i, hands52, n_samples):
+    async def claim(self, strain_i, player_i, hands52, n_samples):
         t_start = time.time()
 
-        hands_pbn = ['N:' + ' '.join([deck52.deal_to_str(hand) for hand in hands52])]
-
+        hands52 = np.asarray(hands52)
         if self.verbose:
-            print(f"Claiming for player {player_i} {hands_pbn}")
-        sampled_hands_pbn = []
+            print(f"Claiming for player {player_i} {['N:' + ' '.join([deck52.deal_to_str(hand) for hand in hands52])]}")
         seen_hand_indexes = [player_i, 3 if player_i == 1 else 1]
         hidden_hand_indexes = [i for i in range(4) if i not in seen_hand_indexes]
-        hidden_cards = (
+        hidden_cards = np.array(
             list(np.nonzero(hands52[hidden_hand_indexes[0]])[0]) +
             list(np.nonzero(hands52[hidden_hand_indexes[1]])[0])
         )
 
-        hands = [None, None, None, None]
-        hands[seen_hand_indexes[0]] = deck52.deal_to_str(hands52[seen_hand_indexes[0]])
-        hands[seen_hand_indexes[1]] = deck52.deal_to_str(hands52[seen_hand_indexes[1]])
-
-        for i in range(n_samples):
-            np.random.shuffle(hidden_cards)
-            
-            n_cards = len(hidden_cards) // 2
-            hands[hidden_hand_indexes[0]] = deck52.deal_to_str(_hand_from_cards(52, hidden_cards[:n_cards]))
-            hands[hidden_hand_indexes[1]] = deck52.deal_to_str(_hand_from_cards(52, hidden_cards[n_cards:]))
-
-            sampled_hands_pbn.append('N:' + ' '.join(hands))
+        # Every sample shares the hidden cards out anew, one row per sample
+        n_cards = len(hidden_cards) // 2
+        shuffled = hidden_cards[np.argsort(np.random.random((n_samples, len(hidden_cards))), axis=1)]
+        sampled_hands52 = np.repeat(hands52[None, :, :], n_samples, axis=0)
+        sampled_hands52[:, hidden_hand_indexes, :] = 0
+        rows = np.arange(n_samples)[:, None]
+        sampled_hands52[rows, hidden_hand_indexes[0], shuffled[:, :n_cards]] = 1
+        sampled_hands52[rows, hidden_hand_indexes[1], shuffled[:, n_cards:]] = 1
 
         max_min_tricks = min(
-            self._get_max_min_tricks(strain_i, player_i, hands_pbn),
-            self._get_max_min_tricks(strain_i, player_i, sampled_hands_pbn)
+            await self._get_max_min_tricks(strain_i, player_i, hands52[None, :, :]),
+            await self._get_max_min_tricks(strain_i, player_i, sampled_hands52)
         )
         
         if self.verbose:
@@ -50,17 +44,8 @@ class Claimer:
 
         return max_min_tricks
     
-    def _get_max_min_tricks(self, strain_i, player_i, hands_pbn):
-        dd_solved = self.dd.solve(strain_i, player_i, [], hands_pbn, 1)
-        
-        max_min_tricks = 0
-        for _, dd_tricks in dd_solved.items():
-            max_min_tricks = max(max_min_tricks, min(dd_tricks))
-        
-        return max_min_tricks
-
+    async def _get_max_min_tricks(self, strain_i, player_i, hands52):
+        dd_result = await self.dd.solve_async(strain_i, player_i, [], hands52, 1)
 
-def _hand_from_cards(n, cards):
-    hand = np.zeros(n, dtype=np.int32)
-    hand[cards] = 1
-    return hand
+        # The fewest tricks of every card over the deals it is the best card in
+        return max(dd_result.min_tricks().values(), default=0)
@@ -0,0 +1,129 @@
+"""
+dd_result.py
+------------
+
+The double dummy scores of the cards over a set of deals, as the (n, 52)
+int8 matrix of DDSolver.solve_scores(): scores[i, card] is the number of
+tricks the side to play takes from the position after playing the card in
+the i-th deal, -1 when the card was not scored in the deal.
+
+Every statistic is a NumPy reduction over the columns of the cards scored,
+and is returned as a dictionary by card in deck order.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from compare import IMP
+
+class DDResult:
+    def __init__(self, scores: np.ndarray) -> None:
+        self.scores = np.asarray(scores, dtype=np.int8)
+        self.valid = self.scores >= 0
+        # The cards scored in at least one deal
+        self.cards = np.flatnonzero(self.valid.any(axis=0))
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def card_scores(self) -> np.ndarray:
+        """
+        The (n, cards) scores of the cards scored, 0 where not scored.
+        """
+        return np.where(self.valid[:, self.cards], self.scores[:, self.cards], 0).astype(int)
+
+    def to_dict(self) -> Dict[int, List[int]]:
+        """
+        The scores of every card over the deals it is scored in, as returned
+        by DDSolver.solve().
+        """
+        return {card: self.scores[self.valid[:, card], card].tolist() for card in self.cards.tolist()}
+
+    def reduce(self, values: np.ndarray, probabilities: Sequence[float] = None) -> Dict[int, float]:
+        """
+        The mean of the (n, cards) values of every card over the deals it is
+        scored in, or their sum weighted by the probabilities of the deals.
+        """
+        valid = self.valid[:, self.cards]
+        values = np.where(valid, values, 0)
+        if probabilities is None:
+            totals = values.sum(axis=0) / valid.sum(axis=0)
+        else:
+            totals = (values * np.asarray(probabilities, dtype=np.float64)[:len(self), None]).sum(axis=0)
+        return dict(zip(self.cards.tolist(), totals.tolist()))
+
+    def expected_tricks(self, probabilities: Sequence[float] = None) -> Dict[int, float]:
+        """
+        The tricks of the side to play after every card, averaged over the
+        deals or weighted by their probabilities.
+        """
+        return self.reduce(self.card_scores(), probabilities)
+
+    def p_make(self, tricks_needed: int) -> Dict[int, float]:
+        """
+        The share of the deals where the card takes the tricks needed,
+        rounded to 3 decimals.
+        """
+        made = self.reduce(self.card_scores() >= tricks_needed)
+        return {card: round(p, 3) for card, p in made.items()}
+
+    def min_tricks(self) -> Dict[int, int]:
+        """
+        The fewest tricks the card takes over the deals it is scored in.
+        """
+        worst = np.where(self.valid[:, self.cards], self.scores[:, self.cards], 13).min(axis=0)
+        return dict(zip(self.cards.tolist(), worst.tolist()))
+
+    def decl_tricks(self, n_tricks_taken: int, declaring: bool) -> np.ndarray:
+        """
+        The (n, cards) tricks of the declarer at the end of the hand, when the
+        side to play has taken n_tricks_taken tricks so far.
+        """
+        tricks = n_tricks_taken + self.card_scores()
+        if not declaring:
+            tricks = 13 - tricks
+        return np.where(self.valid[:, self.cards], tricks, 0)
+
+    def score_table(self, score_by_tricks: Sequence[float], n_tricks_taken: int, declaring: bool) -> np.ndarray:
+        """
+        The (n, cards) scores of the side to play at the end of the hand.
+
+        @param score_by_tricks: The score of the declarer by the number of
+                                tricks the declarer takes, 14 values.
+        """
+        sign = 1 if declaring else -1
+        return sign * np.asarray(score_by_tricks)[self.decl_tricks(n_tricks_taken, declaring)]
+
+    def expected_score(self, score_by_tricks: Sequence[float], n_tricks_taken: int, declaring: bool,
+                       probabilities: Sequence[float] = None) -> Dict[int, float]:
+        """
+        The score of the side to play after every card, averaged over the
+        deals or weighted by their probabilities, see score_table().
+        """
+        return self.reduce(self.score_table(score_by_tricks, n_tricks_taken, declaring), probabilities)
+
+    def expected_imps(self, score_by_tricks: Sequence[float], n_tricks_taken: int, declaring: bool,
+                      probabilities: Sequence[float] = None) -> Dict[int, float]:
+        """
+        The IMPs every card loses against the best card of each deal, so 0 at
+        best, averaged over the deals or weighted by their probabilities.
+        """
+        table = self.score_table(score_by_tricks, n_tricks_taken, declaring)
+        best = np.where(self.valid[:, self.cards], table, -np.inf).max(axis=1, keepdims=True)
+        loss = np.where(self.valid[:, self.cards], best - table, 0)
+        return self.reduce(-np.searchsorted(IMP, loss, side="left"), probabilities)
+
+    def expected_matchpoints(self, probabilities: Sequence[float] = None) -> Dict[int, float]:
+        """
+        The share of the other cards scored in each deal that every card
+        beats, a tie counting half, averaged over the deals or weighted by
+        their probabilities.
+        """
+        valid = self.valid[:, self.cards]
+        scores = np.where(valid, self.card_scores(), -1)
+        beaten = (scores[:, :, None] > scores[:, None, :]) & valid[:, None, :]
+        tied = (scores[:, :, None] == scores[:, None, :]) & valid[:, None, :]
+        others = np.maximum(valid.sum(axis=1, keepdims=True) - 1, 1)
+        points = (beaten.sum(axis=2) + (tied.sum(axis=2) - 1) / 2) / others
+        return self.reduce(points, probabilities)
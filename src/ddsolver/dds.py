@@ -287,6 +287,12 @@ pointer to struct solvedBoards * solvedp"""
 SolveAllBoards.argtypes = [POINTER(boardsPBN), POINTER(solvedBoards)]
 SolveAllBoards.restype = c_int
 
+SolveAllBoardsBin = dds.SolveAllBoardsBin
+"""pointer to struct boards * bop
+pointer to struct solvedBoards * solvedp"""
+SolveAllBoardsBin.argtypes = [POINTER(boards), POINTER(solvedBoards)]
+SolveAllBoardsBin.restype = c_int
+
 SolveAllChunks = dds.SolveAllChunks
 """pointer to struct boardsPBN * bop
 pointer to struct solvedBoards * solvedP
@@ -1,7 +1,74 @@
+import asyncio
 import ctypes
-from typing import Dict, List
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from ddsolver import dds
+from ddsolver.dd_result import DDResult
+from ddsolver.solve_cache import SolveCache, deal_key
+
+# The DDS bit of each rank of a suit, from the ace (bit 14) to the two (bit 2)
+RANK_BITS = np.array([1 << (14 - rank) for rank in range(13)], dtype=np.int32)
+
+# Offsets in ints of the fields of a binary deal, see dds.deal
+DEAL_INTS = ctypes.sizeof(dds.deal) // ctypes.sizeof(ctypes.c_int)
+TRUMP, FIRST, TRICK_SUIT, TRICK_RANK, REMAIN_CARDS = (
+    getattr(dds.deal, name).offset // ctypes.sizeof(ctypes.c_int)
+    for name in ("trump", "first", "currentTrickSuit", "currentTrickRank", "remainCards"))
+
+# Offsets in ints of the fields of a futureTricks
+FUT_INTS = ctypes.sizeof(dds.futureTricks) // ctypes.sizeof(ctypes.c_int)
+CARDS, SUIT, RANK, EQUALS, SCORE = (
+    getattr(dds.futureTricks, name).offset // ctypes.sizeof(ctypes.c_int)
+    for name in ("cards", "suit", "rank", "equals", "score"))
+
+def hands_to_remain_cards(hands: np.ndarray) -> np.ndarray:
+    """
+    Convert hands of 52 cards into the remainCards of a binary DDS deal.
+
+    @param hands: An (..., 4, 52) array, nonzero where the hand holds the
+                  card, the hands in the order N E S W.
+    @return: An (..., 4, 4) int32 array of the rank bitmask of every suit of
+             every hand.
+    """
+    hands = np.asarray(hands)
+    suits = hands.reshape(hands.shape[:-1] + (4, 13)) != 0
+    return suits.astype(np.int32) @ RANK_BITS
+
+def int_view(structure: ctypes.Structure, name: str, shape: tuple) -> np.ndarray:
+    """
+    A NumPy view of an int array field of a ctypes structure, writing to the
+    view fills the structure in place.
+    """
+    field = getattr(type(structure), name)
+    pointer = ctypes.cast(ctypes.byref(structure, field.offset), ctypes.POINTER(ctypes.c_int))
+    return np.ctypeslib.as_array(pointer, shape=shape)
+
+# libdds keeps its search memory per DDS thread and SolveAllBoards uses all
+# of them, so the calls into the library from different Python threads take
+# turns on this lock
+DDS_LOCK = threading.Lock()
+
+_executor = None
+_executor_size = 0
+
+def get_executor(threads: int) -> ThreadPoolExecutor:
+    """
+    Return the thread pool that runs the solves of DDSolver.solve_async(),
+    it is shared by every solver of the process.
+    """
+    global _executor, _executor_size
+    if _executor is None or _executor_size != threads:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dds")
+        _executor_size = threads
+    return _executor
 
 # The number of threads is automatically configured by DDS on Windows, taking into account the number of processor cores and available memory.  
 # The number of threads can be influenced using by calling `SetMaxThreads`. 
@@ -15,89 +82,266 @@ class DDSolver:
     # If zero, we not always find the score
     # If 2 transport tables ignore trump
  
+    # Cache of the solutions shared by every solver of the process, None to
+    # always solve. Give it a file to share the solutions between processes
+    # and runs, see SolveCache.
+    CACHE: Optional[SolveCache] = SolveCache()
+    # Threads of the pool that runs solve_async(). libdds cannot be entered
+    # from two threads at once (see DDS_LOCK) and SolveAllBoardsBin already
+    # solves a batch on all the DDS threads, so more threads would only wait
+    # on the lock. The single thread keeps the event loop free during a solve.
+    ASYNC_THREADS = 1
+
     def __init__(self, dds_mode=1):
         self.dds_mode = dds_mode
-        self.bo = dds.boardsPBN()
         self.solved = dds.solvedBoards()
 
+        # The binary boards, filled through NumPy views of their fields
+        self.bo_bin = dds.boards()
+        self.deals_bin = int_view(self.bo_bin, "deals", (dds.MAXNOOFBOARDS, DEAL_INTS))
+        self.target_bin = int_view(self.bo_bin, "target", (dds.MAXNOOFBOARDS,))
+        self.solutions_bin = int_view(self.bo_bin, "solutions", (dds.MAXNOOFBOARDS,))
+        self.mode_bin = int_view(self.bo_bin, "mode", (dds.MAXNOOFBOARDS,))
+        self.solved_bin = int_view(self.solved, "solvedBoards", (dds.MAXNOOFBOARDS, FUT_INTS))
+
     # Solutions
     #1	Find the maximum number of tricks for the side to play.  Return only one of the optimum cards and its score.
     #2	Find the maximum number of tricks for the side to play.  Return all optimum cards and their scores.
     #3	Return all cards that can be legally played, with their scores in descending order.
 
     def solve(self, strain_i, leader_i, current_trick, hands_pbn, solutions):
-        results = self.solve_helper(strain_i, leader_i, current_trick, hands_pbn[:dds.MAXNOOFBOARDS], solutions)
+        """
+        Solve the deals given as PBN strings, returns the scores of every card
+        over the deals. The strings are read into rank bitmasks so the deals
+        share the cache with solve_bin().
+        """
+        remain_cards = np.array([pbn_to_remain_cards(hand_pbn) for hand_pbn in hands_pbn], dtype=np.int32)
+        return self.solve_remain_cards(strain_i, leader_i, current_trick, remain_cards.reshape(-1, 4, 4), solutions)
 
-        if len(hands_pbn) > dds.MAXNOOFBOARDS:
-            i = dds.MAXNOOFBOARDS
-            while i < len(hands_pbn):
-                more_results = self.solve_helper(strain_i, leader_i, current_trick, hands_pbn[i:i+dds.MAXNOOFBOARDS], solutions)
+    def solve_bin(self, strain_i, leader_i, current_trick, hands, solutions, deadline=None, cancel=None):
+        """
+        Same as solve(), with the deals given as an (n, 4, 52) array of the
+        hands in the order N E S W instead of PBN strings. The deals reach DDS
+        as rank bitmasks, filled MAXNOOFBOARDS at a time with array writes, so
+        no string is built or parsed.
+        """
+        return self.solve_remain_cards(strain_i, leader_i, current_trick, hands_to_remain_cards(hands), solutions,
+                                       deadline, cancel)
 
-                for card, values in more_results.items():
-                    results[card] = results[card] + values
+    def solve_scores(self, strain_i, leader_i, current_trick, hands, solutions, deadline=None, cancel=None):
+        """
+        Same as solve_bin(), returns the scores as a DDResult backed by an
+        (n, 52) int8 matrix instead of lists. See solve_deals() for deadline
+        and cancel, the matrix then only has the rows of the first deals.
+        """
+        deals = make_deals(strain_i, leader_i, current_trick, hands_to_remain_cards(hands))
+        return DDResult(score_matrix(self.solve_deals(deals, solutions, deadline, cancel)))
 
-                i += dds.MAXNOOFBOARDS
+    async def solve_async(self, strain_i, leader_i, current_trick, hands, solutions, deadline_ms=None):
+        """
+        Same as solve_scores(), run in the solver thread pool so that the
+        event loop keeps serving while DDS works. Cancelling the caller stops
+        the solve before its next batch of MAXNOOFBOARDS deals.
 
-        return results 
+        @param deadline_ms: Time budget in milliseconds, the batches not
+                            started by then are left out and the scores only
+                            cover the first deals. The first batch is always
+                            solved.
+        """
+        loop = asyncio.get_running_loop()
+        cancel = threading.Event()
+        deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms is not None else None
+        solve = functools.partial(self.solve_scores, strain_i, leader_i, current_trick, hands, solutions, deadline, cancel)
+        try:
+            return await loop.run_in_executor(get_executor(self.ASYNC_THREADS), solve)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
 
-    def solve_helper(self, strain_i, leader_i, current_trick, hands_pbn, solutions):
-        card_rank = [0x4000, 0x2000, 0x1000, 0x0800, 0x0400, 0x0200, 0x0100, 0x0080, 0x0040, 0x0020, 0x0010, 0x0008, 0x0004]
+    def solve_remain_cards(self, strain_i, leader_i, current_trick, remain_cards, solutions, deadline=None, cancel=None):
+        """
+        Same as solve(), with the deals given as an (n, 4, 4) array of rank
+        bitmasks, see hands_to_remain_cards().
+        """
+        deals = make_deals(strain_i, leader_i, current_trick, remain_cards)
+        try:
+            solved = self.solve_deals(deals, solutions, deadline, cancel)
+        except Exception as e:
+            print(e)
+            return None
+        return card_results(solved)
 
-        self.bo.noOfBoards = min(dds.MAXNOOFBOARDS, len(hands_pbn))
+    def solve_deals(self, deals, solutions, deadline=None, cancel=None):
+        """
+        Solve binary deals, returns the futureTricks of every deal as an
+        (n, FUT_INTS) int32 array, each row laid out as a dds.futureTricks.
 
-        for handno in range(self.bo.noOfBoards):
-            self.bo.deals[handno].trump = (strain_i - 1) % 5
-            self.bo.deals[handno].first = leader_i
+        @param deals: An (n, DEAL_INTS) int32 array, each row laid out as a
+                      dds.deal.
+        @param solutions: The DDS solutions parameter, the same for every deal.
+        @param deadline: time.perf_counter() value after which no new batch
+                         is started. The first batch is always solved.
+        @param cancel: threading.Event set to stop before the next batch.
 
-            for i in range(3):
-                self.bo.deals[handno].currentTrickSuit[i] = 0
-                self.bo.deals[handno].currentTrickRank[i] = 0
-                if i < len(current_trick):
-                    self.bo.deals[handno].currentTrickSuit[i] = current_trick[i] // 13
-                    self.bo.deals[handno].currentTrickRank[i] = 14 - current_trick[i] % 13
+        The deals found in the cache are not solved again, nor are the copies
+        of a deal. The others are solved MAXNOOFBOARDS at a time with
+        SolveAllBoardsBin. When the solve stops early, the rows of the first
+        deals up to the first one left unsolved are returned.
+        """
+        deals = np.ascontiguousarray(deals, dtype=np.int32)
+        keys = [deal_key(deal.tobytes(), solutions) for deal in deals]
+        cache = self.CACHE
+        found = cache.get_many(keys) if cache is not None else {}
 
-            self.bo.deals[handno].remainCards = hands_pbn[handno].encode('utf-8')
+        solved = np.zeros((len(deals), FUT_INTS), dtype=np.int32)
+        done = np.zeros(len(deals), dtype=bool)
+        # The first deal of every position to solve
+        first_deal = {}
+        for i, key in enumerate(keys):
+            value = found.get(key)
+            if value is not None:
+                solved[i] = np.frombuffer(value, dtype=np.int32)
+                done[i] = True
+            elif key not in first_deal:
+                first_deal[key] = i
+        to_solve = list(first_deal.values())
+        for start in range(0, len(to_solve), dds.MAXNOOFBOARDS):
+            if cancel is not None and cancel.is_set():
+                break
+            if start > 0 and deadline is not None and time.perf_counter() >= deadline:
+                break
+            chunk = to_solve[start:start + dds.MAXNOOFBOARDS]
+            num_boards = len(chunk)
+            with DDS_LOCK:
+                self.bo_bin.noOfBoards = num_boards
+                self.deals_bin[:num_boards] = deals[chunk]
+                self.target_bin[:num_boards] = -1
+                self.solutions_bin[:num_boards] = solutions
+                self.mode_bin[:num_boards] = self.dds_mode
 
-            self.bo.target[handno] = -1
-            # Return all cards that can be legally played, with their scores in descending order.
-            self.bo.solutions[handno] = solutions
-            self.bo.mode[handno] = self.dds_mode
+                res = dds.SolveAllBoardsBin(ctypes.pointer(self.bo_bin), ctypes.pointer(self.solved))
+                if res != 1:
+                    error_message = dds.get_error_message(res)
+                    raise Exception(f"DDS error {res}: {error_message}")
 
-        res = dds.SolveAllBoards(ctypes.pointer(self.bo), ctypes.pointer(self.solved))
-        if res != 1:
-            error_message = dds.get_error_message(res)
-            print(f"Error Code: {res}, Error Message: {error_message}")
-            print(hands_pbn[0].encode('utf-8'))
-            return None
+                solved[chunk] = self.solved_bin[:num_boards]
+            done[chunk] = True
+            if cache is not None:
+                cache.put_many({keys[i]: solved[i].tobytes() for i in chunk})
+
+        # The copies of the deals solved
+        for i, key in enumerate(keys):
+            if not done[i] and key in first_deal and done[first_deal[key]]:
+                solved[i] = solved[first_deal[key]]
+                done[i] = True
+        num_done = len(deals) if done.all() else int(np.argmin(done))
+        return solved[:num_done]
+
+    def solve_positions(self, positions, deadline=None):
+        """
+        Solve positions that each have their own trump, leader and current trick,
+        MAXNOOFBOARDS at a time. Returns the maximum number of tricks of the side
+        to play for each position, only for the first positions when the
+        deadline passes, see solve_deals().
+
+        @param positions: list of (trump_i, leader_i, current_trick, remain_cards) where
+                          trump_i is the DDS trump (0 spades ... 3 clubs, 4 NT), current_trick
+                          holds the card indices played in the trick so far and remain_cards
+                          the 4x4 rank bitmasks of the hands, see hands_to_remain_cards().
+        """
+        deals = np.zeros((len(positions), DEAL_INTS), dtype=np.int32)
+        for handno, (trump_i, leader_i, current_trick, remain_cards) in enumerate(positions):
+            deals[handno, TRUMP] = trump_i
+            deals[handno, FIRST] = leader_i
+            for i, card in enumerate(current_trick[:3]):
+                deals[handno, TRICK_SUIT + i] = card // 13
+                deals[handno, TRICK_RANK + i] = 14 - card % 13
+        if len(positions) > 0:
+            deals[:, REMAIN_CARDS:REMAIN_CARDS + 16] = \
+                np.array([remain_cards for _, _, _, remain_cards in positions], dtype=np.int32).reshape(len(positions), 16)
+        # Only the score is needed
+        return self.solve_deals(deals, 1, deadline)[:, SCORE].tolist()
+
+def make_deals(strain_i, leader_i, current_trick, remain_cards):
+    """
+    The binary deals of solve_deals() for the hands given as an (n, 4, 4)
+    array of rank bitmasks, all with the same strain, leader and trick.
+    """
+    deals = np.zeros((len(remain_cards), DEAL_INTS), dtype=np.int32)
+    deals[:, TRUMP] = (strain_i - 1) % 5
+    deals[:, FIRST] = leader_i
+    for i, card in enumerate(current_trick[:3]):
+        deals[:, TRICK_SUIT + i] = card // 13
+        deals[:, TRICK_RANK + i] = 14 - card % 13
+    deals[:, REMAIN_CARDS:REMAIN_CARDS + 16] = np.asarray(remain_cards).reshape(len(remain_cards), 16)
+    return deals
+
+def card_results(solved):
+    """
+    The scores of every card over the solved deals, the cards DDS reports as
+    equal to a card get its score.
+    """
+    card_rank = [0x4000, 0x2000, 0x1000, 0x0800, 0x0400, 0x0200, 0x0100, 0x0080, 0x0040, 0x0020, 0x0010, 0x0008, 0x0004]
+
+    card_results = {}
+
+    for fut in solved.tolist():
+        for i in range(fut[CARDS]):
+            suit_i = fut[SUIT + i]
+            score = fut[SCORE + i]
+            card = suit_i * 13 + 14 - fut[RANK + i]
+            if card not in card_results:
+                card_results[card] = []
+            card_results[card].append(score)
+            eq_cards_encoded = fut[EQUALS + i]
+            for k, rank_code in enumerate(card_rank):
+                if rank_code & eq_cards_encoded > 0:
+                    eq_card = suit_i * 13 + k
+                    if eq_card not in card_results:
+                        card_results[eq_card] = []
+                    card_results[eq_card].append(score)
+    return card_results
 
-        card_results = {}
+def score_matrix(solved: np.ndarray) -> np.ndarray:
+    """
+    The (n, 52) int8 matrix of the scores of every card in the solved deals
+    of solve_deals(), -1 for the cards DDS did not score. The cards DDS
+    reports as equal to a card get its score.
+    """
+    scores = np.full((len(solved), 52), -1, dtype=np.int8)
+    suits = solved[:, SUIT:SUIT + 13]
+    card_scores = solved[:, SCORE:SCORE + 13]
+    listed = np.arange(13) < solved[:, CARDS, None]
+    deal_i, i = np.nonzero(listed)
+    scores[deal_i, suits[deal_i, i] * 13 + 14 - solved[:, RANK:RANK + 13][deal_i, i]] = card_scores[deal_i, i]
+    equal = (solved[:, EQUALS:EQUALS + 13, None] & RANK_BITS) != 0
+    deal_i, i, rank = np.nonzero(equal & listed[:, :, None])
+    scores[deal_i, suits[deal_i, i] * 13 + rank] = card_scores[deal_i, i]
+    return scores
 
-        for handno in range(self.bo.noOfBoards):
-            fut = ctypes.pointer(self.solved.solvedBoards[handno])
-            for i in range(fut.contents.cards):
-                suit_i = fut.contents.suit[i]
-                card = suit_i * 13 + 14 - fut.contents.rank[i]
-                if card not in card_results:
-                    card_results[card] = []
-                card_results[card].append(fut.contents.score[i])
-                eq_cards_encoded = fut.contents.equals[i]
-                for k, rank_code in enumerate(card_rank):
-                    if rank_code & eq_cards_encoded > 0:
-                        eq_card = suit_i * 13 + k
-                        if eq_card not in card_results:
-                            card_results[eq_card] = []
-                        card_results[eq_card].append(fut.contents.score[i])
-        return card_results
+def pbn_to_remain_cards(hands_pbn: str) -> List[List[int]]:
+    """
+    Convert a PBN deal such as "N:QJ6.K652.J85.T98 873.J97.AT764.Q4 ..." into
+    the rank bitmasks of the four hands, NORTH first.
+    """
+    first, hands = hands_pbn.strip().split(":", 1)
+    first_i = "NESW".index(first.strip().upper())
+    remain_cards = [[0] * 4 for _ in range(4)]
+    for i, hand in enumerate(hands.split()):
+        for suit_i, suit in enumerate(hand.split(".")):
+            for symbol in suit:
+                remain_cards[(first_i + i) % 4][suit_i] |= 1 << (14 - "AKQJT98765432".index(symbol.upper()))
+    return remain_cards
 
 
-def expected_tricks_dds(card_results):
-    return {card:(sum(values)/len(values)) for card, values in card_results.items()}
+def expected_tricks_dds(dd_result: DDResult) -> Dict[int, float]:
+    return dd_result.expected_tricks()
 
-def expected_tricks_dds_probability(card_results, probabilities_list : List[float]):
-    return {card: sum([p*res for p, res in zip(probabilities_list, result_list)]) for card, result_list in card_results.items()}
+def expected_tricks_dds_probability(dd_result: DDResult, probabilities_list: List[float]) -> Dict[int, float]:
+    return dd_result.expected_tricks(probabilities_list)
 
 def p_made_target(tricks_needed):
 
-    def fun(card_results):
-        return {card:round(sum(1 for x in values if x >= tricks_needed)/len(values),3) for card, values in card_results.items()}
+    def fun(dd_result: DDResult) -> Dict[int, float]:
+        return dd_result.p_make(tricks_needed)
     return fun
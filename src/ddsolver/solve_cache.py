@@ -0,0 +1,149 @@
+"""
+solve_cache.py
+--------------
+
+A content-addressed cache of DDS solutions. The same positions are solved
+again and again: over the consecutive cards of a deal, by the claim check,
+and by every agent replaying the boards of a tournament file. A position is
+keyed on the hash of its binary DDS deal (trump, leader, cards of the
+current trick and the rank bitmasks of the hands) and of the number of
+solutions asked for, and the value cached is the futureTricks DDS returns.
+
+The cache has two tiers: an in-memory LRU and an optional SQLite file that
+parallel worker processes, and later runs, share. Entries found on disk are
+kept in memory too. The cache can be used from several threads.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+
+# SQLite limits the number of parameters of a statement
+SQL_BATCH = 500
+
+def deal_key(deal: bytes, solutions: int) -> bytes:
+    """
+    Key of a position from the bytes of its binary DDS deal, see dds.deal.
+    """
+    return hashlib.blake2b(deal + struct.pack("<i", solutions), digest_size=16).digest()
+
+class SolveCache:
+    def __init__(self, size: int = 1 << 16, path: str = None) -> None:
+        """
+        @param size: maximum number of positions kept in memory, the least
+                     recently used position is dropped first.
+        @param path: SQLite file of the on-disk tier, None to keep the cache
+                     in memory only.
+        """
+        if size <= 0:
+            raise ValueError(f"Invalid cache size {size}")
+        self.size = size
+        self.path = path
+        self._entries: OrderedDict = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """
+        The connection to the SQLite file, opened again in a forked worker
+        since a connection cannot be shared between processes.
+        """
+        if self.path is None:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS solves (key BLOB PRIMARY KEY, value BLOB NOT NULL)")
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _remember(self, key: bytes, value: bytes) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, bytes]:
+        """
+        Look the positions up, in memory first and then on disk. Return the
+        values found by key.
+        """
+        with self._lock:
+            found = {}
+            missing = []
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+                    self.hits += 1
+
+            db = self._connection()
+            if db is not None and missing:
+                unique = list(dict.fromkeys(missing))
+                for start in range(0, len(unique), SQL_BATCH):
+                    batch = unique[start:start + SQL_BATCH]
+                    rows = db.execute(f"SELECT key, value FROM solves WHERE key IN ({','.join('?' * len(batch))})",
+                                      batch).fetchall()
+                    for key, value in rows:
+                        found[key] = value
+                        self._remember(key, value)
+                on_disk = sum(1 for key in missing if key in found)
+                self.disk_hits += on_disk
+                self.misses += len(missing) - on_disk
+            else:
+                self.misses += len(missing)
+            return found
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """
+        Return the value cached for the position or None.
+        """
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[bytes, bytes]) -> None:
+        """
+        Store the values of newly solved positions in both tiers.
+        """
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            db = self._connection()
+            if db is not None and items:
+                with db:
+                    db.execute("BEGIN")
+                    db.executemany("INSERT OR IGNORE INTO solves (key, value) VALUES (?, ?)", list(items.items()))
+
+    def put(self, key: bytes, value: bytes) -> None:
+        self.put_many({key: value})
+
+    def clear(self) -> None:
+        """
+        Remove the entries kept in memory and reset the counters, the file is
+        left as it is.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def print_stats(self) -> None:
+        lookups = self.hits + self.disk_hits + self.misses
+        hit_rate = (self.hits + self.disk_hits) / lookups if lookups > 0 else 0
+        print(f"DDS solve cache: {self.hits + self.disk_hits} hits ({self.disk_hits} on disk) / {lookups} lookups "
+              f"({hit_rate:.1%}), {len(self)}/{self.size} entries in memory")
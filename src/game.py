@@ -7,10 +7,13 @@ from typing import List, Tuple
 
 from agent.card_stats import CardSuit
 import agent.conf
+from agent.assigners.csp_assigner_v2 import CSPAssignerV2
 from agent.evaluator import AgentEvaluator
 from agent.minimax_agent import MinimaxAgent
 from agent.minimax_bayes_agent import MinimaxBayesAgent
 from agent.minimax_opt_agent import MinimaxOptAgent
+from ddsolver.ddsolver import DDSolver
+from ddsolver.solve_cache import SolveCache
 
 # Set logging level to suppress warnings
 logging.getLogger().setLevel(logging.ERROR)
@@ -488,7 +491,7 @@ class Driver:
                     if (str(card_resp.card).startswith("Claim")) :
                         tricks_claimed = int(re.search(r'\d+', card_resp.card).group()) if re.search(r'\d+', card_resp.card) else None
                         
-                        self.canclaim = claimer.claim(
+                        self.canclaim = await claimer.claim(
                             strain_i=strain_i,
                             player_i=player_i,
                             hands52=[card_player.hand52 for card_player in card_players],
@@ -951,6 +954,16 @@ async def main():
     parser.add_argument("--log", type=bool, default=False, help="Log the game")
     parser.add_argument("--boardfile", default=None, help="Load the boards contained in a single file")
     parser.add_argument("--boarddir", type=str, default=None, help="Directory for boards")
+    parser.add_argument("--depth", type=int, default=None, help="Number of tricks searched by the minimax agents")
+    parser.add_argument("--think-ms", type=float, default=None, help="Time budget per card in ms, the minimax agents deepen the search until it runs out")
+    parser.add_argument("--worlds", type=int, default=0, help="Number of layouts of the hidden hands the minimax agents search per card")
+    parser.add_argument("--processes", type=int, default=0, help="Worker processes searching the layouts")
+    parser.add_argument("--root-split", type=bool, default=False, help="Search each card of the minimax root in its own worker process")
+    parser.add_argument("--worlds-ms", type=float, default=None, help="Time budget per card in ms for searching the layouts")
+    parser.add_argument("--worlds-weighted", type=bool, default=False, help="Draw the layouts uniformly and weight them by the likelihood of the bids (minimaxbayes and minimaxopt)")
+    parser.add_argument("--csp-ms", type=float, default=None, help="Time budget in ms for solving the CSP of the hidden hands, a beam search is used when the exact solve would take longer")
+    parser.add_argument("--dds-cache-size", type=int, default=1 << 16, help="Number of DDS solutions cached in memory, 0 to disable the cache")
+    parser.add_argument("--dds-cache-file", type=str, default=None, help="SQLite file caching the DDS solutions across processes and runs")
 
     args = parser.parse_args()
 
@@ -978,6 +991,20 @@ async def main():
         raise ValueError(f"Unknown agent type {args.agent}")
     else:
         agent_type = agent.conf.AGENT_TYPE
+    if args.depth is not None:
+        MinimaxAgent.SEARCH_DEPTH = args.depth
+    if args.think_ms is not None:
+        MinimaxAgent.THINK_MS = args.think_ms
+    MinimaxAgent.PIMC_WORLDS = args.worlds
+    MinimaxAgent.PROCESSES = args.processes
+    MinimaxAgent.ROOT_SPLIT = args.root_split
+    MinimaxAgent.PIMC_DEADLINE_MS = args.worlds_ms
+    MinimaxBayesAgent.PIMC_IMPORTANCE = args.worlds_weighted
+    CSPAssignerV2.SOLVE_MS = args.csp_ms
+    if args.dds_cache_size > 0:
+        DDSolver.CACHE = SolveCache(args.dds_cache_size, args.dds_cache_file)
+    else:
+        DDSolver.CACHE = None
 
     board_files = []
     boarddir = args.boarddir
@@ -1003,6 +1030,9 @@ async def main():
             await simulate(random, base_path, board_file, boardno, configfile, 
                            verbose, seed, log, auto, playonly, biddingonly, board_dir=boarddir)
 
+    if DDSolver.CACHE is not None:
+        DDSolver.CACHE.print_stats()
+
 if __name__ == '__main__':
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)